@@ -1,4 +1,5 @@
 import os
+import json
 import logging
 from datetime import timedelta
 from flask import Flask
@@ -28,12 +29,20 @@ def create_app():
     
     # Configuration
     app.secret_key = os.environ.get("SESSION_SECRET", "dev-secret-key-change-in-production")
-    app.wsgi_app = ProxyFix(app.wsgi_app, x_proto=1, x_host=1)
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=1, x_proto=1, x_host=1)
     
     # Flask-WTF/CSRF Configuration - Temporarily disabled for debugging
     app.config['WTF_CSRF_ENABLED'] = False
     app.config['WTF_CSRF_TIME_LIMIT'] = None
     
+    # Login hardening: password hashes run on a bounded pool per process; beyond it logins get 429
+    app.config['PASSWORD_HASH_METHOD'] = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+    app.config['PASSWORD_HASH_WORKERS'] = int(os.environ.get('PASSWORD_HASH_WORKERS', 2))
+    app.config['PASSWORD_HASH_MAX_PENDING'] = int(os.environ.get('PASSWORD_HASH_MAX_PENDING', 8))
+    app.config['PASSWORD_HASH_TIMEOUT_SECONDS'] = int(os.environ.get('PASSWORD_HASH_TIMEOUT_SECONDS', 5))
+    app.config['LOGIN_ATTEMPTS_PER_MINUTE_IP'] = int(os.environ.get('LOGIN_ATTEMPTS_PER_MINUTE_IP', 20))  # 0 = no limit
+    app.config['LOGIN_ATTEMPTS_PER_MINUTE_EMAIL'] = int(os.environ.get('LOGIN_ATTEMPTS_PER_MINUTE_EMAIL', 5))  # per email and IP
+    
     # Database configuration
     app.config["SQLALCHEMY_DATABASE_URI"] = os.environ.get("DATABASE_URL", "sqlite:///tradesos.db")
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
@@ -49,6 +58,11 @@ def create_app():
     app.config['MAIL_USERNAME'] = os.environ.get('MAIL_USERNAME')
     app.config['MAIL_PASSWORD'] = os.environ.get('MAIL_PASSWORD')
     app.config['MAIL_DEFAULT_SENDER'] = os.environ.get('MAIL_DEFAULT_SENDER', 'noreply@tradesos.co.uk')
+    app.config['MAIL_POOL_SIZE'] = int(os.environ.get('MAIL_POOL_SIZE', 4))
+    app.config['MAIL_POOL_MAX_IDLE_SECONDS'] = int(os.environ.get('MAIL_POOL_MAX_IDLE_SECONDS', 30))
+    app.config['MAIL_ALERT_PLAIN_TEXT'] = os.environ.get('MAIL_ALERT_PLAIN_TEXT', 'true').lower() == 'true'
+    app.config['MAIL_SUPPRESS_SEND'] = os.environ.get('MAIL_SUPPRESS_SEND', 'false').lower() == 'true'
+    app.config['BASE_URL'] = os.environ.get('BASE_URL', 'http://localhost:5000')
     
     # File upload configuration
     app.config['UPLOAD_FOLDER'] = 'uploads'
@@ -60,6 +74,58 @@ def create_app():
     
     # TradeSOS specific configuration
     app.config['PREMIUM_FIRST_ACCESS_MINUTES'] = int(os.environ.get('PREMIUM_FIRST_ACCESS_MINUTES', 3))
+    app.config['ADMIN_STATS_CACHE_SECONDS'] = int(os.environ.get('ADMIN_STATS_CACHE_SECONDS', 30))
+    app.config['IDENTITY_CACHE_SECONDS'] = int(os.environ.get('IDENTITY_CACHE_SECONDS', 60))
+    app.config['LISTING_COUNT_CACHE_SECONDS'] = int(os.environ.get('LISTING_COUNT_CACHE_SECONDS', 60))  # 0 = no totals
+    # Anonymous page cache: 'sqlite' (shared by workers on the host), 'memory' (per-process LRU, for a
+    # single worker: invalidation reaches only the worker that handled the change) or 'none'
+    app.config['PAGE_CACHE_BACKEND'] = os.environ.get('PAGE_CACHE_BACKEND', 'sqlite')
+    app.config['PAGE_CACHE_SECONDS'] = int(os.environ.get('PAGE_CACHE_SECONDS', 300))
+    app.config['PAGE_CACHE_MAX_ENTRIES'] = int(os.environ.get('PAGE_CACHE_MAX_ENTRIES', 1000))
+    app.config['PAGE_CACHE_PATH'] = os.environ.get('PAGE_CACHE_PATH')
+    # Live job and trade streams (server-sent events)
+    app.config['EVENT_POLL_SECONDS'] = float(os.environ.get('EVENT_POLL_SECONDS', 0.5))
+    app.config['EVENT_QUEUE_SIZE'] = int(os.environ.get('EVENT_QUEUE_SIZE', 100))
+    app.config['EVENT_MAX_SUBSCRIBERS'] = int(os.environ.get('EVENT_MAX_SUBSCRIBERS', 48))  # per process, below GUNICORN_THREADS
+    app.config['EVENT_HEARTBEAT_SECONDS'] = int(os.environ.get('EVENT_HEARTBEAT_SECONDS', 15))
+    app.config['EVENT_STREAM_MAX_SECONDS'] = int(os.environ.get('EVENT_STREAM_MAX_SECONDS', 300))
+    app.config['EVENT_REPLAY_LIMIT'] = int(os.environ.get('EVENT_REPLAY_LIMIT', 500))
+    app.config['EVENT_RETENTION_HOURS'] = int(os.environ.get('EVENT_RETENTION_HOURS', 24))
+    app.config['SCHEDULER_ENABLED'] = os.environ.get('SCHEDULER_ENABLED', 'true').lower() == 'true'
+    # Emergency jobs have a 0 minute SLA; breaches are measured against at least this window
+    app.config['SLA_MINIMUM_MINUTES'] = int(os.environ.get('SLA_MINIMUM_MINUTES', 15))
+    
+    # Outbox worker retry policy
+    app.config['OUTBOX_MAX_ATTEMPTS'] = int(os.environ.get('OUTBOX_MAX_ATTEMPTS', 8))
+    app.config['OUTBOX_BACKOFF_SECONDS'] = int(os.environ.get('OUTBOX_BACKOFF_SECONDS', 5))
+    app.config['OUTBOX_BACKOFF_MAX_SECONDS'] = int(os.environ.get('OUTBOX_BACKOFF_MAX_SECONDS', 900))
+    app.config['OUTBOX_LEASE_SECONDS'] = int(os.environ.get('OUTBOX_LEASE_SECONDS', 300))
+    
+    # Partner bulk job feeds; PARTNER_API_KEYS is comma-separated name:key pairs
+    app.config['PARTNER_API_KEYS'] = os.environ.get('PARTNER_API_KEYS', '')
+    app.config['INGEST_CHUNK_SIZE'] = int(os.environ.get('INGEST_CHUNK_SIZE', 500))
+    app.config['DISPATCH_INDEX_REFRESH_SECONDS'] = int(os.environ.get('DISPATCH_INDEX_REFRESH_SECONDS', 60))
+    app.config['DISPATCH_GRID_CELL_DEG'] = float(os.environ.get('DISPATCH_GRID_CELL_DEG', 0.1))
+    app.config['ENABLE_RADIUS_FILTER'] = os.environ.get('ENABLE_RADIUS_FILTER', 'false').lower() == 'true'
+    app.config['AVG_TRAVEL_SPEED_KMH'] = int(os.environ.get('AVG_TRAVEL_SPEED_KMH', 30))
+    app.config['POSTCODE_DB_PATH'] = os.environ.get('POSTCODE_DB_PATH', 'data/postcodes.bin')
+
+    # Dispatch ranking: how many trades to alert per urgency, and how candidates are scored.
+    # Either can be overridden with a JSON object in the environment.
+    app.config['DISPATCH_TOP_K'] = {
+        'emergency_now': 40,
+        'urgent_2h': 25,
+        'same_day': 15,
+        'next_day': 10,
+        **json.loads(os.environ.get('DISPATCH_TOP_K', '{}'))
+    }
+    app.config['DISPATCH_SCORE_WEIGHTS'] = {
+        'distance': 0.4,
+        'rating': 0.3,
+        'plan': 0.2,
+        'load': 0.1,
+        **json.loads(os.environ.get('DISPATCH_SCORE_WEIGHTS', '{}'))
+    }
     app.config['STANDARD_PLAN_PRICE'] = 4000  # £40.00 in pence
     app.config['PREMIUM_PLAN_PRICE'] = 8000   # £80.00 in pence
     
@@ -69,17 +135,23 @@ def create_app():
     mail.init_app(app)
     csrf.init_app(app)
     
+    from mailer import init_mailer
+    init_mailer(app)
+    
+    from auth import init_auth
+    init_auth(app)
+    
     # Login manager configuration - BASIC
     login_manager.login_view = 'login'
     login_manager.login_message = 'Please log in to access this page.'
     login_manager.login_message_category = 'info'
     
-    # User loader function - FIXED
+    # User loader function - returns a cached Identity (id, role, email, profile ids), not a User row
     @login_manager.user_loader
     def load_user(user_id):
-        from models import User
+        from identity import load_identity
         try:
-            return User.query.get(int(user_id))
+            return load_identity(int(user_id))
         except:
             return None
     
@@ -95,13 +167,35 @@ def create_app():
         import models
 
         # For development convenience, create tables if they don't exist.
-        # In production use Flask-Migrate (alembic) commands: `flask db init/migrate/upgrade`.
+        # It does not add columns or indexes to existing tables: run `flask db upgrade` (migrations/) for those.
         try:
             db.create_all()
         except Exception:
             # If migrations are in use, creation may be handled by Alembic; ignore errors here.
             logging.info('db.create_all() skipped (migrations may manage schema)')
 
+        # Build the in-memory coverage index used by find_matching_trades
+        from dispatch_index import init_dispatch_index
+        init_dispatch_index(app)
+
+        # Create (and on first run fill) the trade directory search index
+        from search import init_trade_search
+        init_trade_search(app)
+
+        from page_cache import init_page_cache
+        init_page_cache(app)
+
+        from event_hub import init_event_hub
+        init_event_hub(app)
+
+        # Start the deadline scheduler and re-arm persisted notification waves
+        from scheduler import init_scheduler
+        init_scheduler(app)
+
+        # Arm SLA deadlines for every open job
+        from sla import init_sla_monitor
+        init_sla_monitor(app)
+
         logging.info("TradeSOS application initialized successfully")
     
     return app
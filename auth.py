@@ -0,0 +1,138 @@
+import os
+import math
+import time
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from werkzeug.security import generate_password_hash, check_password_hash
+
+
+class Overloaded(Exception):
+    """The password hashing queue is full; answer 429 instead of waiting."""
+
+
+class PasswordHasher:
+    """Password hashing on a small bounded thread pool, shared by the process's requests.
+
+    hashlib's scrypt and pbkdf2 release the GIL, so at most `workers` hashes
+    burn CPU at once and at most `max_pending` more wait their turn. Anything
+    beyond that is rejected at once with Overloaded, so a credential-stuffing
+    burst is turned away cheaply instead of occupying every worker.
+    """
+
+    def __init__(self):
+        self.method = 'scrypt:32768:8:1'
+        self.workers = 2
+        self.max_pending = 8
+        self.timeout = 5
+        self._pool = None
+        self._slots = None
+        self._dummy_hash = None
+        self._lock = threading.Lock()
+
+    def configure(self, method, workers, max_pending, timeout):
+        self.method = method
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self._pool = self._slots = self._dummy_hash = None
+
+    def _run(self, fn, *args):
+        with self._lock:
+            # Created on first use, so processes forked after configure() get their own threads
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='password-hash')
+                self._slots = threading.BoundedSemaphore(self.workers + self.max_pending)
+        if not self._slots.acquire(blocking=False):
+            raise Overloaded()
+        try:
+            future = self._pool.submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            raise Overloaded()
+
+    @property
+    def dummy_hash(self):
+        # A hash of a random password with the current parameters, verified for unknown accounts
+        if self._dummy_hash is None:
+            self._dummy_hash = generate_password_hash(os.urandom(16).hex(), self.method)
+        return self._dummy_hash
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, stored_hash, password):
+        """Check a password; with no stored hash (unknown account) spend the same time and return False."""
+        valid = self._run(check_password_hash, stored_hash or self.dummy_hash, password)
+        return valid and stored_hash is not None
+
+    def needs_rehash(self, stored_hash):
+        """True if the hash was made with other parameters than the configured method."""
+        return stored_hash.split('$', 1)[0] != self.dummy_hash.split('$', 1)[0]
+
+
+class TokenBucketLimiter:
+    """In-memory token buckets: each key may make `capacity` attempts, refilled over `period` seconds.
+
+    Buckets are per process. At most `max_keys` are kept; the least recently
+    used is dropped first, which only ever makes a key's limit more lenient.
+    A capacity of 0 disables the limiter.
+    """
+
+    def __init__(self, capacity=0, period=60, max_keys=100000):
+        self.capacity = capacity
+        self.period = period
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()  # key -> (tokens, updated_at)
+        self._lock = threading.Lock()
+
+    def allow(self, key):
+        """Take a token for `key`; returns (allowed, seconds until the next token)."""
+        if not self.capacity:
+            return True, 0
+        rate = self.capacity / self.period
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at = self._buckets.pop(key, (self.capacity, now))
+            tokens = min(self.capacity, tokens + (now - updated_at) * rate)
+            allowed = tokens >= 1
+            self._buckets[key] = (tokens - 1 if allowed else tokens, now)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return allowed, 0 if allowed else math.ceil((1 - tokens) / rate)
+
+
+password_hasher = PasswordHasher()
+login_ip_limiter = TokenBucketLimiter()
+login_email_limiter = TokenBucketLimiter()
+
+
+def login_retry_after(ip, email):
+    """Seconds until this IP and email may try to log in again, or 0 if they may now.
+
+    The per-email limit is counted per (email, IP), so attempts from
+    elsewhere never lock the account's owner out; the per-IP limit caps how
+    many accounts one address can try.
+    """
+    for limiter, key in ((login_ip_limiter, ip), (login_email_limiter, (email, ip))):
+        allowed, retry_after = limiter.allow(key)
+        if not allowed:
+            return retry_after
+    return 0
+
+
+def init_auth(app):
+    password_hasher.configure(
+        app.config.get('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1'),
+        app.config.get('PASSWORD_HASH_WORKERS', 2),
+        app.config.get('PASSWORD_HASH_MAX_PENDING', 8),
+        app.config.get('PASSWORD_HASH_TIMEOUT_SECONDS', 5),
+    )
+    password_hasher.dummy_hash  # computed now rather than in the first unknown-account login
+    login_ip_limiter.capacity = app.config.get('LOGIN_ATTEMPTS_PER_MINUTE_IP', 20)
+    login_email_limiter.capacity = app.config.get('LOGIN_ATTEMPTS_PER_MINUTE_EMAIL', 5)
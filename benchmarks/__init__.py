@@ -0,0 +1 @@
+"""Benchmarks for the dispatch path. See benchmarks/dispatch.py for usage."""
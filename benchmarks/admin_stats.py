@@ -0,0 +1,59 @@
+"""Admin dashboard query benchmark.
+
+Times the dashboard's statistics (aggregated query, cold and cached) and its
+recent-activity queries against an existing database, e.g. one seeded by
+benchmarks/dispatch.py:
+
+    python -m benchmarks.dispatch --database-url sqlite:////tmp/bench.db --trades 50000 --jobs 10000000
+    python -m benchmarks.admin_stats --database-url sqlite:////tmp/bench.db
+"""
+import os
+import time
+import argparse
+import logging
+
+
+def timed(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return timings[len(timings) // 2], timings[-1]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the admin dashboard queries')
+    parser.add_argument('--database-url', help='database to benchmark (default: DATABASE_URL)')
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args(argv)
+    if args.database_url:
+        os.environ['DATABASE_URL'] = args.database_url
+    os.environ.setdefault('SCHEDULER_ENABLED', 'false')
+    logging.basicConfig(level=logging.WARNING)
+
+    from app import app, db
+    from models import Job, Trade
+    from utils import dashboard_stats, invalidate_dashboard_stats, _query_dashboard_stats
+
+    with app.app_context():
+        def cold():
+            invalidate_dashboard_stats()
+            dashboard_stats()
+
+        cases = [
+            ('stats, aggregated query', _query_dashboard_stats),
+            ('stats, cache miss', cold),
+            ('stats, cache hit', dashboard_stats),
+            ('recent jobs', lambda: Job.query.order_by(Job.created_at.desc()).limit(5).all()),
+            ('recent trades', lambda: Trade.query.order_by(Trade.created_at.desc()).limit(5).all()),
+        ]
+        print(f"{db.engine.dialect.name}, {_query_dashboard_stats()['total_jobs']} jobs")
+        for label, fn in cases:
+            p50, worst = timed(fn, args.repeat)
+            print(f'{label:<26} p50 {p50:9.3f}ms   max {worst:9.3f}ms')
+
+
+if __name__ == '__main__':
+    main()
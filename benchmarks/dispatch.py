@@ -0,0 +1,170 @@
+"""Dispatch path benchmark.
+
+Seeds a database with synthetic UK trades and jobs, then times each stage
+of dispatch on a sample of jobs and reports p50/p95/p99 latency and
+throughput. Mail is sent through Flask-Mail's suppressed (null) backend and
+the deadline scheduler is not started, so only our own code is measured.
+
+Usage:
+    python -m benchmarks.dispatch --database-url sqlite:////tmp/bench.db --trades 50000 --jobs 1000000
+    python -m benchmarks.dispatch --database-url postgresql://localhost/tradesos_bench --no-seed --out before.json
+
+Run it against a throwaway database: seeding inserts rows and the
+notification stage writes notification waves.
+"""
+import os
+import sys
+import json
+import time
+import random
+import logging
+import argparse
+import platform
+import subprocess
+from datetime import datetime
+
+
+def percentile(samples, p):
+    return samples[min(len(samples) - 1, int(p * len(samples)))]
+
+
+def summarize(timings, wall_seconds):
+    timings = sorted(timings)
+    return {
+        'count': len(timings),
+        'mean_ms': round(sum(timings) / len(timings) * 1000, 4),
+        'p50_ms': round(percentile(timings, 0.50) * 1000, 4),
+        'p95_ms': round(percentile(timings, 0.95) * 1000, 4),
+        'p99_ms': round(percentile(timings, 0.99) * 1000, 4),
+        'max_ms': round(timings[-1] * 1000, 4),
+        'throughput_per_s': round(len(timings) / wall_seconds, 1) if wall_seconds else None,
+    }
+
+
+def measure(fn, inputs):
+    """Call fn on every input; return (per-call timings, total wall time, results)."""
+    timings, results = [], []
+    started = time.perf_counter()
+    for item in inputs:
+        t0 = time.perf_counter()
+        results.append(fn(item))
+        timings.append(time.perf_counter() - t0)
+    return timings, time.perf_counter() - started, results
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the job dispatch path')
+    parser.add_argument('--database-url', help='database to seed and benchmark (default: DATABASE_URL)')
+    parser.add_argument('--trades', type=int, default=50000, help='synthetic trades to insert')
+    parser.add_argument('--jobs', type=int, default=1000000, help='synthetic jobs to insert')
+    parser.add_argument('--no-seed', action='store_true', help='benchmark the existing data as-is')
+    parser.add_argument('--samples', type=int, default=2000, help='jobs sampled per stage')
+    parser.add_argument('--seed', type=int, default=42, help='random seed for data and sampling')
+    parser.add_argument('--out', help='write results as JSON to this file')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.database_url:
+        os.environ['DATABASE_URL'] = args.database_url
+    os.environ.setdefault('MAIL_SUPPRESS_SEND', 'true')
+    os.environ.setdefault('SCHEDULER_ENABLED', 'false')
+    logging.basicConfig(level=logging.WARNING)
+
+    # Imported here so the environment above is in place when the app is created
+    from app import app, db
+    from models import Trade, Job
+    from dispatch_index import dispatch_index
+    from scheduler import scheduler
+    from utils import (parse_postcode, geocode_postcode, find_matching_trades, rank_trades,
+                       send_job_notification, _parse_normalized_postcode)
+    from benchmarks.synthetic import seed
+
+    with app.app_context():
+        if not args.no_seed:
+            print(f'Seeding {args.trades} trades and {args.jobs} jobs into {db.engine.url.render_as_string()}')
+            started = time.perf_counter()
+            seed(db, args.trades, args.jobs, seed=args.seed)
+            print(f'Seeded in {time.perf_counter() - started:.1f}s')
+
+        trade_count = db.session.query(db.func.count(Trade.id)).scalar()
+        min_id, max_id = db.session.query(db.func.min(Job.id), db.func.max(Job.id)).one()
+        if not max_id:
+            sys.exit('No jobs to benchmark; run without --no-seed first')
+
+        rng = random.Random(args.seed)
+        sample_ids = [rng.randint(min_id, max_id) for _ in range(args.samples)]
+        jobs = [job for job in (db.session.get(Job, job_id) for job_id in sample_ids) if job]
+
+        started = time.perf_counter()
+        dispatch_index.build()
+        index_build_seconds = time.perf_counter() - started
+
+        # Silence per-job info logging from the code under test
+        logging.disable(logging.INFO)
+        results = {}
+        raw_postcodes = [job.postcode_full.lower().replace(' ', '') for job in jobs]
+
+        _parse_normalized_postcode.cache_clear()
+        timings, wall, parsed = measure(parse_postcode, raw_postcodes)
+        results['parse_postcode_cold'] = summarize(timings, wall)
+        timings, wall, _ = measure(parse_postcode, raw_postcodes)
+        results['parse_postcode_warm'] = summarize(timings, wall)
+
+        timings, wall, _ = measure(geocode_postcode, [info for info in parsed if info])
+        results['geocode_postcode'] = summarize(timings, wall)
+
+        timings, wall, matches = measure(find_matching_trades, jobs)
+        results['find_matching_trades'] = summarize(timings, wall)
+        candidates = sum(len(trades) for trades in matches)
+
+        timings, wall, ranked = measure(lambda pair: rank_trades(*pair)[0], list(zip(jobs, matches)))
+        results['rank_trades'] = summarize(timings, wall)
+
+        timings, wall, _ = measure(lambda pair: send_job_notification(*pair), list(zip(jobs, ranked)))
+        results['send_job_notification'] = summarize(timings, wall)
+        logging.disable(logging.NOTSET)
+
+        # Don't leave benchmark waves armed in this process
+        for job in jobs:
+            scheduler.cancel(('standard_wave', job.id))
+
+        report = {
+            'meta': {
+                'timestamp': datetime.utcnow().isoformat() + 'Z',
+                'git_revision': git_revision(),
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'database': db.engine.dialect.name,
+                'trades': trade_count,
+                'jobs': max_id - min_id + 1,
+                'sampled_jobs': len(jobs),
+                'mean_candidates_per_job': round(candidates / len(jobs), 1) if jobs else 0,
+                'index_build_ms': round(index_build_seconds * 1000, 1),
+                'radius_filter': app.config.get('ENABLE_RADIUS_FILTER'),
+            },
+            'results': results,
+        }
+
+    print(f"{'stage':<24}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'ops/s':>12}")
+    for name, stats in results.items():
+        print(f"{name:<24}{stats['p50_ms']:>10.3f}{stats['p95_ms']:>10.3f}{stats['p99_ms']:>10.3f}"
+              f"{stats['throughput_per_s']:>12.1f}")
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f'Wrote {args.out}')
+    return report
+
+
+if __name__ == '__main__':
+    main()
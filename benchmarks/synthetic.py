@@ -0,0 +1,143 @@
+"""Synthetic UK trades and jobs for benchmarking.
+
+Data is shaped like production rather than uniform: London and the big
+cities get most of the trades and jobs, trades cover a home area plus a few
+neighbours and some districts, and each has one to three skills.
+"""
+import random
+from datetime import datetime, timedelta
+from sqlalchemy import insert
+from capabilities import CAPABILITIES, skills_to_mask
+
+# (area, weight, centroid lat, centroid lon, number of districts)
+AREAS = [
+    ('E', 8, 51.53, -0.03, 20), ('EC', 3, 51.52, -0.10, 4), ('N', 6, 51.57, -0.11, 22),
+    ('NW', 6, 51.55, -0.19, 11), ('SE', 8, 51.47, -0.05, 28), ('SW', 8, 51.46, -0.17, 20),
+    ('W', 6, 51.51, -0.23, 14), ('WC', 2, 51.52, -0.12, 2), ('CR', 3, 51.37, -0.10, 9),
+    ('M', 7, 53.48, -2.24, 40), ('SK', 3, 53.40, -2.15, 23), ('OL', 2, 53.56, -2.10, 16),
+    ('WA', 2, 53.39, -2.59, 16), ('B', 7, 52.48, -1.89, 99), ('L', 5, 53.41, -2.98, 40),
+    ('LS', 5, 53.80, -1.55, 29), ('S', 4, 53.38, -1.47, 45), ('BS', 4, 51.45, -2.59, 49),
+    ('NE', 3, 54.97, -1.61, 70), ('G', 5, 55.86, -4.25, 84), ('EH', 4, 55.95, -3.19, 55),
+    ('CF', 3, 51.48, -3.18, 83), ('NG', 3, 52.95, -1.15, 25), ('LE', 2, 52.64, -1.13, 19),
+]
+URGENCIES = [('emergency_now', 0, 3), ('urgent_2h', 120, 3), ('same_day', 480, 3), ('next_day', 1440, 1)]
+CATEGORIES = list(CAPABILITIES) + ['other']
+UNIT_LETTERS = 'ABDEFGHJLNPQRSTUWXYZ'
+
+
+class Generator:
+    def __init__(self, seed=42):
+        self.rng = random.Random(seed)
+        self._area_weights = [weight for _, weight, _, _, _ in AREAS]
+
+    def area(self):
+        return self.rng.choices(AREAS, weights=self._area_weights)[0]
+
+    def nearby_areas(self, home, count):
+        _, _, lat, lon, _ = home
+        by_distance = sorted(AREAS, key=lambda a: (a[2] - lat) ** 2 + (a[3] - lon) ** 2)
+        return [a[0] for a in by_distance[1:1 + count]]
+
+    def postcode(self, area_row):
+        area, _, lat, lon, districts = area_row
+        district = f'{area}{self.rng.randint(1, districts)}'
+        unit = ''.join(self.rng.choices(UNIT_LETTERS, k=2))
+        full = f'{district} {self.rng.randint(0, 9)}{unit}'
+        return full, area, district, lat + self.rng.gauss(0, 0.05), lon + self.rng.gauss(0, 0.08)
+
+    def trade_rows(self, count, first_user_id=1, first_trade_id=1):
+        """Yield (user_row, trade_row) pairs."""
+        now = datetime.utcnow()
+        for i in range(count):
+            home = self.area()
+            area, _, lat, lon, districts = home
+            skills = self.rng.sample(CAPABILITIES, self.rng.choice([1, 1, 2, 3]))
+            areas = [area] + self.nearby_areas(home, self.rng.choice([0, 0, 1, 2]))
+            covered_districts = sorted({f'{area}{self.rng.randint(1, districts)}'
+                                        for _ in range(self.rng.randint(0, 5))})
+            review_count = int(self.rng.expovariate(1 / 15))
+            user_id = first_user_id + i
+            has_base = self.rng.random() < 0.5
+            yield (
+                {'id': user_id, 'email': f'bench-trade-{user_id}@example.com', 'password_hash': 'x',
+                 'role': 'trade', 'verified': True, 'created_at': now},
+                {'id': first_trade_id + i, 'user_id': user_id, 'company': f'Bench Trade {user_id} Ltd', 'skills': skills,
+                 'capability_mask': skills_to_mask(skills),
+                 'coverage_areas': [] if has_base and self.rng.random() < 0.5 else areas,
+                 'coverage_districts': covered_districts,
+                 'radius_km': self.rng.choice([5.0, 10.0, 15.0, 25.0]) if has_base else None,
+                 'base_lat': lat + self.rng.gauss(0, 0.05) if has_base else None,
+                 'base_lon': lon + self.rng.gauss(0, 0.08) if has_base else None,
+                 'rating_avg': round(self.rng.uniform(3.0, 5.0), 2) if review_count else 0.0,
+                 'review_count': review_count, 'verified': self.rng.random() < 0.9,
+                 'plan_tier': 'premium' if self.rng.random() < 0.25 else 'standard',
+                 'subscription_status': 'active', 'created_at': now - timedelta(days=self.rng.randint(0, 900))}
+            )
+
+    def job_rows(self, count):
+        now = datetime.utcnow()
+        urgency_weights = [weight for _, _, weight in URGENCIES]
+        for i in range(count):
+            full, area, district, lat, lon = self.postcode(self.area())
+            urgency, sla, _ = self.rng.choices(URGENCIES, weights=urgency_weights)[0]
+            created_at = now - timedelta(minutes=self.rng.randint(0, 60 * 24 * 365))
+            status = self.rng.choices(['posted', 'accepted', 'in_progress', 'completed', 'canceled'],
+                                      weights=[5, 10, 5, 75, 5])[0]
+            yield {
+                'customer_name': 'Bench Customer', 'customer_phone': '07000000000',
+                'customer_email': f'bench-customer-{i}@example.com', 'title': 'Benchmark job',
+                'category': self.rng.choice(CATEGORIES), 'description': 'Synthetic benchmark job description.',
+                'postcode_full': full, 'postcode_area': area, 'postcode_district': district,
+                'lat': lat, 'lon': lon, 'urgency': urgency, 'urgency_sla_minutes': sla, 'status': status,
+                'created_at': created_at, 'updated_at': created_at,
+            }
+
+
+def _chunks(rows, size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def seed(db, trades, jobs, seed=42, chunk_size=5000, log=print):
+    """Bulk insert synthetic users, trades and jobs. Existing rows are left alone."""
+    from models import User, Trade, TradeCoverage, Job
+
+    generator = Generator(seed)
+    first_user_id = (db.session.query(db.func.max(User.id)).scalar() or 0) + 1
+    first_trade_id = (db.session.query(db.func.max(Trade.id)).scalar() or 0) + 1
+    inserted = 0
+    for chunk in _chunks(generator.trade_rows(trades, first_user_id, first_trade_id), chunk_size):
+        db.session.execute(insert(User), [user for user, _ in chunk])
+        db.session.execute(insert(Trade), [trade for _, trade in chunk])
+        db.session.execute(insert(TradeCoverage), [
+            {'trade_id': trade['id'], 'kind': kind, 'code': code}
+            for _, trade in chunk
+            for kind, codes in (('area', trade['coverage_areas']), ('district', trade['coverage_districts']))
+            for code in codes
+        ])
+        db.session.commit()
+        inserted += len(chunk)
+        log(f'  trades: {inserted}/{trades}')
+
+    if db.engine.dialect.name == 'postgresql':
+        # Explicit ids don't advance the serial sequences
+        for table in ('users', 'trades'):
+            db.session.execute(db.text(
+                f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), (SELECT MAX(id) FROM {table}))"
+            ))
+        db.session.commit()
+
+    inserted = 0
+    for chunk in _chunks(generator.job_rows(jobs), chunk_size * 4):
+        db.session.execute(insert(Job), chunk)
+        db.session.commit()
+        inserted += len(chunk)
+        if inserted % (chunk_size * 40) == 0 or inserted == jobs:
+            log(f'  jobs: {inserted}/{jobs}')
+    return generator
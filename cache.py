@@ -0,0 +1,180 @@
+import json
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+
+
+class TTLCache:
+    """Small in-process cache whose entries expire after a fixed number of seconds.
+
+    Each worker process has its own copy, so writers invalidate the keys they
+    know are stale and the TTL bounds how long other processes lag behind.
+    At most `max_entries` are kept: expired entries are purged every
+    `purge_every` writes, and when the cache is still full the least
+    recently used entry is evicted.
+    """
+
+    def __init__(self, max_entries=10000, purge_every=1000):
+        self.max_entries = max_entries
+        self.purge_every = purge_every
+        self._entries = OrderedDict()  # key -> (expires_at, value), least recently used first
+        self._writes = 0
+        self._refreshing = set()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                return entry[1]
+        return None
+
+    def set(self, key, value, ttl):
+        now = time.monotonic()
+        with self._lock:
+            self._entries[key] = (now + ttl, value)
+            self._entries.move_to_end(key)
+            self._writes += 1
+            if self._writes % self.purge_every == 0 or len(self._entries) > self.max_entries:
+                self._purge(now)
+
+    def _purge(self, now):
+        for key in [key for key, (expires_at, _) in self._entries.items()
+                    if expires_at <= now and key not in self._refreshing]:
+            del self._entries[key]
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get_or_set(self, key, compute, ttl, background=None):
+        """Return the cached value, computing and storing it on a miss. A TTL of 0 disables caching.
+
+        With `background` (a function that runs a callable on another thread),
+        a value expired for less than another `ttl` is still returned while
+        one refresh runs in the background, so only the very first caller
+        waits for `compute`. Past that (say refreshes keep failing or the
+        thread is stuck) callers compute it themselves again, so nothing is
+        served more than 2 x ttl old.
+        """
+        if ttl <= 0:
+            return compute()
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > now:
+                self._entries.move_to_end(key)
+                return entry[1]
+            stale = entry is not None and background is not None and now < entry[0] + ttl
+            if stale:
+                if key in self._refreshing:
+                    return entry[1]
+                self._refreshing.add(key)
+
+        if not stale:
+            value = compute()
+            self.set(key, value, ttl)
+            return value
+
+        def refresh():
+            try:
+                self.set(key, compute(), ttl)
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        background(refresh)
+        return entry[1]
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+cache = TTLCache()
+
+
+class LRUCache:
+    """In-process store holding at most `max_entries`, evicting the least recently used.
+
+    Values are kept as-is and expire after their TTL (None = until evicted).
+    """
+
+    def __init__(self, max_entries=1000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] is not None and entry[0] <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl if ttl else None, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+
+class SQLiteStore:
+    """Store in a local SQLite file, shared by every worker process on the host.
+
+    Values must be JSON-serializable. Each thread opens its own connection on
+    first use (so forked workers never share one); WAL mode lets readers
+    proceed while another process writes. Expired rows are pruned every
+    `prune_every` writes.
+    """
+
+    def __init__(self, path, prune_every=500):
+        self.path = path
+        self.prune_every = prune_every
+        self._local = threading.local()
+        self._writes = 0
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS cache_entries (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL)'
+            )
+            self._local.connection = connection
+        return connection
+
+    def get(self, key):
+        row = self._connection().execute(
+            'SELECT value FROM cache_entries WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)',
+            (key, time.time()),
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, key, value, ttl=None):
+        connection = self._connection()
+        connection.execute(
+            'INSERT OR REPLACE INTO cache_entries (key, value, expires_at) VALUES (?, ?, ?)',
+            (key, json.dumps(value), time.time() + ttl if ttl else None),
+        )
+        self._writes += 1
+        if self._writes % self.prune_every == 0:
+            connection.execute('DELETE FROM cache_entries WHERE expires_at <= ?', (time.time(),))
+
+    def delete(self, key):
+        self._connection().execute('DELETE FROM cache_entries WHERE key = ?', (key,))
@@ -0,0 +1,58 @@
+"""Fixed capability bitmask shared by trade skills and job categories.
+
+Bit positions are persisted in `trades.capability_mask`, so only ever append
+to CAPABILITIES; never reorder or remove entries.
+"""
+
+CAPABILITIES = (
+    'plumbing',
+    'heating',
+    'electrical',
+    'gas',
+    'roofing',
+    'locksmith',
+    'glazing',
+    'security',
+)
+
+CAPABILITY_BITS = {name: 1 << bit for bit, name in enumerate(CAPABILITIES)}
+ALL_CAPABILITIES = (1 << len(CAPABILITIES)) - 1
+
+# Free-text skill names (trade profile) mapped onto capabilities
+SKILL_ALIASES = {
+    'plumber': ('plumbing',),
+    # Registration offers "heating" labelled as "Gas / Heating"
+    'heating': ('heating', 'gas'),
+    'boilers': ('heating',),
+    'boiler': ('heating',),
+    'gas safe': ('gas',),
+    'gas / heating': ('gas', 'heating'),
+    'electrician': ('electrical',),
+    'electrics': ('electrical',),
+    'roofer': ('roofing',),
+    'locks': ('locksmith',),
+    'windows': ('glazing',),
+    'glazier': ('glazing',),
+    'security systems': ('security',),
+    'alarms': ('security',),
+    'cctv': ('security',),
+}
+
+
+def skills_to_mask(skills):
+    """Return the capability mask for a list of skill names.
+
+    A trade with no recognised skills keeps receiving every category, as it
+    did before skills matching existed.
+    """
+    mask = 0
+    for skill in skills or []:
+        skill = str(skill).strip().lower()
+        for name in SKILL_ALIASES.get(skill, (skill,)):
+            mask |= CAPABILITY_BITS.get(name, 0)
+    return mask or ALL_CAPABILITIES
+
+
+def category_mask(category):
+    """Return the capability mask a job category requires; 'other' matches every trade."""
+    return CAPABILITY_BITS.get((category or '').strip().lower(), ALL_CAPABILITIES)
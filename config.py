@@ -1,4 +1,5 @@
 import os
+import json
 from datetime import timedelta
 
 class Config:
@@ -7,6 +8,14 @@ class Config:
     # Flask settings
     SECRET_KEY = os.environ.get('SESSION_SECRET') or 'dev-secret-key-change-in-production'
     
+    # Login hardening
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD') or 'scrypt:32768:8:1'
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS') or 2)
+    PASSWORD_HASH_MAX_PENDING = int(os.environ.get('PASSWORD_HASH_MAX_PENDING') or 8)
+    PASSWORD_HASH_TIMEOUT_SECONDS = int(os.environ.get('PASSWORD_HASH_TIMEOUT_SECONDS') or 5)
+    LOGIN_ATTEMPTS_PER_MINUTE_IP = int(os.environ.get('LOGIN_ATTEMPTS_PER_MINUTE_IP') or 20)  # 0 = no limit
+    LOGIN_ATTEMPTS_PER_MINUTE_EMAIL = int(os.environ.get('LOGIN_ATTEMPTS_PER_MINUTE_EMAIL') or 5)  # per email and IP
+    
     # Database settings
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///tradesos.db'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
@@ -26,6 +35,10 @@ class Config:
     MAIL_USERNAME = os.environ.get('MAIL_USERNAME')
     MAIL_PASSWORD = os.environ.get('MAIL_PASSWORD')
     MAIL_DEFAULT_SENDER = os.environ.get('MAIL_DEFAULT_SENDER') or 'noreply@tradesos.co.uk'
+    MAIL_POOL_SIZE = int(os.environ.get('MAIL_POOL_SIZE') or 4)
+    MAIL_POOL_MAX_IDLE_SECONDS = int(os.environ.get('MAIL_POOL_MAX_IDLE_SECONDS') or 30)
+    MAIL_ALERT_PLAIN_TEXT = os.environ.get('MAIL_ALERT_PLAIN_TEXT', 'true').lower() == 'true'
+    MAIL_SUPPRESS_SEND = os.environ.get('MAIL_SUPPRESS_SEND', 'false').lower() == 'true'
     
     # Stripe settings
     STRIPE_SECRET_KEY = os.environ.get('STRIPE_SECRET_KEY')
@@ -34,10 +47,49 @@ class Config:
     
     # TradeSOS specific settings
     PREMIUM_FIRST_ACCESS_MINUTES = int(os.environ.get('PREMIUM_FIRST_ACCESS_MINUTES') or 3)
+    ADMIN_STATS_CACHE_SECONDS = int(os.environ.get('ADMIN_STATS_CACHE_SECONDS') or 30)
+    IDENTITY_CACHE_SECONDS = int(os.environ.get('IDENTITY_CACHE_SECONDS') or 60)
+    LISTING_COUNT_CACHE_SECONDS = int(os.environ.get('LISTING_COUNT_CACHE_SECONDS') or 60)  # 0 = no totals
+    PAGE_CACHE_BACKEND = os.environ.get('PAGE_CACHE_BACKEND') or 'sqlite'  # sqlite, memory (single worker only), none
+    PAGE_CACHE_SECONDS = int(os.environ.get('PAGE_CACHE_SECONDS') or 300)
+    PAGE_CACHE_MAX_ENTRIES = int(os.environ.get('PAGE_CACHE_MAX_ENTRIES') or 1000)
+    PAGE_CACHE_PATH = os.environ.get('PAGE_CACHE_PATH')  # default: instance/page_cache.db
+    EVENT_POLL_SECONDS = float(os.environ.get('EVENT_POLL_SECONDS') or 0.5)
+    EVENT_QUEUE_SIZE = int(os.environ.get('EVENT_QUEUE_SIZE') or 100)
+    EVENT_MAX_SUBSCRIBERS = int(os.environ.get('EVENT_MAX_SUBSCRIBERS') or 48)  # per process, below GUNICORN_THREADS
+    EVENT_HEARTBEAT_SECONDS = int(os.environ.get('EVENT_HEARTBEAT_SECONDS') or 15)
+    EVENT_STREAM_MAX_SECONDS = int(os.environ.get('EVENT_STREAM_MAX_SECONDS') or 300)
+    EVENT_REPLAY_LIMIT = int(os.environ.get('EVENT_REPLAY_LIMIT') or 500)
+    EVENT_RETENTION_HOURS = int(os.environ.get('EVENT_RETENTION_HOURS') or 24)
+    SCHEDULER_ENABLED = os.environ.get('SCHEDULER_ENABLED', 'true').lower() == 'true'
+    SLA_MINIMUM_MINUTES = int(os.environ.get('SLA_MINIMUM_MINUTES') or 15)
+    OUTBOX_MAX_ATTEMPTS = int(os.environ.get('OUTBOX_MAX_ATTEMPTS') or 8)
+    OUTBOX_BACKOFF_SECONDS = int(os.environ.get('OUTBOX_BACKOFF_SECONDS') or 5)
+    OUTBOX_BACKOFF_MAX_SECONDS = int(os.environ.get('OUTBOX_BACKOFF_MAX_SECONDS') or 900)
+    OUTBOX_LEASE_SECONDS = int(os.environ.get('OUTBOX_LEASE_SECONDS') or 300)
+    PARTNER_API_KEYS = os.environ.get('PARTNER_API_KEYS') or ''  # name:key,name:key
+    INGEST_CHUNK_SIZE = int(os.environ.get('INGEST_CHUNK_SIZE') or 500)
     TRACKING_PING_INTERVAL_SEC = int(os.environ.get('TRACKING_PING_INTERVAL_SEC') or 15)
     TRACKING_RETENTION_HOURS = int(os.environ.get('TRACKING_RETENTION_HOURS') or 24)
     AVG_TRAVEL_SPEED_KMH = int(os.environ.get('AVG_TRAVEL_SPEED_KMH') or 30)
     ENABLE_RADIUS_FILTER = os.environ.get('ENABLE_RADIUS_FILTER', 'false').lower() == 'true'
+    DISPATCH_INDEX_REFRESH_SECONDS = int(os.environ.get('DISPATCH_INDEX_REFRESH_SECONDS') or 60)
+    DISPATCH_GRID_CELL_DEG = float(os.environ.get('DISPATCH_GRID_CELL_DEG') or 0.1)
+    POSTCODE_DB_PATH = os.environ.get('POSTCODE_DB_PATH') or 'data/postcodes.bin'
+    DISPATCH_TOP_K = {
+        'emergency_now': 40,
+        'urgent_2h': 25,
+        'same_day': 15,
+        'next_day': 10,
+        **json.loads(os.environ.get('DISPATCH_TOP_K') or '{}')
+    }
+    DISPATCH_SCORE_WEIGHTS = {
+        'distance': 0.4,
+        'rating': 0.3,
+        'plan': 0.2,
+        'load': 0.1,
+        **json.loads(os.environ.get('DISPATCH_SCORE_WEIGHTS') or '{}')
+    }
     
     # Subscription pricing (in pence)
     STANDARD_PLAN_PRICE = 4000  # £40.00
@@ -83,6 +135,7 @@ class TestingConfig(Config):
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
     WTF_CSRF_ENABLED = False
     ENABLE_EMAIL_NOTIFICATIONS = False
+    SCHEDULER_ENABLED = False
 
 # Configuration dictionary
 config = {
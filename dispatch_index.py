@@ -0,0 +1,312 @@
+import math
+import time
+import logging
+import threading
+from collections import defaultdict
+from itertools import chain
+import numpy as np
+from flask import current_app
+from app import db
+from models import Trade
+from scheduler import scheduler
+from capabilities import ALL_CAPABILITIES, skills_to_mask
+
+EARTH_RADIUS_KM = 6371.0
+
+
+def haversine_km(lat, lon, lats, lons):
+    """Vectorized haversine distance in km from one point to arrays of points."""
+    lat, lon = math.radians(lat), math.radians(lon)
+    lats = np.radians(lats)
+    lons = np.radians(lons)
+    a = np.sin((lats - lat) / 2) ** 2 + math.cos(lat) * np.cos(lats) * np.sin((lons - lon) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+
+class _Entry:
+    __slots__ = ('areas', 'districts', 'mask', 'slot', 'cell')
+
+    def __init__(self, areas, districts, mask, slot=None, cell=None):
+        self.areas = areas
+        self.districts = districts
+        self.mask = mask
+        self.slot = slot
+        self.cell = cell
+
+
+class DispatchIndex:
+    """Process-local inverted index from postcode area/district to verified trade ids.
+
+    Built once at startup and kept current by calling `update_trade` after a
+    trade is committed. Each gunicorn worker holds its own copy, so the
+    scheduler also rebuilds it every `refresh_seconds` on a background thread
+    to pick up changes committed by other workers; matches never wait on it.
+
+    Trades with a base location and `radius_km` are also bucketed in a
+    lat/lon grid. Their coordinates live in NumPy arrays addressed by slot so
+    a radius query distance-checks every candidate in one vectorized pass.
+
+    Every trade also carries its capability bitmask, so category filtering is
+    a bitwise AND against the job's mask.
+    """
+
+    # Attributes set by _reset, swapped in as a whole by build()
+    _STATE = ('_by_area', '_by_district', '_entries', '_grid', '_located', '_ids', '_lat', '_lon',
+              '_radius', '_mask', '_free_slots', '_max_radius_km')
+
+    def __init__(self, refresh_seconds=60, cell_deg=0.1):
+        self.refresh_seconds = refresh_seconds
+        self.cell_deg = cell_deg
+        self._lock = threading.RLock()
+        self._build_lock = threading.Lock()
+        self._reset()
+        self._built_at = None
+        self._updates_during_build = None  # trade_id -> _add args, or None once removed
+
+    def _reset(self, capacity=64):
+        self._by_area = defaultdict(set)
+        self._by_district = defaultdict(set)
+        self._entries = {}  # trade_id -> _Entry
+        self._grid = defaultdict(set)  # (lat_cell, lon_cell) -> slots
+        self._located = set()  # trade ids held in the grid
+        self._ids = np.zeros(capacity, dtype=np.int64)
+        self._lat = np.full(capacity, np.nan)
+        self._lon = np.full(capacity, np.nan)
+        self._radius = np.zeros(capacity)
+        self._mask = np.zeros(capacity, dtype=np.int64)
+        self._free_slots = list(range(capacity - 1, -1, -1))
+        self._max_radius_km = 0.0
+
+    @property
+    def is_built(self):
+        return self._built_at is not None
+
+    def build(self):
+        """(Re)build the index from the verified trades in the database.
+
+        The new index is filled off to the side and swapped in under the lock,
+        so matches keep using the current one while the query runs. Trades
+        updated meanwhile are re-applied on top, as the query may predate them.
+        """
+        with self._build_lock:
+            with self._lock:
+                self._updates_during_build = {}
+            try:
+                rows = db.session.query(
+                    Trade.id, Trade.coverage_areas, Trade.coverage_districts,
+                    Trade.base_lat, Trade.base_lon, Trade.radius_km,
+                    Trade.capability_mask, Trade.skills
+                ).filter(Trade.verified == True).all()
+
+                fresh = DispatchIndex(self.refresh_seconds, self.cell_deg)
+                fresh._reset(capacity=max(64, len(rows)))
+                for trade_id, areas, districts, base_lat, base_lon, radius_km, mask, skills in rows:
+                    if mask is None:
+                        mask = skills_to_mask(skills)
+                    fresh._add(trade_id, areas, districts, base_lat, base_lon, radius_km, mask)
+            except Exception:
+                with self._lock:
+                    self._updates_during_build = None
+                raise
+
+            with self._lock:
+                for trade_id, args in self._updates_during_build.items():
+                    fresh._remove(trade_id)
+                    if args is not None:
+                        fresh._add(trade_id, *args)
+                self._updates_during_build = None
+                for name in self._STATE:
+                    setattr(self, name, getattr(fresh, name))
+                self._built_at = time.monotonic()
+
+        logging.info(f"Dispatch index built with {len(rows)} verified trades")
+
+    def ensure_built(self):
+        # Only when the startup build failed (e.g. before the first migration); refreshes run in the background
+        if not self.is_built:
+            self.build()
+
+    def update_trade(self, trade):
+        """Re-index a single trade after its row has been committed."""
+        with self._lock:
+            self._remove(trade.id)
+            args = None
+            if trade.verified:
+                args = (trade.get_coverage_areas(), trade.get_coverage_districts(),
+                        trade.base_lat, trade.base_lon, trade.radius_km, trade.get_capability_mask())
+                self._add(trade.id, *args)
+            if self._updates_during_build is not None:
+                self._updates_during_build[trade.id] = args
+
+    def remove_trade(self, trade_id):
+        with self._lock:
+            self._remove(trade_id)
+            if self._updates_during_build is not None:
+                self._updates_during_build[trade_id] = None
+
+    def _add(self, trade_id, areas, districts, base_lat, base_lon, radius_km, mask):
+        entry = _Entry(frozenset(areas or []), frozenset(districts or []), mask)
+        for area in entry.areas:
+            self._by_area[area].add(trade_id)
+        for district in entry.districts:
+            self._by_district[district].add(trade_id)
+
+        if base_lat is not None and base_lon is not None and radius_km:
+            entry.slot = self._allocate_slot()
+            entry.cell = self._cell(base_lat, base_lon)
+            self._ids[entry.slot] = trade_id
+            self._lat[entry.slot] = base_lat
+            self._lon[entry.slot] = base_lon
+            self._radius[entry.slot] = radius_km
+            self._mask[entry.slot] = mask
+            self._grid[entry.cell].add(entry.slot)
+            self._located.add(trade_id)
+            self._max_radius_km = max(self._max_radius_km, radius_km)
+
+        self._entries[trade_id] = entry
+
+    def _remove(self, trade_id):
+        entry = self._entries.pop(trade_id, None)
+        if entry is None:
+            return
+        for area in entry.areas:
+            self._discard(self._by_area, area, trade_id)
+        for district in entry.districts:
+            self._discard(self._by_district, district, trade_id)
+        if entry.slot is not None:
+            self._discard(self._grid, entry.cell, entry.slot)
+            self._located.discard(trade_id)
+            self._lat[entry.slot] = np.nan
+            self._lon[entry.slot] = np.nan
+            self._free_slots.append(entry.slot)
+
+    def _allocate_slot(self):
+        if not self._free_slots:
+            old = len(self._ids)
+            self._ids = np.resize(self._ids, old * 2)
+            self._lat = np.concatenate([self._lat, np.full(old, np.nan)])
+            self._lon = np.concatenate([self._lon, np.full(old, np.nan)])
+            self._radius = np.resize(self._radius, old * 2)
+            self._mask = np.resize(self._mask, old * 2)
+            self._free_slots = list(range(old * 2 - 1, old - 1, -1))
+        return self._free_slots.pop()
+
+    @staticmethod
+    def _discard(mapping, key, value):
+        values = mapping.get(key)
+        if values is not None:
+            values.discard(value)
+            if not values:
+                del mapping[key]
+
+    def _cell(self, lat, lon):
+        return (math.floor(lat / self.cell_deg), math.floor(lon / self.cell_deg))
+
+    def _covering(self, postcode_area, postcode_district, capability_mask):
+        ids = self._by_area.get(postcode_area, set()) | self._by_district.get(postcode_district, set())
+        if capability_mask != ALL_CAPABILITIES:
+            entries = self._entries
+            ids = {trade_id for trade_id in ids if entries[trade_id].mask & capability_mask}
+        return ids
+
+    def match(self, postcode_area, postcode_district, capability_mask=ALL_CAPABILITIES):
+        """Return the set of verified trade ids covering an area or district
+        and sharing at least one capability with `capability_mask`."""
+        self.ensure_built()
+        with self._lock:
+            return self._covering(postcode_area, postcode_district, capability_mask)
+
+    def match_radius(self, postcode_area, postcode_district, lat, lon, capability_mask=ALL_CAPABILITIES):
+        """Radius-mode match: trades with a base location are matched by distance,
+        the rest by postcode coverage."""
+        nearby = self.nearby(lat, lon, capability_mask)
+        with self._lock:
+            covered = self._covering(postcode_area, postcode_district, capability_mask)
+            return (covered - self._located) | nearby.keys()
+
+    def nearby(self, lat, lon, capability_mask=ALL_CAPABILITIES):
+        """Return {trade_id: distance_km} for trades whose radius reaches (lat, lon)."""
+        self.ensure_built()
+        with self._lock:
+            if not self._grid:
+                return {}
+
+            # Search every cell that a trade at the largest radius could sit in
+            lat_span = math.ceil(self._max_radius_km / 111.0 / self.cell_deg)
+            lon_km = 111.0 * max(math.cos(math.radians(lat)), 0.01)
+            lon_span = math.ceil(self._max_radius_km / lon_km / self.cell_deg)
+            lat_cell, lon_cell = self._cell(lat, lon)
+            slots = np.fromiter(chain.from_iterable(
+                self._grid.get((lat_cell + i, lon_cell + j), ())
+                for i in range(-lat_span, lat_span + 1)
+                for j in range(-lon_span, lon_span + 1)
+            ), dtype=np.intp)
+            if capability_mask != ALL_CAPABILITIES:
+                slots = slots[(self._mask[slots] & capability_mask) != 0]
+            if not len(slots):
+                return {}
+
+            distances = haversine_km(lat, lon, self._lat[slots], self._lon[slots])
+            hits = distances <= self._radius[slots]
+            return dict(zip(self._ids[slots][hits].tolist(), distances[hits].tolist()))
+
+    def distances(self, lat, lon, trade_ids):
+        """Return {trade_id: distance_km} from (lat, lon) for those trades that have a base location."""
+        with self._lock:
+            entries = self._entries
+            slots = np.fromiter((
+                entries[trade_id].slot for trade_id in trade_ids
+                if trade_id in entries and entries[trade_id].slot is not None
+            ), dtype=np.intp)
+            if not len(slots):
+                return {}
+            distances = haversine_km(lat, lon, self._lat[slots], self._lon[slots])
+            return dict(zip(self._ids[slots].tolist(), distances.tolist()))
+
+
+dispatch_index = DispatchIndex()
+
+
+_refresh_thread = None
+
+
+def refresh_dispatch_index():
+    """Scheduler callback: rebuild the index on a background thread, then re-arm.
+
+    The rebuild is a full scan of the trades table, so it runs off the
+    scheduler thread; a refresh still running when the next one is due is
+    left to finish instead of starting another.
+    """
+    global _refresh_thread
+    scheduler.schedule(('refresh_dispatch_index',), time.time() + dispatch_index.refresh_seconds,
+                       refresh_dispatch_index)
+    if _refresh_thread and _refresh_thread.is_alive():
+        return
+    app = current_app._get_current_object()
+
+    def rebuild():
+        with app.app_context():
+            try:
+                dispatch_index.build()
+            except Exception:
+                db.session.rollback()
+                logging.exception('Dispatch index refresh failed')
+            finally:
+                db.session.remove()
+
+    _refresh_thread = threading.Thread(target=rebuild, name='dispatch-index-refresh', daemon=True)
+    _refresh_thread.start()
+
+
+def init_dispatch_index(app):
+    dispatch_index.refresh_seconds = app.config.get('DISPATCH_INDEX_REFRESH_SECONDS', 60)
+    dispatch_index.cell_deg = app.config.get('DISPATCH_GRID_CELL_DEG', 0.1)
+    try:
+        dispatch_index.build()
+    except Exception as e:
+        # Tables may not exist yet (e.g. before the first migration); match() builds lazily.
+        db.session.rollback()
+        logging.warning(f"Dispatch index not built at startup: {str(e)}")
+    if app.config.get('SCHEDULER_ENABLED', True) and dispatch_index.refresh_seconds > 0:
+        scheduler.schedule(('refresh_dispatch_index',), time.time() + dispatch_index.refresh_seconds,
+                           refresh_dispatch_index)
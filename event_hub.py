@@ -0,0 +1,303 @@
+import sys
+import json
+import time
+import queue
+import logging
+import threading
+from datetime import datetime, timedelta
+from flask import request, Response
+from sqlalchemy import event, func, or_, delete
+from sqlalchemy.orm import Session
+from app import db
+from scheduler import scheduler
+from models import StreamEvent, DispatchDecision
+
+
+def job_channel(job_id):
+    return f'job:{job_id}'
+
+
+def trade_channel(trade_id):
+    return f'trade:{trade_id}'
+
+
+def publish(channel, kind, data):
+    """Add an event to the current transaction; subscribers see it only if the transaction commits."""
+    db.session.add(StreamEvent(channel=channel, kind=kind, data=data))
+    db.session.info['stream_events'] = True
+
+
+def publish_job_offers(job, trade_ids, tier):
+    """Tell each trade's stream about a job it has just been alerted to."""
+    data = {'job_id': job.id, 'title': job.title, 'category': job.category,
+            'postcode_district': job.postcode_district, 'urgency': job.urgency, 'tier': tier}
+    for trade_id in trade_ids:
+        publish(trade_channel(trade_id), 'job.offered', data)
+
+
+def publish_job_accepted(job_id, trade_id, accepted_at):
+    """Tell the job's viewers it was accepted, and the other trades it was offered to that it is gone."""
+    publish(job_channel(job_id), 'job.status', {
+        'job_id': job_id, 'status': 'accepted', 'accepted_trade_id': trade_id,
+        'accepted_at': accepted_at.isoformat(),
+    })
+    selected = db.session.query(DispatchDecision.selected).filter_by(job_id=job_id).order_by(
+        DispatchDecision.id.desc()
+    ).limit(1).scalar()
+    for entry in selected or []:
+        if entry['trade_id'] != trade_id:
+            publish(trade_channel(entry['trade_id']), 'job.taken', {'job_id': job_id})
+
+
+@event.listens_for(Session, 'after_commit')
+def _wake_after_commit(session):
+    # Same-process subscribers get the events now rather than at the next poll
+    if session.info.pop('stream_events', False):
+        event_hub.wake()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_after_rollback(session):
+    session.info.pop('stream_events', None)
+
+
+def format_event(event_id, kind, data):
+    return f'id: {event_id}\nevent: {kind}\ndata: {json.dumps(data, separators=(",", ":"))}\n\n'
+
+
+class Subscriber:
+    def __init__(self, channel, size):
+        self.channel = channel
+        self.queue = queue.Queue(size)
+        self.overflowed = False
+
+
+class EventHub:
+    """Fans committed stream events out to this process's SSE subscribers.
+
+    Events are rows in stream_events written in the same transaction as the
+    change they describe, so every worker process sees every event: one
+    background thread per process tails the table by id and copies new rows
+    into the queues of its subscribers on that channel. Ids that commit out
+    of order (concurrent transactions on Postgres) are picked up by
+    re-checking skipped ids for a few seconds. Queues are bounded; a
+    subscriber that falls behind is dropped once its queue is drained, and
+    its client reconnects with Last-Event-ID and replays the rest from the
+    table.
+    """
+
+    def __init__(self):
+        self.app = None
+        self.poll_interval = 0.5
+        self.queue_size = 100
+        self.max_subscribers = 48
+        self.heartbeat_seconds = 15
+        self.max_stream_seconds = 300
+        self.replay_limit = 500
+        self.retention = timedelta(hours=24)
+        self.batch_size = 500
+        self.gap_seconds = 10
+        self._channels = {}  # channel -> set of Subscriber
+        self._count = 0
+        self._last_id = 0
+        self._gaps = {}  # id skipped by the tail -> monotonic time first seen
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def configure(self, app):
+        self.app = app
+        self.poll_interval = app.config.get('EVENT_POLL_SECONDS', 0.5)
+        self.queue_size = app.config.get('EVENT_QUEUE_SIZE', 100)
+        self.max_subscribers = app.config.get('EVENT_MAX_SUBSCRIBERS', 48)
+        self.heartbeat_seconds = app.config.get('EVENT_HEARTBEAT_SECONDS', 15)
+        self.max_stream_seconds = app.config.get('EVENT_STREAM_MAX_SECONDS', 300)
+        self.replay_limit = app.config.get('EVENT_REPLAY_LIMIT', 500)
+        self.retention = timedelta(hours=app.config.get('EVENT_RETENTION_HOURS', 24))
+
+    def wake(self):
+        self._wake.set()
+
+    def subscribe(self, channel):
+        """Register a subscriber on `channel`; None when this process already has max_subscribers."""
+        with self._lock:
+            if self._count >= self.max_subscribers:
+                return None
+            if not self._count:
+                # The tail idles without subscribers; resume it from the current end of the table
+                self._last_id = db.session.query(func.max(StreamEvent.id)).scalar() or 0
+                self._gaps.clear()
+                self._generation += 1
+            subscriber = Subscriber(channel, self.queue_size)
+            self._channels.setdefault(channel, set()).add(subscriber)
+            self._count += 1
+            if not (self._thread and self._thread.is_alive()):
+                self._thread = threading.Thread(target=self._run, name='event-hub', daemon=True)
+                self._thread.start()
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._remove(subscriber)
+
+    def _remove(self, subscriber):
+        subscribers = self._channels.get(subscriber.channel)
+        if subscribers and subscriber in subscribers:
+            subscribers.discard(subscriber)
+            if not subscribers:
+                del self._channels[subscriber.channel]
+            self._count -= 1
+
+    def replay(self, channel, after_id):
+        """Events on `channel` after `after_id`, oldest first, and whether there were more than replay_limit."""
+        rows = db.session.query(StreamEvent.id, StreamEvent.kind, StreamEvent.data).filter(
+            StreamEvent.channel == channel, StreamEvent.id > after_id
+        ).order_by(StreamEvent.id).limit(self.replay_limit + 1).all()
+        return [tuple(row) for row in rows[:self.replay_limit]], len(rows) > self.replay_limit
+
+    def stream(self, subscriber, replay=(), reset=False):
+        """The SSE body for a subscriber: replayed events, then live ones, with heartbeat comments.
+
+        The stream ends after max_stream_seconds (the browser reconnects with
+        Last-Event-ID) so long-lived connections rotate across workers.
+        """
+        deadline = time.monotonic() + self.max_stream_seconds
+        try:
+            yield 'retry: 3000\n\n'
+            if reset:
+                # Too much was missed to replay; the page reloads its state and opens a fresh stream
+                yield 'event: reset\ndata: {}\n\n'
+                return
+            replayed = set()
+            for event_id, kind, data in replay:
+                replayed.add(event_id)
+                yield format_event(event_id, kind, data)
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return
+                try:
+                    event_id, kind, data = subscriber.queue.get(timeout=min(self.heartbeat_seconds, remaining))
+                except queue.Empty:
+                    if subscriber.overflowed:
+                        return
+                    yield ': heartbeat\n\n'
+                    continue
+                if event_id not in replayed:
+                    yield format_event(event_id, kind, data)
+                if subscriber.overflowed and subscriber.queue.empty():
+                    return
+        finally:
+            self.unsubscribe(subscriber)
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+            try:
+                with self.app.app_context():
+                    self._poll()
+            except Exception:
+                logging.exception('Event hub poll failed')
+
+    def _poll(self):
+        with self._lock:
+            if not self._count:
+                return
+            last_id, gaps, generation = self._last_id, list(self._gaps), self._generation
+        criteria = StreamEvent.id > last_id
+        if gaps:
+            criteria = or_(criteria, StreamEvent.id.in_(gaps))
+        rows = db.session.query(StreamEvent.id, StreamEvent.channel, StreamEvent.kind, StreamEvent.data).filter(
+            criteria
+        ).order_by(StreamEvent.id).limit(self.batch_size).all()
+
+        now = time.monotonic()
+        with self._lock:
+            if generation != self._generation:
+                # The tail was resumed from a new position while this query ran
+                return
+            for event_id, channel, kind, data in rows:
+                if self._gaps.pop(event_id, None) is None:
+                    if event_id <= self._last_id:
+                        continue
+                    for missing in range(max(self._last_id + 1, event_id - self.batch_size), event_id):
+                        self._gaps[missing] = now
+                    self._last_id = event_id
+                self._deliver(channel, (event_id, kind, data))
+            for missing, seen in list(self._gaps.items()):
+                if now - seen > self.gap_seconds:
+                    del self._gaps[missing]
+        if len(rows) == self.batch_size:
+            self._wake.set()
+
+    def _deliver(self, channel, item):
+        for subscriber in list(self._channels.get(channel, ())):
+            try:
+                subscriber.queue.put_nowait(item)
+            except queue.Full:
+                subscriber.overflowed = True
+                self._remove(subscriber)
+                logging.info(f"Dropped a slow subscriber on {channel}; it will replay on reconnect")
+
+
+event_hub = EventHub()
+
+
+def serves_concurrently():
+    """False when this worker handles one request at a time (e.g. gunicorn's default sync worker)."""
+    if request.environ.get('wsgi.multithread'):
+        return True
+    monkey = sys.modules.get('gevent.monkey')
+    return bool(monkey and monkey.is_module_patched('socket'))
+
+
+def stream_response(channel):
+    """A text/event-stream Response for `channel`, replaying from the client's Last-Event-ID.
+
+    Refused with a 503 under workers that serve one request at a time, where
+    a stream would block every other request; see gunicorn.conf.py.
+    """
+    if not serves_concurrently():
+        return {'error': 'Live updates are not available on this server'}, 503
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id', '')
+    subscriber = event_hub.subscribe(channel)
+    if subscriber is None:
+        return {'error': 'Too many open streams, retry shortly'}, 503, {'Retry-After': '5'}
+    # Subscribed before replaying, so nothing committed in between is missed (duplicates are skipped)
+    replay, reset = [], False
+    try:
+        if last_event_id.isdigit():
+            replay, reset = event_hub.replay(channel, int(last_event_id))
+    except Exception:
+        event_hub.unsubscribe(subscriber)
+        raise
+    return Response(event_hub.stream(subscriber, replay, reset), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+PRUNE_INTERVAL_SECONDS = 3600
+
+
+def prune_stream_events():
+    """Scheduler callback: delete events past EVENT_RETENTION_HOURS, then re-arm for the next hour.
+
+    Runs on the deadline scheduler of every process that has one (web and
+    outbox workers alike), whether or not anything subscribes there; the
+    DELETE is idempotent, so overlapping runs are harmless.
+    """
+    scheduler.schedule(('prune_stream_events',), time.time() + PRUNE_INTERVAL_SECONDS, prune_stream_events)
+    deleted = db.session.execute(
+        delete(StreamEvent).where(StreamEvent.created_at < datetime.utcnow() - event_hub.retention)
+    ).rowcount
+    db.session.commit()
+    if deleted:
+        logging.info(f"Pruned {deleted} stream events")
+
+
+def init_event_hub(app):
+    event_hub.configure(app)
+    if app.config.get('SCHEDULER_ENABLED', True):
+        # First run a minute after startup, away from the startup work
+        scheduler.schedule(('prune_stream_events',), time.time() + 60, prune_stream_events)
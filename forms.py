@@ -3,6 +3,10 @@ from flask_wtf.file import FileField, FileAllowed, MultipleFileField
 from wtforms import StringField, TextAreaField, PasswordField, SelectField, BooleanField, FloatField, IntegerField, SubmitField, RadioField
 from wtforms.validators import DataRequired, Email, EqualTo, Length, NumberRange, Optional, Regexp
 
+# Comma-separated postcode areas (M, SK) and districts (M1, SK10), matching what trade_coverage can store
+COVERAGE_AREAS_RE = r'^\s*([A-Za-z]{1,2}\s*(,\s*|$))*$'
+COVERAGE_DISTRICTS_RE = r'^\s*([A-Za-z]{1,2}[0-9][A-Za-z0-9]?\s*(,\s*|$))*$'
+
 class LoginForm(FlaskForm):
     email = StringField('Email', validators=[DataRequired(), Email()])
     password = PasswordField('Password', validators=[DataRequired()])
@@ -40,7 +44,8 @@ class RegisterForm(FlaskForm):
         ('glazing', 'Glazing'),
         ('roofing', 'Roofing')
     ], validators=[Optional()])
-    coverage_areas = StringField('Coverage Areas (UK Postcode Areas)', validators=[Optional()],
+    coverage_areas = StringField('Coverage Areas (UK Postcode Areas)', validators=[
+        Optional(), Regexp(COVERAGE_AREAS_RE, message='Enter postcode areas such as M, SK, WA')],
                                 render_kw={'placeholder': 'e.g., M, SK, WA, OL'})
     
     # Required documents for trade professionals
@@ -121,11 +126,17 @@ class TradeProfileForm(FlaskForm):
     utr_number = StringField('UTR Number', validators=[Optional(), Length(max=20)])
     skills = StringField('Skills (comma-separated)', validators=[Optional()], 
                         render_kw={'placeholder': 'e.g., plumbing, heating, roofing, glazing, security systems'})
-    coverage_areas = StringField('Coverage Areas (comma-separated)', validators=[Optional()],
+    coverage_areas = StringField('Coverage Areas (comma-separated)', validators=[
+        Optional(), Regexp(COVERAGE_AREAS_RE, message='Enter postcode areas such as M, SK, WA')],
                                 render_kw={'placeholder': 'e.g., M, SK, WA'})
-    coverage_districts = StringField('Coverage Districts (comma-separated)', validators=[Optional()],
+    coverage_districts = StringField('Coverage Districts (comma-separated)', validators=[
+        Optional(), Regexp(COVERAGE_DISTRICTS_RE, message='Enter postcode districts such as M1, M3, SK1')],
                                    render_kw={'placeholder': 'e.g., M1, M3, SK1'})
     radius_km = FloatField('Coverage Radius (km)', validators=[Optional(), NumberRange(min=0, max=100)])
+    base_postcode = StringField('Base Postcode (for radius coverage)', validators=[
+        Optional(),
+        Regexp(r'^[A-Z]{1,2}[0-9][A-Z0-9]?\s?[0-9][A-Z]{2}$', message='Invalid UK postcode format')
+    ], render_kw={'placeholder': 'e.g., M1 1AE'})
     insurance_document = FileField('Public Liability Insurance Document', 
                                   validators=[Optional(), FileAllowed(['pdf', 'doc', 'docx', 'jpg', 'png'])])
     submit = SubmitField('Update Profile')
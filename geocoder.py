@@ -0,0 +1,177 @@
+import os
+import csv
+import mmap
+import struct
+import bisect
+import logging
+import threading
+from collections import defaultdict
+
+# File layout (little-endian):
+#   header:  8-byte magic, then for each section (unit, sector, district, area)
+#            a (offset uint64, count uint32, key_len uint32) triple
+#   records: key (ASCII, space padded to key_len) + lat + lon as int32 micro-degrees
+# Every section is sorted by key so lookups are a binary search over the mapped file.
+MAGIC = b'TSPCDB01'
+SECTIONS = ('unit', 'sector', 'district', 'area')
+KEY_LENGTHS = {'unit': 7, 'sector': 6, 'district': 4, 'area': 2}
+_SECTION_HEADER = struct.Struct('<QII')
+_HEADER_SIZE = len(MAGIC) + _SECTION_HEADER.size * len(SECTIONS)
+_COORDS = struct.Struct('<ii')
+_SCALE = 1_000_000
+
+
+def postcode_keys(postcode_info):
+    """Return the (unit, sector, district, area) lookup keys for a parsed postcode."""
+    return (
+        postcode_info.full.replace(' ', ''),
+        f"{postcode_info.district} {postcode_info.sector}",
+        postcode_info.district,
+        postcode_info.area,
+    )
+
+
+class _SectionKeys:
+    """Sequence view over one section's keys, so `bisect` can search the mapped file."""
+
+    def __init__(self, buf, offset, count, key_len):
+        self.buf = buf
+        self.offset = offset
+        self.count = count
+        self.key_len = key_len
+        self.record_size = key_len + _COORDS.size
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i):
+        start = self.offset + i * self.record_size
+        return self.buf[start:start + self.key_len]
+
+    def find(self, key):
+        key = key.encode('ascii').ljust(self.key_len)
+        i = bisect.bisect_left(self, key)
+        if i < self.count and self[i] == key:
+            lat, lon = _COORDS.unpack_from(self.buf, self.offset + i * self.record_size + self.key_len)
+            return lat / _SCALE, lon / _SCALE
+        return None
+
+
+class PostcodeDB:
+    """Read-only postcode to lat/lon table backed by a memory-mapped file.
+
+    The mapping is shared through the page cache, so every gunicorn worker
+    that opens the same file reuses the same physical pages.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mm[:len(MAGIC)] != MAGIC:
+            self._mm.close()
+            raise ValueError(f'{path} is not a postcode database')
+
+        self._sections = {}
+        for n, name in enumerate(SECTIONS):
+            offset, count, key_len = _SECTION_HEADER.unpack_from(
+                self._mm, len(MAGIC) + n * _SECTION_HEADER.size
+            )
+            self._sections[name] = _SectionKeys(self._mm, offset, count, key_len)
+
+    def __len__(self):
+        return len(self._sections['unit'])
+
+    def lookup(self, postcode_info):
+        """Return (lat, lon, precision) for the most specific match, or None."""
+        for name, key in zip(SECTIONS, postcode_keys(postcode_info)):
+            coords = self._sections[name].find(key)
+            if coords:
+                return coords[0], coords[1], name
+        return None
+
+    def close(self):
+        self._mm.close()
+
+
+def build_postcode_db(rows, out_path):
+    """Write a postcode database from (postcode_info, lat, lon) rows.
+
+    Sector, district and area records are the centroids of their units.
+    Returns the number of unit records written.
+    """
+    units = {}
+    sums = {name: defaultdict(lambda: [0.0, 0.0, 0]) for name in SECTIONS[1:]}
+    for postcode_info, lat, lon in rows:
+        keys = postcode_keys(postcode_info)
+        units[keys[0]] = (lat, lon)
+        for name, key in zip(SECTIONS[1:], keys[1:]):
+            acc = sums[name][key]
+            acc[0] += lat
+            acc[1] += lon
+            acc[2] += 1
+
+    sections = {'unit': units}
+    for name, groups in sums.items():
+        sections[name] = {key: (s_lat / n, s_lon / n) for key, (s_lat, s_lon, n) in groups.items()}
+
+    tmp_path = out_path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(b'\0' * _HEADER_SIZE)
+        headers = []
+        for name in SECTIONS:
+            key_len = KEY_LENGTHS[name]
+            record = struct.Struct(f'<{key_len}sii')
+            headers.append((f.tell(), len(sections[name]), key_len))
+            for key in sorted(sections[name]):
+                lat, lon = sections[name][key]
+                f.write(record.pack(key.encode('ascii').ljust(key_len), round(lat * _SCALE), round(lon * _SCALE)))
+        f.seek(0)
+        f.write(MAGIC)
+        for header in headers:
+            f.write(_SECTION_HEADER.pack(*header))
+    # Replace atomically so running workers keep their existing mapping
+    os.replace(tmp_path, out_path)
+    return len(units)
+
+
+# UK, Channel Islands and Isle of Man; ukpostcodes.csv and ONSPD give postcodes
+# without a grid reference placeholder coordinates (lat 99.999999, lon 0)
+UK_LAT_RANGE = (49.0, 61.0)
+UK_LON_RANGE = (-8.7, 2.0)
+
+
+def read_postcode_csv(path, parse, postcode_col='postcode', lat_col='latitude', lon_col='longitude'):
+    """Yield (postcode_info, lat, lon) from a CSV file, skipping unparseable rows and coordinates outside the UK."""
+    with open(path, newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            postcode_info = parse(row.get(postcode_col))
+            try:
+                lat, lon = float(row[lat_col]), float(row[lon_col])
+            except (KeyError, TypeError, ValueError):
+                continue
+            if not (UK_LAT_RANGE[0] <= lat <= UK_LAT_RANGE[1] and UK_LON_RANGE[0] <= lon <= UK_LON_RANGE[1]):
+                continue
+            if postcode_info:
+                yield postcode_info, lat, lon
+
+
+_db = None
+_db_opened = False
+_db_lock = threading.Lock()
+
+
+def get_postcode_db(path):
+    """Open the postcode database once per process; None if it is not installed."""
+    global _db, _db_opened
+    if not _db_opened:
+        with _db_lock:
+            if not _db_opened:
+                if path and os.path.exists(path):
+                    try:
+                        _db = PostcodeDB(path)
+                        logging.info(f"Loaded postcode database {path} with {len(_db)} postcodes")
+                    except (OSError, ValueError) as e:
+                        logging.error(f"Could not open postcode database {path}: {str(e)}")
+                _db_opened = True
+    return _db
@@ -0,0 +1,40 @@
+from functools import wraps
+from flask import g, flash, redirect, url_for
+from flask_login import current_user, login_required
+
+
+def current_profile():
+    """The signed-in user's customer or trade profile (None for admins), loaded once per request."""
+    if 'profile' not in g:
+        role = current_user.role
+        g.profile = current_user.customer if role == 'customer' else current_user.trade if role == 'trade' else None
+    return g.profile
+
+
+def role_required(*roles, profile=False, json=False, redirect_to='index', message='Access denied.'):
+    """Let only signed-in users with one of `roles` into a view.
+
+    With profile=True the user's customer or trade profile must exist too;
+    views then read it from current_profile() (or current_user.customer /
+    current_user.trade) at no further cost. Denied requests get a JSON 403
+    when json=True, otherwise `message` is flashed (None for no flash) and
+    they are redirected to `redirect_to`.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if current_user.role not in roles:
+                if json:
+                    return {'error': 'Access denied'}, 403
+                if message:
+                    flash(message, 'danger')
+                return redirect(url_for(redirect_to))
+            if profile and current_user.role != 'admin' and current_profile() is None:
+                if json:
+                    return {'error': 'Profile not found'}, 403
+                if message:
+                    flash(f'{current_user.role.capitalize()} profile not found.', 'danger')
+                return redirect(url_for(redirect_to))
+            return view(*args, **kwargs)
+        return login_required(wrapper)
+    return decorator
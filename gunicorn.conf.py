@@ -0,0 +1,17 @@
+"""Gunicorn settings; picked up automatically by `gunicorn main:app` run from the project root.
+
+The live job and trade streams (/job/<id>/events, /trade/events) each hold a
+request thread for up to EVENT_STREAM_MAX_SECONDS, so workers must serve
+requests on threads. With the default sync worker one open job page would
+block the whole worker, and the app refuses streams there with a 503.
+Keep EVENT_MAX_SUBSCRIBERS below GUNICORN_THREADS so streams always leave
+threads free for ordinary requests.
+"""
+import os
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('GUNICORN_WORKERS', 2))
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 64))
+# gthread workers heartbeat from their main loop, so long streams do not trip the timeout
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
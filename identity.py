@@ -0,0 +1,73 @@
+from flask import current_app
+from flask_login import UserMixin
+from app import db
+from models import User, Customer, Trade
+from cache import cache
+
+
+class Identity(UserMixin):
+    """What load_user puts in current_user: the user's id, role, email and profile ids.
+
+    It is built from one joined query and cached per process for
+    IDENTITY_CACHE_SECONDS, and Flask-Login keeps it for the rest of the
+    request. So routes get `customer_id` / `trade_id` with no query, and
+    `customer` / `trade` with one primary-key lookup memoized for the
+    request. Any other User attribute loads the users row on first use.
+    """
+
+    def __init__(self, id, role, email, customer_id=None, trade_id=None):
+        self.id = id
+        self.role = role
+        self.email = email
+        self.customer_id = customer_id
+        self.trade_id = trade_id
+        self._loaded = {}
+
+    def _get(self, model, pk):
+        if pk is None:
+            return None
+        if model not in self._loaded:
+            self._loaded[model] = db.session.get(model, pk)
+        return self._loaded[model]
+
+    @property
+    def user(self):
+        return self._get(User, self.id)
+
+    @property
+    def customer(self):
+        return self._get(Customer, self.customer_id)
+
+    @property
+    def trade(self):
+        return self._get(Trade, self.trade_id)
+
+    def __getattr__(self, name):
+        # Only reached for attributes not set above, e.g. templates using current_user.verified
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return getattr(self.user, name)
+
+
+def _query_identity(user_id):
+    row = db.session.query(User.id, User.role, User.email, Customer.id, Trade.id).outerjoin(
+        Customer, Customer.user_id == User.id
+    ).outerjoin(
+        Trade, Trade.user_id == User.id
+    ).filter(User.id == user_id).first()
+    return tuple(row) if row else None
+
+
+def load_identity(user_id):
+    """The Identity for a user id, or None if the user does not exist."""
+    row = cache.get_or_set(f'identity:{user_id}', lambda: _query_identity(user_id),
+                           current_app.config.get('IDENTITY_CACHE_SECONDS', 60))
+    return Identity(*row) if row else None
+
+
+def invalidate_identity(user_id):
+    """Drop this process's cached identity after a user's role or profiles change.
+
+    Other processes pick the change up within IDENTITY_CACHE_SECONDS.
+    """
+    cache.delete(f'identity:{user_id}')
@@ -0,0 +1,157 @@
+import io
+import csv
+import json
+import logging
+from itertools import islice
+from datetime import datetime
+from sqlalchemy import insert
+from app import db
+from models import Job
+from utils import parse_postcodes, geocode_postcodes
+import outbox
+from sla import sla_monitor
+from rollups import record_posted
+
+REQUIRED_FIELDS = ('customer_name', 'customer_phone', 'title', 'category', 'description', 'postcode', 'urgency')
+OPTIONAL_FIELDS = ('customer_email', 'customer_house_number', 'customer_street', 'customer_town')
+URGENCIES = ('emergency_now', 'urgent_2h', 'same_day', 'next_day')
+
+
+def read_rows(stream, fmt):
+    """Yield (line_number, row) from a JSONL or CSV text stream without loading it all.
+
+    A JSONL line that is not a JSON object is yielded as a ValueError so it is
+    reported like any other bad row.
+    """
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+        return
+
+    for line_number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield line_number, ValueError(f'invalid JSON: {e}')
+            continue
+        if not isinstance(row, dict):
+            row = ValueError('expected a JSON object')
+        yield line_number, row
+
+
+def open_text(binary_stream):
+    return io.TextIOWrapper(binary_stream, encoding='utf-8', newline='')
+
+
+def _clean(row):
+    """Return (fields, None) with every given field as a stripped string, or (None, error).
+
+    Values must be strings or numbers and fit their Job column, so one bad
+    row is reported on its own rather than failing the chunk's insert.
+    """
+    if isinstance(row, Exception):
+        return None, str(row)
+    fields = {}
+    for field in REQUIRED_FIELDS + OPTIONAL_FIELDS:
+        value = row.get(field)
+        if value is None:
+            continue
+        if isinstance(value, bool) or not isinstance(value, (str, int, float)):
+            return None, f'{field} must be a string'
+        value = str(value).strip()
+        if not value:
+            continue
+        column = Job.__table__.columns.get(field)
+        max_length = getattr(column.type, 'length', None) if column is not None else None
+        if max_length and len(value) > max_length:
+            return None, f'{field} longer than {max_length} characters'
+        fields[field] = value
+    missing = [field for field in REQUIRED_FIELDS if field not in fields]
+    if missing:
+        return None, f"missing {', '.join(missing)}"
+    if fields['urgency'] not in URGENCIES:
+        return None, f"unknown urgency {fields['urgency']!r}"
+    return fields, None
+
+
+def ingest_chunk(rows, errors):
+    """Validate, geocode and bulk insert one chunk of (line_number, row) pairs.
+
+    Bad rows are appended to `errors` and skipped. The inserted jobs and one
+    'jobs.bulk_posted' outbox message commit together. Returns the new job ids.
+    """
+    valid = []
+    for line_number, row in rows:
+        fields, error = _clean(row)
+        if error:
+            errors.append({'line': line_number, 'error': error})
+        else:
+            valid.append((line_number, fields))
+
+    postcodes = parse_postcodes(row['postcode'] for _, row in valid)
+    parsed = []
+    for (line_number, row), postcode_info in zip(valid, postcodes):
+        if postcode_info:
+            parsed.append((row, postcode_info))
+        else:
+            errors.append({'line': line_number, 'error': f"invalid UK postcode {row['postcode']!r}"})
+    if not parsed:
+        return []
+
+    now = datetime.utcnow()
+    coords = geocode_postcodes(postcode_info for _, postcode_info in parsed)
+    values = []
+    for (row, postcode_info), (lat, lon) in zip(parsed, coords):
+        job = {field: value for field, value in row.items() if field != 'postcode'}
+        job.update(
+            postcode_full=postcode_info.full,
+            postcode_area=postcode_info.area,
+            postcode_district=postcode_info.district,
+            lat=lat,
+            lon=lon,
+            urgency_sla_minutes=Job.get_urgency_sla_minutes(row['urgency']),
+            status='posted',
+            created_at=now,
+            updated_at=now,
+        )
+        values.append(job)
+
+    job_ids = db.session.execute(insert(Job).returning(Job.id, sort_by_parameter_order=True), values).scalars().all()
+    outbox.enqueue('jobs.bulk_posted', {'job_ids': job_ids})
+    record_posted((now, job['postcode_area'], job['category'], job['urgency']) for job in values)
+    db.session.commit()
+    for job_id, job in zip(job_ids, values):
+        sla_monitor.track(job_id, now, job['urgency_sla_minutes'])
+    return job_ids
+
+
+def ingest_jobs(rows, chunk_size=500, source=None):
+    """Ingest (line_number, row) pairs in chunks; one chunk failing doesn't abort the rest.
+
+    Returns a summary with per-row errors.
+    """
+    summary = {'received': 0, 'inserted': 0, 'chunks': 0, 'errors': []}
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            break
+        summary['received'] += len(chunk)
+        summary['chunks'] += 1
+        errors = []
+        try:
+            summary['inserted'] += len(ingest_chunk(chunk, errors))
+        except Exception as e:
+            db.session.rollback()
+            logging.error(f"Bulk ingest chunk {summary['chunks']} failed: {str(e)}")
+            failed = {error['line'] for error in errors}
+            errors += [{'line': line_number, 'error': 'chunk insert failed'}
+                       for line_number, _ in chunk if line_number not in failed]
+        summary['errors'] += sorted(errors, key=lambda error: error['line'])
+
+    logging.info(f"Bulk ingest from {source or 'unknown source'}: {summary['inserted']} of "
+                 f"{summary['received']} jobs inserted in {summary['chunks']} chunks")
+    return summary
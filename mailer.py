@@ -0,0 +1,119 @@
+import time
+import smtplib
+import logging
+import threading
+from flask import current_app
+from app import mail
+
+# Errors that mean the connection itself is unusable; anything else is specific to one message
+CONNECTION_ERRORS = (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError, ConnectionError, TimeoutError)
+
+
+class SMTPPool:
+    """Small pool of long-lived Flask-Mail connections.
+
+    Each connection is opened (TCP, STARTTLS, login) once and reused for many
+    messages across batches. Connections idle longer than `max_idle_seconds`
+    are closed instead of reused, since servers drop idle sessions.
+    """
+
+    def __init__(self, size=4, max_idle_seconds=30):
+        self.size = size
+        self.max_idle_seconds = max_idle_seconds
+        self._idle = []  # [(connection, last_used)]
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        now = time.monotonic()
+        with self._lock:
+            while self._idle:
+                conn, last_used = self._idle.pop()
+                if now - last_used <= self.max_idle_seconds:
+                    return conn
+                self._close(conn)
+        return self._open()
+
+    def release(self, conn):
+        with self._lock:
+            if len(self._idle) < self.size:
+                self._idle.append((conn, time.monotonic()))
+                return
+        self._close(conn)
+
+    def discard(self, conn):
+        self._close(conn)
+
+    def close_all(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn, _ in idle:
+            self._close(conn)
+
+    @staticmethod
+    def _open():
+        conn = mail.connect()
+        conn.__enter__()
+        return conn
+
+    @staticmethod
+    def _close(conn):
+        try:
+            conn.__exit__(None, None, None)
+        except Exception:
+            # The server may already have hung up
+            pass
+
+    def send_batch(self, messages):
+        """Send messages over one pooled connection.
+
+        A dropped connection is reopened and the message retried once; any
+        other failure is logged and only skips that message. If no connection
+        can be opened at all, the rest of the batch is abandoned. Returns the
+        number of messages sent.
+        """
+        sent = 0
+        conn = None
+        try:
+            for msg in messages:
+                for attempt in (1, 2):
+                    if conn is None:
+                        try:
+                            conn = self.acquire()
+                        except Exception as e:
+                            logging.error(f"Could not connect to mail server: {str(e)}")
+                            return sent
+                    try:
+                        conn.send(msg)
+                        sent += 1
+                        break
+                    except CONNECTION_ERRORS as e:
+                        self.discard(conn)
+                        conn = None
+                        if attempt == 2:
+                            logging.error(f"Failed to send email to {', '.join(msg.recipients)}: {str(e)}")
+                    except Exception as e:
+                        logging.error(f"Failed to send email to {', '.join(msg.recipients)}: {str(e)}")
+                        break
+        finally:
+            if conn is not None:
+                self.release(conn)
+        return sent
+
+
+smtp_pool = SMTPPool()
+
+
+def init_mailer(app):
+    smtp_pool.size = app.config.get('MAIL_POOL_SIZE', 4)
+    smtp_pool.max_idle_seconds = app.config.get('MAIL_POOL_MAX_IDLE_SECONDS', 30)
+
+
+def send_messages(messages):
+    """Deliver a batch of Flask-Mail messages, reusing pooled SMTP connections."""
+    messages = list(messages)
+    if not messages:
+        return 0
+    sent = smtp_pool.send_batch(messages)
+    if sent < len(messages):
+        logging.warning(f"Delivered {sent} of {len(messages)} emails via {current_app.config.get('MAIL_SERVER')}")
+    return sent
@@ -0,0 +1,77 @@
+"""Add the trades and jobs columns and indexes that db.create_all() cannot add
+
+Databases created before migrations existed get their new tables from
+db.create_all() at startup, but not new columns or indexes on the tables
+they already had. This adds them, skipping any that are already present,
+so it is safe on both old and freshly created databases.
+
+Revision ID: 3f1c2a7b9d04
+Revises:
+Create Date: 2026-10-17 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f1c2a7b9d04'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+COLUMNS = {
+    'trades': [
+        sa.Column('capability_mask', sa.Integer()),  # NULL is derived from skills on read
+        sa.Column('base_postcode', sa.String(length=10)),
+        sa.Column('base_lat', sa.Float()),
+        sa.Column('base_lon', sa.Float()),
+    ],
+    'jobs': [
+        sa.Column('dispatched_at', sa.DateTime()),
+        sa.Column('sla_breached_at', sa.DateTime()),
+        sa.Column('completed_at', sa.DateTime()),
+    ],
+}
+
+# (table, index name, columns)
+INDEXES = [
+    ('customers', 'ix_customers_user_id', ['user_id']),
+    ('trades', 'ix_trades_user_id', ['user_id']),
+    ('trades', 'ix_trades_verified_created_at_id', ['verified', 'created_at', 'id']),
+    ('trades', 'ix_trades_created_at_id', ['created_at', 'id']),
+    ('jobs', 'ix_jobs_status', ['status']),
+    ('jobs', 'ix_jobs_accepted_trade_id', ['accepted_trade_id']),
+    ('jobs', 'ix_jobs_created_at', ['created_at']),
+    ('jobs', 'ix_jobs_status_sla_created_at', ['status', 'urgency_sla_minutes', 'created_at']),
+    ('trade_documents', 'ix_trade_documents_trade_id', ['trade_id']),
+]
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    added = set()
+    for table, columns in COLUMNS.items():
+        existing = {column['name'] for column in inspector.get_columns(table)}
+        for column in columns:
+            if column.name not in existing:
+                op.add_column(table, column)
+                added.add((table, column.name))
+
+    for table, name, columns in INDEXES:
+        if name not in {index['name'] for index in inspector.get_indexes(table)}:
+            op.create_index(name, table, columns)
+
+    if ('jobs', 'completed_at') in added:
+        # Completions before the column existed are counted at their last update
+        op.execute("UPDATE jobs SET completed_at = updated_at WHERE status = 'completed'")
+
+
+def downgrade():
+    for table, name, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
+    for table, columns in COLUMNS.items():
+        with op.batch_alter_table(table) as batch_op:
+            for column in reversed(columns):
+                batch_op.drop_column(column.name)
@@ -1,8 +1,11 @@
+import re
 from datetime import datetime
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
 from app import db
+from capabilities import skills_to_mask
+from auth import password_hasher
 import json
 
 class User(UserMixin, db.Model):
@@ -20,7 +23,7 @@ class User(UserMixin, db.Model):
     trade_profile = db.relationship('Trade', backref='user', uselist=False, cascade='all, delete-orphan')
     
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = generate_password_hash(password, password_hasher.method)
     
     def check_password(self, password):
         return check_password_hash(self.password_hash, password)
@@ -32,7 +35,7 @@ class Customer(db.Model):
     __tablename__ = 'customers'
     
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
     name = db.Column(db.String(100), nullable=False)
     phone = db.Column(db.String(20))
     postcode = db.Column(db.String(10))
@@ -50,18 +53,28 @@ class Customer(db.Model):
 
 class Trade(db.Model):
     __tablename__ = 'trades'
+    __table_args__ = (
+        # Keyset pagination of the trade directory and admin listing
+        db.Index('ix_trades_verified_created_at_id', 'verified', 'created_at', 'id'),
+        db.Index('ix_trades_created_at_id', 'created_at', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
     company = db.Column(db.String(100), nullable=False)
     companies_house_number = db.Column(db.String(20), nullable=True)
     vat_number = db.Column(db.String(20))
     utr_number = db.Column(db.String(20))
     # Prefer JSON columns for structured lists. JSON is supported by both SQLite (as text) and PostgreSQL.
     skills = db.Column(db.JSON, nullable=True)  # JSON array of skills
+    capability_mask = db.Column(db.Integer)  # bitmask of skills, see capabilities.py
     coverage_areas = db.Column(db.JSON, nullable=True)  # JSON array of postcode areas (e.g., ["M", "SK"])
     coverage_districts = db.Column(db.JSON, nullable=True)  # JSON array of postcode districts (e.g., ["M1", "M3"])
     radius_km = db.Column(db.Float)
+    # Base location used for radius dispatch (geocoded from base_postcode)
+    base_postcode = db.Column(db.String(10))
+    base_lat = db.Column(db.Float)
+    base_lon = db.Column(db.Float)
     insurance_document_url = db.Column(db.String(255))
     rating_avg = db.Column(db.Float, default=0.0)
     review_count = db.Column(db.Integer, default=0)
@@ -76,6 +89,7 @@ class Trade(db.Model):
     accepted_jobs = db.relationship('Job', backref='accepted_trade', lazy=True)
     reviews_received = db.relationship('Review', backref='trade', lazy=True)
     documents = db.relationship('TradeDocument', backref='trade', lazy=True, cascade='all, delete-orphan')
+    coverage = db.relationship('TradeCoverage', lazy=True, cascade='all, delete-orphan')
     
     def get_skills(self):
         return self.skills if self.skills else []
@@ -85,25 +99,88 @@ class Trade(db.Model):
         if isinstance(skills_list, str):
             skills_list = [s.strip() for s in skills_list.split(',') if s.strip()]
         self.skills = skills_list
+        self.capability_mask = skills_to_mask(skills_list)
+
+    def get_capability_mask(self):
+        # Rows written before capability_mask existed are derived from skills
+        if self.capability_mask is None:
+            return skills_to_mask(self.get_skills())
+        return self.capability_mask
 
     def get_coverage_areas(self):
         return self.coverage_areas if self.coverage_areas else []
 
     def set_coverage_areas(self, areas_list):
-        if isinstance(areas_list, str):
-            areas_list = [a.strip().upper() for a in areas_list.split(',') if a.strip()]
-        self.coverage_areas = areas_list
+        self.coverage_areas = self._set_coverage('area', areas_list)
 
     def get_coverage_districts(self):
         return self.coverage_districts if self.coverage_districts else []
 
     def set_coverage_districts(self, districts_list):
-        if isinstance(districts_list, str):
-            districts_list = [d.strip().upper() for d in districts_list.split(',') if d.strip()]
-        self.coverage_districts = districts_list
+        self.coverage_districts = self._set_coverage('district', districts_list)
+
+    def _set_coverage(self, kind, codes):
+        """Replace this trade's trade_coverage rows of one kind; returns the normalized codes."""
+        # Accept either a list or a comma-separated string
+        if isinstance(codes, str):
+            codes = codes.split(',')
+        codes = [c.strip().upper() for c in codes or [] if c and c.strip()]
+        # Anything that is not a postcode area/district could never match a job (and would overflow code)
+        codes = list(dict.fromkeys(c for c in codes if COVERAGE_CODE_RE[kind].fullmatch(c)))
+
+        kept = {c.code: c for c in self.coverage if c.kind == kind and c.code in codes}
+        self.coverage = [c for c in self.coverage if c.kind != kind] + [
+            kept.get(code) or TradeCoverage(kind=kind, code=code) for code in codes
+        ]
+        return codes
+
+COVERAGE_CODE_RE = {'area': re.compile(r'[A-Z]{1,2}'), 'district': re.compile(r'[A-Z]{1,2}[0-9][A-Z0-9]?')}
+
+class TradeCoverage(db.Model):
+    """One postcode area or district a trade covers; mirrors Trade.coverage_areas/coverage_districts."""
+    __tablename__ = 'trade_coverage'
+    __table_args__ = (db.Index('ix_trade_coverage_kind_code', 'kind', 'code', 'trade_id'),)
+
+    trade_id = db.Column(db.Integer, db.ForeignKey('trades.id', ondelete='CASCADE'), primary_key=True)
+    kind = db.Column(db.String(10), primary_key=True)  # area, district
+    code = db.Column(db.String(5), primary_key=True)
+
+    @staticmethod
+    def covering(area=None, district=None):
+        """Select the ids of trades covering the area or the district, using the (kind, code) index."""
+        conditions = []
+        if area:
+            conditions.append(db.and_(TradeCoverage.kind == 'area', TradeCoverage.code == area.upper()))
+        if district:
+            conditions.append(db.and_(TradeCoverage.kind == 'district', TradeCoverage.code == district.upper()))
+        return db.select(TradeCoverage.trade_id).where(db.or_(*conditions))
+
+class JobRollup(db.Model):
+    """Hourly job counts per postcode area, category and urgency, kept up to date by rollups.py.
+
+    Posted jobs count in the hour they were created, accepted and completed
+    jobs in the hour of that transition. The accept_* columns are a histogram
+    of time-to-accept for the jobs accepted in the hour.
+    """
+    __tablename__ = 'job_rollups_hourly'
+
+    hour = db.Column(db.DateTime, primary_key=True)  # start of the UTC hour
+    postcode_area = db.Column(db.String(5), primary_key=True)
+    category = db.Column(db.String(50), primary_key=True)
+    urgency = db.Column(db.String(20), primary_key=True)
+    posted = db.Column(db.Integer, nullable=False, default=0)
+    accepted = db.Column(db.Integer, nullable=False, default=0)
+    completed = db.Column(db.Integer, nullable=False, default=0)
+    accept_seconds_total = db.Column(db.BigInteger, nullable=False, default=0)
+    accept_under_5m = db.Column(db.Integer, nullable=False, default=0)
+    accept_under_15m = db.Column(db.Integer, nullable=False, default=0)
+    accept_under_1h = db.Column(db.Integer, nullable=False, default=0)
+    accept_under_4h = db.Column(db.Integer, nullable=False, default=0)
+    accept_over_4h = db.Column(db.Integer, nullable=False, default=0)
 
 class Job(db.Model):
     __tablename__ = 'jobs'
+    __table_args__ = (db.Index('ix_jobs_status_sla_created_at', 'status', 'urgency_sla_minutes', 'created_at'),)
     
     id = db.Column(db.Integer, primary_key=True)
     customer_id = db.Column(db.Integer, db.ForeignKey('customers.id'), nullable=True)
@@ -126,10 +203,13 @@ class Job(db.Model):
     lon = db.Column(db.Float)
     urgency = db.Column(db.String(20), nullable=False)  # emergency_now, urgent_2h, same_day, next_day
     urgency_sla_minutes = db.Column(db.Integer, nullable=False)
-    status = db.Column(db.String(20), default='posted')  # posted, accepted, en_route, in_progress, completed, canceled
-    accepted_trade_id = db.Column(db.Integer, db.ForeignKey('trades.id'))
+    status = db.Column(db.String(20), default='posted', index=True)  # posted, accepted, en_route, in_progress, completed, canceled
+    accepted_trade_id = db.Column(db.Integer, db.ForeignKey('trades.id'), index=True)
     accepted_at = db.Column(db.DateTime)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    dispatched_at = db.Column(db.DateTime)  # set once matching trades have been selected
+    sla_breached_at = db.Column(db.DateTime)  # set once when the job is still unaccepted at its SLA deadline
+    completed_at = db.Column(db.DateTime)  # set by rollups.record_job_completed
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Relationships
@@ -156,15 +236,16 @@ class Job(db.Model):
             address_parts.append(self.postcode_full)
         return ', '.join(address_parts)
     
+    URGENCY_SLA_MINUTES = {
+        'emergency_now': 0,
+        'urgent_2h': 120,
+        'same_day': 480,
+        'next_day': 1440
+    }
+
     @staticmethod
     def get_urgency_sla_minutes(urgency):
-        urgency_mapping = {
-            'emergency_now': 0,
-            'urgent_2h': 120,
-            'same_day': 480,
-            'next_day': 1440
-        }
-        return urgency_mapping.get(urgency, 480)
+        return Job.URGENCY_SLA_MINUTES.get(urgency, 480)
 
 class Message(db.Model):
     __tablename__ = 'messages'
@@ -243,11 +324,68 @@ class WebhookEvent(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
 
+class DispatchDecision(db.Model):
+    """Why a job was sent to the trades it was sent to."""
+    __tablename__ = 'dispatch_decisions'
+
+    id = db.Column(db.Integer, primary_key=True)
+    job_id = db.Column(db.Integer, db.ForeignKey('jobs.id'), nullable=False, index=True)
+    candidate_count = db.Column(db.Integer, nullable=False)
+    selected_count = db.Column(db.Integer, nullable=False)
+    top_k = db.Column(db.Integer, nullable=False)
+    weights = db.Column(db.JSON)
+    selected = db.Column(db.JSON)  # [{trade_id, rank, score, components}] in rank order
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class NotificationWave(db.Model):
+    """A delayed batch of job alerts, persisted so it survives a worker restart."""
+    __tablename__ = 'notification_waves'
+
+    id = db.Column(db.Integer, primary_key=True)
+    job_id = db.Column(db.Integer, db.ForeignKey('jobs.id'), nullable=False, index=True)
+    tier = db.Column(db.String(20), nullable=False, default='standard')
+    trade_ids = db.Column(db.JSON, nullable=False)
+    due_at = db.Column(db.DateTime, nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='pending', index=True)  # pending, sent, canceled
+    sent_at = db.Column(db.DateTime)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class OutboxMessage(db.Model):
+    """Transactional outbox: side effects written with the data they follow from."""
+    __tablename__ = 'outbox'
+    __table_args__ = (db.Index('ix_outbox_status_available_at', 'status', 'available_at'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    topic = db.Column(db.String(50), nullable=False)  # job.posted, etc.
+    payload = db.Column(db.JSON, nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending, processing, done, dead
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    available_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    locked_at = db.Column(db.DateTime)
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    processed_at = db.Column(db.DateTime)
+
+
+class StreamEvent(db.Model):
+    """An event for the live streams, kept for Last-Event-ID replay until EVENT_RETENTION_HOURS."""
+    __tablename__ = 'stream_events'
+    __table_args__ = (db.Index('ix_stream_events_channel_id', 'channel', 'id'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    channel = db.Column(db.String(40), nullable=False)  # job:<id>, trade:<id>
+    kind = db.Column(db.String(30), nullable=False)  # message, job.status, job.offered, job.taken
+    data = db.Column(db.JSON, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+
 class TradeDocument(db.Model):
     __tablename__ = 'trade_documents'
 
     id = db.Column(db.Integer, primary_key=True)
-    trade_id = db.Column(db.Integer, db.ForeignKey('trades.id'), nullable=False)
+    trade_id = db.Column(db.Integer, db.ForeignKey('trades.id'), nullable=False, index=True)
     filename = db.Column(db.String(255), nullable=False)
     file_type = db.Column(db.String(50), nullable=False)  # insurance, qualification, gas_safe, other
     uploaded_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -0,0 +1,166 @@
+import time
+import random
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from sqlalchemy import update, func
+from app import db
+from models import OutboxMessage
+
+# topic -> handler(payload); handlers register themselves with @handler(topic)
+HANDLERS = {}
+
+
+def handler(topic):
+    def register(fn):
+        HANDLERS[topic] = fn
+        return fn
+    return register
+
+
+def enqueue(topic, payload):
+    """Add a message to the current transaction; it is delivered only if the transaction commits."""
+    message = OutboxMessage(topic=topic, payload=payload)
+    db.session.add(message)
+    return message
+
+
+def backoff_seconds(attempts, base, cap):
+    """Exponential backoff with jitter for the given number of failed attempts."""
+    delay = min(cap, base * 2 ** (attempts - 1))
+    return delay * random.uniform(0.5, 1.0)
+
+
+class OutboxWorker:
+    """Drains the outbox with a thread pool, retrying failures with backoff.
+
+    Messages are claimed with a conditional UPDATE (pending -> processing), so
+    several worker processes can share one outbox. A message left in
+    'processing' longer than the lease (e.g. by a crashed worker) is claimed
+    again. After `max_attempts` failures a message is dead-lettered.
+    """
+
+    def __init__(self, app, threads=4, batch_size=20, poll_interval=1.0):
+        self.app = app
+        self.threads = threads
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = app.config.get('OUTBOX_MAX_ATTEMPTS', 8)
+        self.backoff_base = app.config.get('OUTBOX_BACKOFF_SECONDS', 5)
+        self.backoff_cap = app.config.get('OUTBOX_BACKOFF_MAX_SECONDS', 900)
+        self.lease_seconds = app.config.get('OUTBOX_LEASE_SECONDS', 300)
+        self.stop_event = threading.Event()
+        self.processed = 0
+        self.failed = 0
+
+    def stop(self):
+        self.stop_event.set()
+
+    def run(self):
+        logging.info(f"Outbox worker started with {self.threads} threads")
+        with ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix='outbox') as pool:
+            while not self.stop_event.is_set():
+                with self.app.app_context():
+                    message_ids = self.claim_batch()
+                    db.session.remove()
+                if not message_ids:
+                    self.stop_event.wait(self.poll_interval)
+                    continue
+                # Wait for the batch so claims never run far ahead of the pool
+                list(pool.map(self.process, message_ids))
+
+    def claim_batch(self):
+        now = datetime.utcnow()
+        lease_expired = now - timedelta(seconds=self.lease_seconds)
+        candidates = db.session.query(OutboxMessage.id).filter(
+            db.or_(
+                db.and_(OutboxMessage.status == 'pending', OutboxMessage.available_at <= now),
+                db.and_(OutboxMessage.status == 'processing', OutboxMessage.locked_at < lease_expired),
+            )
+        ).order_by(OutboxMessage.id).limit(self.batch_size).all()
+
+        claimed = []
+        for (message_id,) in candidates:
+            result = db.session.execute(
+                update(OutboxMessage)
+                .where(OutboxMessage.id == message_id)
+                .where(db.or_(
+                    OutboxMessage.status == 'pending',
+                    db.and_(OutboxMessage.status == 'processing', OutboxMessage.locked_at < lease_expired),
+                ))
+                .values(status='processing', locked_at=now)
+            )
+            if result.rowcount:
+                claimed.append(message_id)
+        db.session.commit()
+        return claimed
+
+    def process(self, message_id):
+        with self.app.app_context():
+            try:
+                message = db.session.get(OutboxMessage, message_id)
+                started = time.perf_counter()
+                try:
+                    HANDLERS[message.topic](message.payload)
+                except Exception as e:
+                    db.session.rollback()
+                    message.attempts += 1
+                    self._record_failure(message, e)
+                else:
+                    message.attempts += 1
+                    message.status = 'done'
+                    message.processed_at = datetime.utcnow()
+                    self.processed += 1
+                    logging.info(f"Outbox message {message.id} ({message.topic}) handled in "
+                                 f"{(time.perf_counter() - started) * 1000:.0f}ms")
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                logging.exception(f"Outbox message {message_id} could not be processed")
+            finally:
+                db.session.remove()
+
+    def _record_failure(self, message, error):
+        self.failed += 1
+        message.last_error = f"{type(error).__name__}: {error}"[:1000]
+        if message.attempts >= self.max_attempts:
+            message.status = 'dead'
+            logging.error(f"Outbox message {message.id} ({message.topic}) dead-lettered: {message.last_error}")
+        else:
+            delay = backoff_seconds(message.attempts, self.backoff_base, self.backoff_cap)
+            message.status = 'pending'
+            message.available_at = datetime.utcnow() + timedelta(seconds=delay)
+            logging.warning(f"Outbox message {message.id} ({message.topic}) failed, retrying in {delay:.0f}s: "
+                            f"{message.last_error}")
+
+
+def outbox_metrics(sample_size=500):
+    """Queue depth per status, age of the oldest pending message and recent delivery latency."""
+    now = datetime.utcnow()
+    depth = dict(db.session.query(OutboxMessage.status, func.count(OutboxMessage.id))
+                 .group_by(OutboxMessage.status).all())
+    oldest_pending = db.session.query(func.min(OutboxMessage.created_at)).filter(
+        OutboxMessage.status.in_(['pending', 'processing'])
+    ).scalar()
+
+    recent = db.session.query(OutboxMessage.created_at, OutboxMessage.processed_at).filter(
+        OutboxMessage.status == 'done'
+    ).order_by(OutboxMessage.id.desc()).limit(sample_size).all()
+    latencies = sorted((processed - created).total_seconds() for created, processed in recent)
+
+    def percentile(p):
+        if not latencies:
+            return None
+        return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))], 3)
+
+    return {
+        'depth': {status: depth.get(status, 0) for status in ('pending', 'processing', 'done', 'dead')},
+        'oldest_pending_age_seconds': round((now - oldest_pending).total_seconds(), 1) if oldest_pending else None,
+        'latency_seconds': {
+            'sample': len(latencies),
+            'p50': percentile(0.50),
+            'p95': percentile(0.95),
+            'max': latencies[-1] if latencies else None,
+        },
+    }
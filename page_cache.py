@@ -0,0 +1,127 @@
+import os
+import hashlib
+import logging
+from functools import wraps
+from datetime import datetime, timezone
+from urllib.parse import urlencode
+from flask import current_app, request, session, make_response
+from flask_login import current_user
+from cache import LRUCache, SQLiteStore
+
+
+class PageCache:
+    """Rendered pages and fragments for anonymous visitors, invalidated by tag.
+
+    Every cache key embeds the current version of each of its tags, so
+    `invalidate('trades')` is a single write of a new version and the old
+    entries simply stop being read until they expire or are evicted. The
+    default SQLite backend is shared by every worker on the host, so that
+    write reaches all of them at once. The in-process LRU backend keeps tag
+    versions per worker and suits a single worker only: elsewhere the other
+    workers would serve the old page until the TTL.
+    """
+
+    def __init__(self):
+        self.store = None
+        self.ttl = 300
+
+    def configure(self, store, ttl):
+        self.store = store
+        self.ttl = ttl
+
+    def _tag_versions(self, tags):
+        versions = []
+        for tag in sorted(tags):
+            version = self.store.get(f'tag:{tag}')
+            if version is None:
+                # Unknown or evicted: start a fresh version so no older entry can match again
+                version = os.urandom(6).hex()
+                self.store.set(f'tag:{tag}', version)
+            versions.append(version)
+        return '.'.join(versions)
+
+    def invalidate(self, *tags):
+        if not self.store:
+            return
+        for tag in tags:
+            self.store.set(f'tag:{tag}', os.urandom(6).hex())
+
+    def fragment(self, key, tags, render, ttl=None):
+        """Return a cached rendering of `key`, calling `render()` on a miss; `render` returns a string."""
+        if not self.store:
+            return render()
+        full_key = f'fragment:{key}:{self._tag_versions(tags)}'
+        value = self.store.get(full_key)
+        if value is None:
+            value = render()
+            self.store.set(full_key, value, ttl or self.ttl)
+        return value
+
+    def lookup(self, key, tags):
+        full_key = f'page:{key}:{self._tag_versions(tags)}'
+        return full_key, self.store.get(full_key)
+
+
+page_cache = PageCache()
+
+
+def respond_from_entry(entry):
+    response = current_app.response_class(entry['body'], mimetype=entry['mimetype'])
+    response.set_etag(entry['etag'])
+    response.last_modified = datetime.fromtimestamp(entry['last_modified'], timezone.utc)
+    # Browsers and proxies may keep a copy but must revalidate it, which is a cheap 304 from here
+    response.headers['Cache-Control'] = 'public, no-cache'
+    response.vary.add('Cookie')
+    return response.make_conditional(request)
+
+
+def cached_page(*tags):
+    """Serve a GET view's response to anonymous visitors from the page cache.
+
+    The key is the endpoint plus the sorted query string. Only 200 responses
+    whose view left the session unchanged are stored, so pages that flash a
+    message or issue a CSRF token are never shared between visitors.
+    Responses carry an ETag and Last-Modified and answer conditional requests
+    with 304.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if (not page_cache.store or request.method != 'GET'
+                    or current_user.is_authenticated or session.get('_flashes')):
+                return view(*args, **kwargs)
+
+            key = f"{request.endpoint}:{request.path}?{urlencode(sorted(request.args.items(multi=True)))}"
+            full_key, entry = page_cache.lookup(key, tags)
+            if entry is None:
+                # before_request hooks and Flask-Login already touch the session; compare what the view wrote
+                session_before = dict(session)
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200 or response.direct_passthrough or dict(session) != session_before:
+                    return response
+                body = response.get_data(as_text=True)
+                entry = {
+                    'body': body,
+                    'mimetype': response.mimetype,
+                    'etag': hashlib.sha1(body.encode()).hexdigest(),
+                    'last_modified': int(datetime.now(timezone.utc).timestamp()),
+                }
+                page_cache.store.set(full_key, entry, page_cache.ttl)
+            return respond_from_entry(entry)
+        return wrapper
+    return decorator
+
+
+def init_page_cache(app):
+    backend = app.config.get('PAGE_CACHE_BACKEND', 'sqlite')
+    ttl = app.config.get('PAGE_CACHE_SECONDS', 300)
+    if backend == 'none' or ttl <= 0:
+        return
+    if backend == 'sqlite':
+        path = app.config.get('PAGE_CACHE_PATH') or os.path.join(app.instance_path, 'page_cache.db')
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        store = SQLiteStore(path)
+    else:
+        store = LRUCache(app.config.get('PAGE_CACHE_MAX_ENTRIES', 1000))
+    page_cache.configure(store, ttl)
+    logging.info(f"Page cache enabled ({backend}, {ttl}s)")
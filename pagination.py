@@ -0,0 +1,107 @@
+import json
+import base64
+import binascii
+from datetime import datetime
+from sqlalchemy import tuple_
+from cache import cache
+
+
+def encode_cursor(values, direction='next'):
+    """Opaque, URL-safe cursor for a row's sort key."""
+    values = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    raw = json.dumps({'k': values, 'd': direction}, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor, types):
+    """Return (values, direction) for a cursor, or (None, 'next') if it is missing or malformed."""
+    if not cursor:
+        return None, 'next'
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        values = [datetime.fromisoformat(v) if t is datetime else t(v) for v, t in zip(data['k'], types)]
+        if len(values) != len(types) or data['d'] not in ('next', 'prev'):
+            raise ValueError(cursor)
+        return values, data['d']
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        return None, 'next'
+
+
+class KeysetPage:
+    """One page of a keyset-paginated listing, with cursors for its neighbours."""
+
+    def __init__(self, items, next_cursor, prev_cursor, total=None):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+        self.total = total
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None
+
+    def __iter__(self):
+        return iter(self.items)
+
+
+def keyset_paginate(query, columns, cursor=None, per_page=20, total=None):
+    """Page through `query` newest-first by `columns` (e.g. created_at, id) without OFFSET.
+
+    `columns` must end with a unique column so the key is a total order, and
+    an index on them makes every page cost the same as the first. Rows with a
+    NULL in a key column are not reachable this way.
+    """
+    key = tuple_(*columns)
+    types = [datetime if col.type.python_type is datetime else col.type.python_type for col in columns]
+    values, direction = decode_cursor(cursor, types)
+
+    if values is None:
+        rows = query.order_by(*[col.desc() for col in columns]).limit(per_page + 1).all()
+        has_more_after, has_more_before = len(rows) > per_page, False
+        rows = rows[:per_page]
+    elif direction == 'next':
+        rows = query.filter(key < tuple_(*values)).order_by(*[col.desc() for col in columns]).limit(per_page + 1).all()
+        has_more_after, has_more_before = len(rows) > per_page, True
+        rows = rows[:per_page]
+    else:
+        rows = query.filter(key > tuple_(*values)).order_by(*[col.asc() for col in columns]).limit(per_page + 1).all()
+        has_more_after, has_more_before = True, len(rows) > per_page
+        rows = rows[:per_page][::-1]
+
+    def cursor_for(row, direction):
+        return encode_cursor([getattr(row, col.key) for col in columns], direction)
+
+    return KeysetPage(
+        rows,
+        next_cursor=cursor_for(rows[-1], 'next') if rows and has_more_after else None,
+        prev_cursor=cursor_for(rows[0], 'prev') if rows and has_more_before else None,
+        total=total,
+    )
+
+
+def cached_count(key, query, ttl):
+    """Total rows for a listing, cached for `ttl` seconds; None (no count at all) when ttl is 0."""
+    if not ttl:
+        return None
+    return cache.get_or_set(f'count:{key}', query.order_by(None).count, ttl)
+
+
+def ranked_page(ids, cursor, per_page, load):
+    """Page through a bounded list of ids already in rank order; cursors carry the offset.
+
+    `load` fetches the objects for one page of ids, in any order.
+    """
+    values, _ = decode_cursor(cursor, [int])
+    offset = max(values[0], 0) if values else 0
+    page_ids = ids[offset:offset + per_page]
+    by_id = {item.id: item for item in load(page_ids)} if page_ids else {}
+    return KeysetPage(
+        [by_id[item_id] for item_id in page_ids if item_id in by_id],
+        next_cursor=encode_cursor([offset + per_page]) if offset + per_page < len(ids) else None,
+        prev_cursor=encode_cursor([max(offset - per_page, 0)], 'prev') if offset > 0 else None,
+        total=len(ids),
+    )
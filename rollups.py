@@ -0,0 +1,129 @@
+from datetime import datetime, timezone
+from collections import Counter, defaultdict
+from sqlalchemy import func
+from app import db
+from models import JobRollup
+
+KEY_COLUMNS = ('hour', 'postcode_area', 'category', 'urgency')
+GROUP_COLUMNS = ('postcode_area', 'category', 'urgency')
+
+# Time-to-accept histogram: (upper bound in seconds, column); the last bucket is open-ended
+ACCEPT_BUCKETS = (
+    (300, 'accept_under_5m'),
+    (900, 'accept_under_15m'),
+    (3600, 'accept_under_1h'),
+    (14400, 'accept_under_4h'),
+    (None, 'accept_over_4h'),
+)
+COUNTER_COLUMNS = ('posted', 'accepted', 'completed', 'accept_seconds_total') + tuple(c for _, c in ACCEPT_BUCKETS)
+
+
+def parse_utc(value):
+    """Parse an ISO 8601 datetime into the naive UTC the jobs and rollups are stored in.
+
+    Offsets (including a trailing Z) are converted to UTC; naive values are taken as UTC.
+    """
+    moment = datetime.fromisoformat(value)
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return moment
+
+
+def hour_of(moment):
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+def accept_bucket(seconds):
+    for limit, column in ACCEPT_BUCKETS:
+        if limit is None or seconds < limit:
+            return column
+
+
+def _upsert_statement():
+    if db.engine.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    stmt = insert(JobRollup)
+    return stmt.on_conflict_do_update(
+        index_elements=list(KEY_COLUMNS),
+        set_={column: getattr(JobRollup, column) + getattr(stmt.excluded, column) for column in COUNTER_COLUMNS},
+    )
+
+
+def add_to_rollups(deltas):
+    """Add {(hour, area, category, urgency): {counter: n}} to the rollups in the current transaction.
+
+    One INSERT ... ON CONFLICT DO UPDATE per row creates or increments it, so
+    concurrent writers never lose counts. Rows go in key order so two
+    transactions touching the same rows lock them in the same order.
+    """
+    if not deltas:
+        return
+    rows = []
+    for key in sorted(deltas):
+        row = dict(zip(KEY_COLUMNS, key))
+        row.update({column: deltas[key].get(column, 0) for column in COUNTER_COLUMNS})
+        rows.append(row)
+    db.session.execute(_upsert_statement(), rows)
+
+
+def record_posted(jobs):
+    """Count new jobs, given as (created_at, postcode_area, category, urgency) tuples."""
+    counts = Counter((hour_of(created_at), area, category, urgency) for created_at, area, category, urgency in jobs)
+    add_to_rollups({key: {'posted': n} for key, n in counts.items()})
+
+
+def record_job_posted(job):
+    record_posted([(job.created_at or datetime.utcnow(), job.postcode_area, job.category, job.urgency)])
+
+
+def record_accepted(created_at, postcode_area, category, urgency, accepted_at):
+    seconds = max(0, round((accepted_at - created_at).total_seconds()))
+    add_to_rollups({(hour_of(accepted_at), postcode_area, category, urgency): {
+        'accepted': 1, 'accept_seconds_total': seconds, accept_bucket(seconds): 1,
+    }})
+
+
+def record_job_completed(job, completed_at=None):
+    """Stamp and count a job moving to completed; call it in the transaction that sets the status."""
+    completed_at = completed_at or datetime.utcnow()
+    job.completed_at = completed_at
+    add_to_rollups({(hour_of(completed_at), job.postcode_area, job.category, job.urgency): {'completed': 1}})
+
+
+def rollup_series(since, until, group_by=(), **filters):
+    """Hourly totals between `since` and `until`, read from the rollups only.
+
+    `group_by` is a subset of GROUP_COLUMNS to break each hour down by;
+    `filters` (postcode_area, category, urgency) restrict the rows summed.
+    """
+    dimensions = [getattr(JobRollup, name) for name in group_by]
+    query = db.session.query(
+        JobRollup.hour, *dimensions, *[func.sum(getattr(JobRollup, c)).label(c) for c in COUNTER_COLUMNS]
+    ).filter(JobRollup.hour >= since, JobRollup.hour < until)
+    for name, value in filters.items():
+        if value:
+            query = query.filter(getattr(JobRollup, name) == value)
+    query = query.group_by(JobRollup.hour, *dimensions).order_by(JobRollup.hour, *dimensions)
+
+    series = []
+    for row in query:
+        counts = row._asdict()
+        accepted = counts['accepted'] or 0
+        entry = {'hour': row.hour.isoformat()}
+        entry.update({name: counts[name] for name in group_by})
+        entry.update(posted=counts['posted'] or 0, accepted=accepted, completed=counts['completed'] or 0)
+        entry['mean_seconds_to_accept'] = round(counts['accept_seconds_total'] / accepted) if accepted else None
+        entry['time_to_accept'] = {column: counts[column] or 0 for _, column in ACCEPT_BUCKETS}
+        series.append(entry)
+    return series
+
+
+def merge_deltas(*aggregates):
+    """Sum several {key: {counter: n}} mappings into one."""
+    merged = defaultdict(Counter)
+    for aggregate in aggregates:
+        for key, counters in aggregate.items():
+            merged[key].update(counters)
+    return merged
@@ -1,4 +1,5 @@
 import os
+import hmac
 import json
 import stripe
 from datetime import datetime, timedelta
@@ -6,10 +7,23 @@ from flask import render_template, request, redirect, url_for, flash, jsonify, c
 from flask_login import login_required, current_user, login_user, logout_user
 from werkzeug.utils import secure_filename
 from werkzeug.exceptions import RequestEntityTooLarge
-from app import db, login_manager, app
-from models import User, Customer, Trade, Job, Message, Review, AdPlacement, PartsBasket, WebhookEvent, TradeDocument
+from sqlalchemy.orm import joinedload, selectinload
+from app import db, login_manager, app, csrf
+from models import User, Customer, Trade, TradeCoverage, Job, Message, Review, AdPlacement, PartsBasket, WebhookEvent, TradeDocument
 from forms import LoginForm, RegisterForm, CustomerProfileForm, TradeProfileForm, JobForm, ReviewForm
-from utils import parse_postcode, geocode_postcode, find_matching_trades, send_job_notification
+from utils import parse_postcode, geocode_postcode, accept_job_for_trade, dashboard_stats, invalidate_dashboard_stats
+from dispatch_index import dispatch_index
+from sla import sla_monitor
+from pagination import keyset_paginate, cached_count, ranked_page
+from search import trade_search
+from page_cache import cached_page, page_cache
+from identity import invalidate_identity
+from auth import password_hasher, login_retry_after, Overloaded
+from guards import role_required, current_profile
+from rollups import record_job_posted, rollup_series, parse_utc, GROUP_COLUMNS
+from event_hub import publish, stream_response, job_channel, trade_channel
+import outbox
+import ingest
 
 # Set up Stripe
 stripe.api_key = app.config.get('STRIPE_SECRET_KEY')
@@ -26,6 +40,7 @@ def setup_session():
 
 # Public routes
 @app.route('/')
+@cached_page('trades')
 def index():
     if current_user.is_authenticated:
         if current_user.role == 'customer':
@@ -41,20 +56,36 @@ def index():
     return render_template('index.html', trades=verified_trades)
 
 @app.route('/trade-directory')
+@cached_page('trades')
 def trade_directory():
-    page = request.args.get('page', 1, type=int)
+    cursor = request.args.get('cursor')
     search = request.args.get('search', '')
     area = request.args.get('area', '')
     
+    if search.strip() and trade_search.backend:
+        # Ranked by relevance and rating, so paged by position in the bounded result list
+        ranked = trade_search.search(search, area)
+        trades = ranked_page(ranked, cursor, per_page=12,
+                             load=lambda ids: Trade.query.filter(Trade.id.in_(ids)).all())
+        return render_template('public/trade_directory.html', trades=trades, search=search, area=area)
+    
     query = Trade.query.filter_by(verified=True)
     
     if search:
         query = query.filter(Trade.company.contains(search))
     
+    area_code = area.strip().upper()
     if area:
-        query = query.filter(Trade.coverage_areas.contains(f'"{area}"'))
+        query = query.join(TradeCoverage).filter(TradeCoverage.kind == 'area', TradeCoverage.code == area_code)
+    
+    # Totals are cached only for keys from a small fixed set (no search, at most a
+    # postcode area), so arbitrary query strings never add cache entries
+    total = None
+    if not search and (not area_code or area_code.isascii() and area_code.isalpha() and len(area_code) <= 2):
+        total = cached_count(f'trade_directory:{area_code}', query, app.config.get('LISTING_COUNT_CACHE_SECONDS', 60))
     
-    trades = query.paginate(page=page, per_page=12, error_out=False)
+    # Keyset pagination: ?cursor= comes from trades.next_cursor / trades.prev_cursor
+    trades = keyset_paginate(query, [Trade.created_at, Trade.id], cursor, per_page=12, total=total)
     
     return render_template('public/trade_directory.html', trades=trades, search=search, area=area)
 
@@ -66,8 +97,28 @@ def login():
         password = request.form.get('password', '')
         
         if email and password:
+            retry_after = login_retry_after(request.remote_addr, email)
+            if retry_after:
+                flash('Too many login attempts. Please wait a moment and try again.', 'error')
+                return render_template('auth/login.html'), 429, {'Retry-After': str(retry_after)}
+            
             user = User.query.filter_by(email=email).first()
-            if user and user.check_password(password):
+            try:
+                # Unknown emails are checked against a dummy hash so they take as long as real ones
+                valid = password_hasher.verify(user.password_hash if user else None, password)
+            except Overloaded:
+                flash('We are handling a lot of logins right now. Please try again in a moment.', 'error')
+                return render_template('auth/login.html'), 429, {'Retry-After': '1'}
+            
+            if valid and password_hasher.needs_rehash(user.password_hash):
+                # Upgrade hashes made with older parameters while we have the plaintext
+                try:
+                    user.password_hash = password_hasher.hash(password)
+                    db.session.commit()
+                except Overloaded:
+                    pass
+            
+            if valid:
                 login_user(user)
                 if user.role == 'trade':
                     return redirect('/trade/dashboard')
@@ -166,6 +217,7 @@ def register():
             trade.set_coverage_areas(areas_list)
             db.session.add(trade)
             db.session.flush()
+            trade_search.index_trade(trade)
 
             # Persist qualification document records
             for qname in qualification_docs:
@@ -195,6 +247,11 @@ def register():
             db.session.add(customer)
 
         db.session.commit()
+        if role == 'trade':
+            dispatch_index.update_trade(trade)
+            page_cache.invalidate('trades')
+        invalidate_dashboard_stats()
+        invalidate_identity(user.id)
         flash('Registration successful! Trade professionals will be verified before accessing job offers.', 'success')
         return redirect('/login')
 
@@ -213,19 +270,10 @@ def logout():
 
 # Customer routes
 @app.route('/customer/dashboard')
-@login_required
+@role_required('customer', profile=True)
 def customer_dashboard():
-    if current_user.role != 'customer':
-        flash('Access denied.', 'danger')
-        return redirect(url_for('index'))
-    
-    customer = Customer.query.filter_by(user_id=current_user.id).first()
-    if not customer:
-        flash('Customer profile not found.', 'danger')
-        return redirect(url_for('index'))
-    
     # Get recent jobs
-    recent_jobs = Job.query.filter_by(customer_id=customer.id).order_by(Job.created_at.desc()).limit(5).all()
+    recent_jobs = Job.query.filter_by(customer_id=current_user.customer_id).order_by(Job.created_at.desc()).limit(5).all()
     
     # Get active ads for display
     active_ads = AdPlacement.query.filter(
@@ -234,7 +282,7 @@ def customer_dashboard():
         AdPlacement.ends_at >= datetime.utcnow()
     ).all()
     
-    return render_template('customer/dashboard.html', customer=customer, jobs=recent_jobs, ads=active_ads)
+    return render_template('customer/dashboard.html', customer=current_profile(), jobs=recent_jobs, ads=active_ads)
 
 # Public job creation (anonymous) - main entry point
 @app.route('/job-request', methods=['GET', 'POST'])
@@ -298,8 +346,8 @@ def job_request():
             flash('Invalid UK postcode format.', 'danger')
             return render_template('job_request.html')
         
-        # Get coordinates (mock for now)
-        lat, lon = geocode_postcode(postcode)
+        # Get coordinates
+        lat, lon = geocode_postcode(postcode_info)
         
         # Create job with anonymous customer information
         job = Job(
@@ -312,9 +360,9 @@ def job_request():
             title=title,
             category=category,
             description=description,
-            postcode_full=postcode_info['full'],
-            postcode_area=postcode_info['area'],
-            postcode_district=postcode_info['district'],
+            postcode_full=postcode_info.full,
+            postcode_area=postcode_info.area,
+            postcode_district=postcode_info.district,
             lat=lat,
             lon=lon,
             urgency=urgency,
@@ -326,11 +374,13 @@ def job_request():
             job.set_photos(photo_urls)
         
         db.session.add(job)
-        db.session.commit()
+        db.session.flush()
         
-        # Find and notify matching trades
-        matching_trades = find_matching_trades(job)
-        send_job_notification(job, matching_trades)
+        # Matching and notification run in the outbox worker once this commits
+        outbox.enqueue('job.posted', {'job_id': job.id})
+        record_job_posted(job)
+        db.session.commit()
+        sla_monitor.track_job(job)
 
         return render_template('job_request.html', success=True)
 
@@ -349,8 +399,8 @@ def create_job():
             flash('Invalid UK postcode format.', 'danger')
             return render_template('customer/create_job.html', form=form)
         
-        # Get coordinates (mock for now)
-        lat, lon = geocode_postcode(form.postcode.data)
+        # Get coordinates
+        lat, lon = geocode_postcode(postcode_info)
         
         # Handle photo uploads
         photo_urls = []
@@ -371,9 +421,9 @@ def create_job():
             title=form.title.data,
             category=form.category.data,
             description=form.description.data,
-            postcode_full=postcode_info['full'],
-            postcode_area=postcode_info['area'],
-            postcode_district=postcode_info['district'],
+            postcode_full=postcode_info.full,
+            postcode_area=postcode_info.area,
+            postcode_district=postcode_info.district,
             lat=lat,
             lon=lon,
             urgency=form.urgency.data,
@@ -382,25 +432,23 @@ def create_job():
         job.set_photos(photo_urls)
         
         db.session.add(job)
-        db.session.commit()
+        db.session.flush()
         
-        # Find and notify matching trades
-        matching_trades = find_matching_trades(job)
-        send_job_notification(job, matching_trades)
+        # Matching and notification run in the outbox worker once this commits
+        outbox.enqueue('job.posted', {'job_id': job.id})
+        record_job_posted(job)
+        db.session.commit()
+        sla_monitor.track_job(job)
         
-        flash('Job created successfully! Matching trades have been notified and will contact you directly.', 'success')
+        flash("Job created successfully! We're notifying matching trades, who will contact you directly.", 'success')
         return redirect(url_for('job_confirmation', job_id=job.id))
     
     return render_template('customer/create_job.html', form=form)
 
 # Existing customer route (for registered customers)
 @app.route('/customer/create-job', methods=['GET', 'POST'])
-@login_required
+@role_required('customer')
 def customer_create_job():
-    if current_user.role != 'customer':
-        flash('Access denied.', 'danger')
-        return redirect(url_for('index'))
-    
     # Redirect to public job creation for simplicity
     return redirect(url_for('create_job'))
 
@@ -410,52 +458,48 @@ def job_confirmation(job_id):
     job = Job.query.get_or_404(job_id)
     return render_template('customer/job_confirmation.html', job=job)
 
+def can_view_job(job):
+    """The job's customer, the trade that accepted it (any trade while it is open) and admins."""
+    if current_user.role == 'customer':
+        return bool(current_user.customer_id) and job.customer_id == current_user.customer_id
+    if current_user.role == 'trade':
+        return bool(current_user.trade_id) and job.accepted_trade_id in (None, current_user.trade_id)
+    return current_user.role == 'admin'
+
 @app.route('/job/<int:job_id>')
-@login_required
+@role_required('customer', 'trade', 'admin')
 def job_detail(job_id):
     job = Job.query.get_or_404(job_id)
     
     # Check permissions
-    if current_user.role == 'customer':
-        customer = Customer.query.filter_by(user_id=current_user.id).first()
-        if not customer or job.customer_id != customer.id:
-            flash('Access denied.', 'danger')
-            return redirect(url_for('customer_dashboard'))
-    elif current_user.role == 'trade':
-        trade = Trade.query.filter_by(user_id=current_user.id).first()
-        if not trade or (job.accepted_trade_id and job.accepted_trade_id != trade.id):
-            flash('Access denied.', 'danger')
-            return redirect(url_for('trade_dashboard'))
-    elif current_user.role != 'admin':
+    if not can_view_job(job):
         flash('Access denied.', 'danger')
-        return redirect(url_for('index'))
+        return redirect(url_for('customer_dashboard' if current_user.role == 'customer' else 'trade_dashboard'))
     
     # Get messages for this job
     messages = Message.query.filter_by(job_id=job.id).order_by(Message.created_at.asc()).all()
     
     return render_template('customer/job_detail.html', job=job, messages=messages)
 
+@app.route('/job/<int:job_id>/events')
+@role_required('customer', 'trade', 'admin', json=True)
+def job_events(job_id):
+    """Server-sent events for a job page: new messages and status changes."""
+    job = Job.query.get_or_404(job_id)
+    if not can_view_job(job):
+        return {'error': 'Access denied'}, 403
+    return stream_response(job_channel(job.id))
+
 # Simple Trade Dashboard
 @app.route('/trade/dashboard')
-@login_required  
+@role_required('trade', profile=True, redirect_to='login', message=None)
 def trade_dashboard():
-    if current_user.role != 'trade':
-        return redirect('/login')
-    
-    trade = Trade.query.filter_by(user_id=current_user.id).first()
-    if not trade:
-        return redirect('/login')
-    
-    return render_template('trade/simple_dashboard.html', trade=trade, user=current_user)
+    return render_template('trade/simple_dashboard.html', trade=current_profile(), user=current_user)
 
 @app.route('/trade/profile', methods=['GET', 'POST'])
-@login_required
+@role_required('trade', profile=True)
 def trade_profile():
-    if current_user.role != 'trade':
-        flash('Access denied.', 'danger')
-        return redirect(url_for('index'))
-    
-    trade = Trade.query.filter_by(user_id=current_user.id).first()
+    trade = current_profile()
     form = TradeProfileForm(obj=trade)
     
     if form.validate_on_submit():
@@ -467,6 +511,14 @@ def trade_profile():
         trade.set_coverage_areas(form.coverage_areas.data.split(',') if form.coverage_areas.data else [])
         trade.set_coverage_districts(form.coverage_districts.data.split(',') if form.coverage_districts.data else [])
         trade.radius_km = form.radius_km.data
+
+        # Geocode the base postcode for radius dispatch
+        base_info = parse_postcode(form.base_postcode.data)
+        if base_info:
+            trade.base_postcode = base_info.full
+            trade.base_lat, trade.base_lon = geocode_postcode(base_info)
+        else:
+            trade.base_postcode = trade.base_lat = trade.base_lon = None
         
         # Handle insurance document upload
         if form.insurance_document.data:
@@ -478,7 +530,10 @@ def trade_profile():
                 file.save(file_path)
                 trade.insurance_document_url = f"/uploads/{filename}"
         
+        trade_search.index_trade(trade)
         db.session.commit()
+        dispatch_index.update_trade(trade)
+        page_cache.invalidate('trades')
         flash('Profile updated successfully!', 'success')
         return redirect(url_for('trade_profile'))
     
@@ -491,47 +546,32 @@ def trade_profile():
     return render_template('trade/profile.html', form=form, trade=trade)
 
 @app.route('/trade/accept-job/<int:job_id>', methods=['POST'])
-@login_required
+@role_required('trade', profile=True)
 def accept_job(job_id):
-    if current_user.role != 'trade':
-        flash('Access denied.', 'danger')
-        return redirect(url_for('index'))
-    
-    trade = Trade.query.filter_by(user_id=current_user.id).first()
-    job = Job.query.get_or_404(job_id)
-    
-    if job.status != 'posted':
-        flash('This job is no longer available.', 'warning')
+    if not accept_job_for_trade(job_id, current_user.trade_id):
+        Job.query.get_or_404(job_id)
+        flash('This job has already been taken.', 'warning')
         return redirect(url_for('trade_dashboard'))
-    
-    # Accept the job
-    job.status = 'accepted'
-    job.accepted_trade_id = trade.id
-    job.accepted_at = datetime.utcnow()
-    
-    db.session.commit()
+    sla_monitor.untrack(job_id)
     
     flash('Job accepted successfully!', 'success')
-    return redirect(url_for('job_detail', job_id=job.id))
+    return redirect(url_for('job_detail', job_id=job_id))
+
+@app.route('/trade/events')
+@role_required('trade', profile=True, json=True)
+def trade_events():
+    """Server-sent events for the trade dashboard: job offers, and offers taken by another trade."""
+    return stream_response(trade_channel(current_user.trade_id))
 
 @app.route('/trade/billing')
-@login_required
+@role_required('trade')
 def trade_billing():
-    if current_user.role != 'trade':
-        flash('Access denied.', 'danger')
-        return redirect(url_for('index'))
-    
-    trade = Trade.query.filter_by(user_id=current_user.id).first()
-    return render_template('trade/billing.html', trade=trade)
+    return render_template('trade/billing.html', trade=current_profile())
 
 @app.route('/trade/upgrade-to-premium')
-@login_required
+@role_required('trade', profile=True)
 def upgrade_to_premium():
-    if current_user.role != 'trade':
-        flash('Access denied.', 'danger')
-        return redirect(url_for('index'))
-    
-    trade = Trade.query.filter_by(user_id=current_user.id).first()
+    trade = current_profile()
     
     try:
         # Create Stripe checkout session
@@ -570,21 +610,10 @@ def upgrade_to_premium():
 
 # Admin routes
 @app.route('/admin/dashboard')
-@login_required
+@role_required('admin')
 def admin_dashboard():
-    if current_user.role != 'admin':
-        flash('Access denied.', 'danger')
-        return redirect(url_for('index'))
-    
-    # Get statistics
-    stats = {
-        'total_users': User.query.count(),
-        'total_customers': Customer.query.count(),
-        'total_trades': Trade.query.count(),
-        'verified_trades': Trade.query.filter_by(verified=True).count(),
-        'total_jobs': Job.query.count(),
-        'active_jobs': Job.query.filter(Job.status.in_(['posted', 'accepted', 'en_route', 'in_progress'])).count(),
-    }
+    # Get statistics (one aggregated query, cached briefly)
+    stats = dashboard_stats()
     
     # Get recent activity
     recent_jobs = Job.query.order_by(Job.created_at.desc()).limit(5).all()
@@ -594,27 +623,17 @@ def admin_dashboard():
     return render_template('admin/dashboard.html', stats=stats, recent_jobs=recent_jobs, recent_trades=recent_trades)
 
 @app.route('/admin/trades')
-@login_required
+@role_required('admin')
 def admin_trades():
-    if current_user.role != 'admin':
-        flash('Access denied.', 'danger')
-        return redirect(url_for('index'))
-    
-    page = request.args.get('page', 1, type=int)
-    trades = Trade.query.paginate(page=page, per_page=20, error_out=False)
+    cursor = request.args.get('cursor')
+    total = cached_count('admin_trades', Trade.query, app.config.get('LISTING_COUNT_CACHE_SECONDS', 60))
+    trades = keyset_paginate(Trade.query, [Trade.created_at, Trade.id], cursor, per_page=20, total=total)
     
     return render_template('admin/trades_checkatrade.html', trades=trades)
 
-@app.route('/admin/trade-details/<int:trade_id>')
-@login_required
-def admin_trade_details(trade_id):
-    if current_user.role != 'admin':
-        return {'error': 'Access denied'}, 403
-    
-    trade = Trade.query.get_or_404(trade_id)
-    
-    # Return detailed trade information as JSON
-    trade_data = {
+def trade_details(trade):
+    """Admin JSON view of a trade; load user and documents eagerly when serializing many."""
+    return {
         'id': trade.id,
         'company': trade.company,
         'companies_house_number': trade.companies_house_number,
@@ -626,27 +645,143 @@ def admin_trade_details(trade_id):
         'coverage_districts': trade.get_coverage_districts(),
         'radius_km': trade.radius_km,
         'insurance_document_url': trade.insurance_document_url,
+        'documents': [{'id': d.id, 'file_type': d.file_type, 'url': d.url()} for d in trade.documents],
         'verified': trade.verified,
         'plan_tier': trade.plan_tier,
         'subscription_status': trade.subscription_status,
         'rating_avg': trade.rating_avg,
         'review_count': trade.review_count,
-        'created_at': trade.created_at.strftime('%d/%m/%Y %H:%M'),
+        'created_at': trade.created_at.strftime('%d/%m/%Y %H:%M') if trade.created_at else None,
         'stripe_customer_id': trade.stripe_customer_id
     }
+
+def json_with_etag(payload):
+    """JSON response with an ETag of its body; answers 304 when the client's copy matches."""
+    response = jsonify(payload)
+    response.add_etag()
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response.make_conditional(request)
+
+@app.route('/admin/trade-details/<int:trade_id>')
+@role_required('admin', json=True)
+def admin_trade_details(trade_id):
+    trade = Trade.query.get_or_404(trade_id)
     
-    return trade_data
+    # Return detailed trade information as JSON
+    return json_with_etag(trade_details(trade))
+
+MAX_TRADE_DETAILS_BATCH = 200
+
+@app.route('/admin/trade-details', methods=['GET', 'POST'])
+@role_required('admin', json=True)
+def admin_trade_details_batch():
+    """Details for many trades (?ids=1,2,3 or a JSON body {"ids": [...]}) in a fixed number of queries."""
+    if request.method == 'POST':
+        raw_ids = (request.get_json(silent=True) or {}).get('ids') or []
+    else:
+        raw_ids = request.args.get('ids', '').split(',')
+    try:
+        trade_ids = list(dict.fromkeys(int(i) for i in raw_ids if str(i).strip()))
+    except (TypeError, ValueError):
+        return {'error': 'ids must be integers'}, 400
+    if len(trade_ids) > MAX_TRADE_DETAILS_BATCH:
+        return {'error': f'At most {MAX_TRADE_DETAILS_BATCH} ids per request'}, 400
+    
+    # Users are joined in; documents come in one extra IN query
+    trades = Trade.query.options(joinedload(Trade.user), selectinload(Trade.documents)).filter(
+        Trade.id.in_(trade_ids)
+    ).all() if trade_ids else []
+    by_id = {trade.id: trade for trade in trades}
+    
+    return json_with_etag({
+        'trades': [trade_details(by_id[i]) for i in trade_ids if i in by_id],
+        'missing': [i for i in trade_ids if i not in by_id],
+    })
+
+@app.route('/admin/outbox-metrics')
+@role_required('admin', json=True)
+def admin_outbox_metrics():
+    return outbox.outbox_metrics()
+
+def partner_for_api_key(api_key):
+    """Return the partner name for an API key from PARTNER_API_KEYS, or None."""
+    if not api_key:
+        return None
+    # compare_digest only takes ASCII str, and headers can carry any latin-1 text
+    api_key = api_key.encode('utf-8', 'surrogateescape')
+    for entry in app.config.get('PARTNER_API_KEYS', '').split(','):
+        name, _, key = entry.strip().partition(':')
+        if key and hmac.compare_digest(key.encode(), api_key):
+            return name
+    return None
+
+@app.route('/api/partner/jobs/bulk', methods=['POST'])
+@csrf.exempt
+def partner_bulk_jobs():
+    """Bulk job ingestion for partner feeds (JSONL, or CSV with ?format=csv or a text/csv body)."""
+    partner = partner_for_api_key(request.headers.get('X-API-Key'))
+    if not partner:
+        return {'error': 'Invalid API key'}, 401
+
+    fmt = request.args.get('format') or ('csv' if request.mimetype == 'text/csv' else 'jsonl')
+    if fmt not in ('jsonl', 'csv'):
+        return {'error': f'Unsupported format {fmt}'}, 400
+
+    summary = ingest.ingest_jobs(
+        ingest.read_rows(ingest.open_text(request.stream), fmt),
+        chunk_size=app.config.get('INGEST_CHUNK_SIZE', 500),
+        source=partner,
+    )
+    return summary
+
+@app.route('/admin/sla-at-risk')
+@role_required('admin', json=True)
+def admin_sla_at_risk():
+    """Open jobs past or near their SLA deadline."""
+    within = request.args.get('within', 30, type=int)
+    limit = min(request.args.get('limit', 100, type=int), 500)
+    return {'within_minutes': within, 'jobs': sla_monitor.at_risk(within, limit)}
+
+MAX_ROLLUP_DAYS = 92
+
+@app.route('/admin/job-rollups')
+@role_required('admin', json=True)
+def admin_job_rollups():
+    """Hourly posted/accepted/completed counts and time-to-accept, read only from the rollup table."""
+    try:
+        until = parse_utc(request.args['until']) if request.args.get('until') else datetime.utcnow()
+        since = (parse_utc(request.args['since']) if request.args.get('since')
+                 else until - timedelta(hours=request.args.get('hours', 48, type=int)))
+    except ValueError:
+        return {'error': 'since and until must be ISO 8601 datetimes'}, 400
+    if until - since > timedelta(days=MAX_ROLLUP_DAYS):
+        return {'error': f'At most {MAX_ROLLUP_DAYS} days per request'}, 400
+    
+    group_by = [name for name in request.args.get('group_by', '').split(',') if name]
+    if any(name not in GROUP_COLUMNS for name in group_by):
+        return {'error': f"group_by must be a comma-separated subset of {', '.join(GROUP_COLUMNS)}"}, 400
+    
+    filters = {
+        'postcode_area': request.args.get('area', '').strip().upper(),
+        'category': request.args.get('category', '').strip(),
+        'urgency': request.args.get('urgency', '').strip(),
+    }
+    return {
+        'since': since.isoformat(),
+        'until': until.isoformat(),
+        'group_by': group_by,
+        'hours': rollup_series(since, until, group_by, **filters),
+    }
 
 @app.route('/admin/verify-trade/<int:trade_id>')
-@login_required
+@role_required('admin')
 def verify_trade(trade_id):
-    if current_user.role != 'admin':
-        flash('Access denied.', 'danger')
-        return redirect(url_for('index'))
-    
     trade = Trade.query.get_or_404(trade_id)
     trade.verified = not trade.verified
     db.session.commit()
+    dispatch_index.update_trade(trade)
+    invalidate_dashboard_stats()
+    page_cache.invalidate('trades')
     
     status = 'verified' if trade.verified else 'unverified'
     flash(f'Trade {trade.company} has been {status}.', 'success')
@@ -654,29 +789,33 @@ def verify_trade(trade_id):
 
 # Messaging routes
 @app.route('/job/<int:job_id>/send-message', methods=['POST'])
-@login_required
+@role_required('customer', 'trade', 'admin')
 def send_message(job_id):
     job = Job.query.get_or_404(job_id)
     message_text = request.form.get('message', '').strip()
+    # Pages with a live job stream post with fetch and take the message from the stream
+    wants_json = request.accept_mimetypes.best == 'application/json'
     
     if not message_text:
+        if wants_json:
+            return {'error': 'Message cannot be empty'}, 400
         flash('Message cannot be empty.', 'danger')
         return redirect(url_for('job_detail', job_id=job_id))
     
     # Check permissions
     allowed = False
     if current_user.role == 'customer':
-        customer = Customer.query.filter_by(user_id=current_user.id).first()
-        if customer and job.customer_id == customer.id:
+        if current_user.customer_id and job.customer_id == current_user.customer_id:
             allowed = True
     elif current_user.role == 'trade':
-        trade = Trade.query.filter_by(user_id=current_user.id).first()
-        if trade and job.accepted_trade_id == trade.id:
+        if current_user.trade_id and job.accepted_trade_id == current_user.trade_id:
             allowed = True
     elif current_user.role == 'admin':
         allowed = True
     
     if not allowed:
+        if wants_json:
+            return {'error': 'Access denied'}, 403
         flash('Access denied.', 'danger')
         return redirect(url_for('index'))
     
@@ -688,23 +827,31 @@ def send_message(job_id):
     )
     
     db.session.add(message)
+    db.session.flush()
+    data = {
+        'id': message.id,
+        'job_id': job.id,
+        'sender_user_id': current_user.id,
+        'sender_role': current_user.role,
+        'text': message.text,
+        'created_at': message.created_at.isoformat(),
+    }
+    publish(job_channel(job.id), 'message', data)
     db.session.commit()
     
+    if wants_json:
+        return data, 201
     flash('Message sent successfully.', 'success')
     return redirect(url_for('job_detail', job_id=job_id))
 
 # Review routes
 @app.route('/job/<int:job_id>/review', methods=['GET', 'POST'])
-@login_required
+@role_required('customer', profile=True)
 def create_review(job_id):
-    if current_user.role != 'customer':
-        flash('Access denied.', 'danger')
-        return redirect(url_for('index'))
-    
     job = Job.query.get_or_404(job_id)
-    customer = Customer.query.filter_by(user_id=current_user.id).first()
+    customer = current_profile()
     
-    if not customer or job.customer_id != customer.id:
+    if job.customer_id != customer.id:
         flash('Access denied.', 'danger')
         return redirect(url_for('customer_dashboard'))
     
@@ -738,6 +885,8 @@ def create_review(job_id):
             trade.rating_avg = total_rating / trade.review_count
         
         db.session.commit()
+        # The directory shows and sorts by rating
+        page_cache.invalidate('trades')
         
         flash('Review submitted successfully!', 'success')
         return redirect(url_for('job_detail', job_id=job_id))
@@ -775,6 +924,7 @@ def stripe_webhook():
     db.session.add(webhook_event)
     
     # Handle the event
+    trade = None
     if event['type'] == 'checkout.session.completed':
         session_data = event['data']['object']
         trade_id = session_data['metadata'].get('trade_id')
@@ -811,6 +961,9 @@ def stripe_webhook():
     # Mark as processed
     webhook_event.processed = True
     db.session.commit()
+    if trade:
+        dispatch_index.update_trade(trade)
+        page_cache.invalidate('trades')
     
     return 'OK', 200
 
@@ -0,0 +1,120 @@
+import heapq
+import logging
+import threading
+import time
+from itertools import count
+from app import db
+
+
+class DeadlineScheduler:
+    """Runs callbacks at wall-clock deadlines from a single background thread.
+
+    Timers live in a min-heap keyed by deadline. Cancelling a timer just drops
+    it from the key map; its heap entry is skipped when it surfaces, and the
+    heap is compacted once cancelled entries outnumber live ones. Callbacks
+    run inside an app context on the scheduler thread, so they must be quick
+    or hand work off elsewhere.
+    """
+
+    def __init__(self, app=None):
+        self.app = app
+        self._heap = []  # (due_ts, seq, key)
+        self._timers = {}  # key -> (due_ts, seq, callback, args)
+        self._seq = count()
+        self._cond = threading.Condition()
+        self._thread = None
+        self._stopping = False
+
+    def start(self):
+        with self._cond:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name='deadline-scheduler', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        if self._thread:
+            self._thread.join()
+
+    def schedule(self, key, due_ts, callback, *args):
+        """Run callback(*args) at unix time `due_ts`, replacing any timer with the same key."""
+        with self._cond:
+            seq = next(self._seq)
+            self._timers[key] = (due_ts, seq, callback, args)
+            heapq.heappush(self._heap, (due_ts, seq, key))
+            if self._heap[0][1] == seq:
+                # New earliest deadline; wake the thread so it re-arms its wait
+                self._cond.notify()
+
+    def cancel(self, key):
+        """Cancel a pending timer; returns True if one was pending."""
+        with self._cond:
+            cancelled = self._timers.pop(key, None) is not None
+            if cancelled and len(self._heap) > 2 * len(self._timers) + 64:
+                self._heap = [entry for entry in self._heap if self._is_live(entry)]
+                heapq.heapify(self._heap)
+            return cancelled
+
+    def pending(self):
+        with self._cond:
+            return len(self._timers)
+
+    def _is_live(self, entry):
+        timer = self._timers.get(entry[2])
+        return timer is not None and timer[1] == entry[1]
+
+    def _next_due(self):
+        """Pop and return the next due timer, waiting as needed; None when stopping."""
+        with self._cond:
+            while not self._stopping:
+                while self._heap and not self._is_live(self._heap[0]):
+                    heapq.heappop(self._heap)
+                if not self._heap:
+                    self._cond.wait()
+                    continue
+                due_ts, _, key = self._heap[0]
+                delay = due_ts - time.time()
+                if delay > 0:
+                    self._cond.wait(delay)
+                    continue
+                heapq.heappop(self._heap)
+                _, _, callback, args = self._timers.pop(key)
+                return key, callback, args
+        return None
+
+    def _run(self):
+        while True:
+            timer = self._next_due()
+            if timer is None:
+                return
+            key, callback, args = timer
+            try:
+                with self.app.app_context():
+                    try:
+                        callback(*args)
+                    finally:
+                        db.session.remove()
+            except Exception:
+                logging.exception(f"Scheduled callback {key!r} failed")
+
+
+scheduler = DeadlineScheduler()
+
+
+def init_scheduler(app):
+    scheduler.app = app
+    if not app.config.get('SCHEDULER_ENABLED', True):
+        return
+    scheduler.start()
+
+    # Re-arm notification waves persisted by this or a previous worker
+    from utils import schedule_pending_waves
+    try:
+        schedule_pending_waves()
+    except Exception as e:
+        db.session.rollback()
+        logging.warning(f"Pending notification waves not loaded at startup: {str(e)}")
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Rebuild the hourly job rollups (job_rollups_hourly) from the jobs table.
+Run from the project root once after deploying the table (db.create_all creates it):
+    python scripts/backfill_job_rollups.py
+    python scripts/backfill_job_rollups.py --since 2024-01-01 --until 2024-02-01
+
+Rollup hours in [since, until) are deleted and recounted, so re-running is
+safe. The default `until` is the start of the current hour, leaving the hour
+that live traffic is still counting alone. Jobs are read a window of
+created_at at a time; acceptances and completions of jobs created up to
+--lookback-days before `since` are included. Completed jobs count in the
+hour of their completed_at; jobs completed before that column existed need
+it set once (e.g. from updated_at) to be counted.
+"""
+import os
+import argparse
+from datetime import datetime, timedelta
+from sqlalchemy import delete, func, case, literal_column
+
+os.environ.setdefault('SCHEDULER_ENABLED', 'false')
+
+from app import app, db
+from models import Job, JobRollup
+from rollups import ACCEPT_BUCKETS, add_to_rollups, hour_of, merge_deltas, parse_utc
+
+parser = argparse.ArgumentParser(description='Backfill job_rollups_hourly from the jobs table')
+parser.add_argument('--since', type=parse_utc, help='first hour to rebuild (default: oldest job)')
+parser.add_argument('--until', type=parse_utc, help='rebuild up to this hour (default: current hour)')
+parser.add_argument('--window-hours', type=int, default=24 * 7, help='created_at range read per query')
+parser.add_argument('--lookback-days', type=int, default=30)
+args = parser.parse_args()
+
+
+def hour_bucket(column):
+    # Literal arguments, so the SELECT and GROUP BY expressions compare equal on PostgreSQL
+    if db.engine.dialect.name == 'postgresql':
+        return func.date_trunc(literal_column("'hour'"), column)
+    return func.strftime(literal_column("'%Y-%m-%d %H:00:00'"), column)
+
+
+def seconds_between(start, end):
+    if db.engine.dialect.name == 'postgresql':
+        return func.extract('epoch', end - start)
+    return (func.julianday(end) - func.julianday(start)) * 86400
+
+
+def aggregate(hour, window, *conditions, **counters):
+    """Group the window's jobs by (hour, area, category, urgency) and sum `counters` (name -> SQL expression)."""
+    query = db.session.query(
+        hour, Job.postcode_area, Job.category, Job.urgency, *[expr.label(name) for name, expr in counters.items()]
+    ).filter(Job.created_at >= window[0], Job.created_at < window[1], *conditions).group_by(
+        hour, Job.postcode_area, Job.category, Job.urgency
+    )
+    deltas = {}
+    for row in query:
+        bucket = datetime.fromisoformat(row[0]) if isinstance(row[0], str) else row[0]
+        deltas[(bucket, row[1], row[2], row[3])] = {name: int(getattr(row, name) or 0) for name in counters}
+    return deltas
+
+
+with app.app_context():
+    until = hour_of(args.until or datetime.utcnow())
+    since = args.since or db.session.query(func.min(Job.created_at)).scalar()
+    if since is None:
+        print('No jobs to roll up')
+        raise SystemExit(0)
+    since = hour_of(since)
+
+    db.session.execute(delete(JobRollup).where(JobRollup.hour >= since, JobRollup.hour < until))
+
+    seconds = func.round(seconds_between(Job.created_at, Job.accepted_at))
+    accept_counters = {'accepted': func.count(), 'accept_seconds_total': func.sum(case((seconds > 0, seconds), else_=0))}
+    lower = None
+    for limit, column in ACCEPT_BUCKETS:
+        if lower is None:
+            in_bucket = seconds < limit
+        elif limit is None:
+            in_bucket = seconds >= lower
+        else:
+            in_bucket = (seconds >= lower) & (seconds < limit)
+        accept_counters[column] = func.sum(case((in_bucket, 1), else_=0))
+        lower = limit
+    accepted_hour = hour_bucket(Job.accepted_at)
+    completed_hour = hour_bucket(Job.completed_at)
+
+    start = since - timedelta(days=args.lookback_days)
+    updates = 0
+    while start < until:
+        window = (start, min(start + timedelta(hours=args.window_hours), until))
+        deltas = merge_deltas(
+            aggregate(hour_bucket(Job.created_at), window, Job.created_at >= since, posted=func.count()),
+            aggregate(accepted_hour, window, Job.accepted_at >= since, Job.accepted_at < until, **accept_counters),
+            aggregate(completed_hour, window, Job.status == 'completed', Job.completed_at >= since,
+                      Job.completed_at < until, completed=func.count()),
+        )
+        add_to_rollups(deltas)
+        db.session.commit()
+        updates += len(deltas)
+        print(f'{window[0]:%Y-%m-%d %H:%M} .. {window[1]:%Y-%m-%d %H:%M}: {len(deltas)} rollup updates')
+        start = window[1]
+
+print(f'Done: {updates} rollup updates for {since} .. {until}')
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Backfill the trade_coverage table from Trade.coverage_areas / coverage_districts.
+Run from the project root once after deploying the table (db.create_all creates it):
+    python scripts/backfill_trade_coverage.py
+
+Safe to re-run: each trade's rows are rebuilt from its JSON columns.
+"""
+import os
+import argparse
+from sqlalchemy import delete, insert
+
+os.environ.setdefault('SCHEDULER_ENABLED', 'false')
+
+from app import app, db
+from models import Trade, TradeCoverage
+
+parser = argparse.ArgumentParser(description='Backfill trade_coverage from the JSON coverage columns')
+parser.add_argument('--batch-size', type=int, default=1000)
+args = parser.parse_args()
+
+
+def coverage_rows(trade_id, kind, codes):
+    codes = dict.fromkeys(str(c).strip().upper() for c in codes or [] if c and str(c).strip())
+    return [{'trade_id': trade_id, 'kind': kind, 'code': code} for code in codes]
+
+
+with app.app_context():
+    last_id = 0
+    trades = rows_written = 0
+    while True:
+        batch = db.session.query(Trade.id, Trade.coverage_areas, Trade.coverage_districts).filter(
+            Trade.id > last_id
+        ).order_by(Trade.id).limit(args.batch_size).all()
+        if not batch:
+            break
+
+        trade_ids = [trade_id for trade_id, _, _ in batch]
+        rows = []
+        for trade_id, areas, districts in batch:
+            rows += coverage_rows(trade_id, 'area', areas)
+            rows += coverage_rows(trade_id, 'district', districts)
+
+        db.session.execute(delete(TradeCoverage).where(TradeCoverage.trade_id.in_(trade_ids)))
+        if rows:
+            db.session.execute(insert(TradeCoverage), rows)
+        db.session.commit()
+
+        last_id = trade_ids[-1]
+        trades += len(batch)
+        rows_written += len(rows)
+        print(f'Backfilled {trades} trades ({rows_written} coverage rows)')
+
+print(f'Done: {trades} trades, {rows_written} coverage rows')
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""Benchmark job alert rendering for different batch sizes.
+
+Usage:
+  python scripts/bench_alert_render.py --recipients 1 50 500
+
+Compares rendering the alert per recipient (as send_email_notifications used
+to) with rendering it once per batch via render_job_alert, and prints the
+time to build the message bodies for one tier.
+"""
+import os
+import argparse
+import timeit
+
+os.environ.setdefault('SCHEDULER_ENABLED', 'false')
+
+from app import app
+from models import Job
+from utils import render_job_alert
+
+
+def render_per_recipient(job, is_premium, count):
+    # Previous behaviour: the full document was rebuilt for every trade in the loop
+    for _ in range(count):
+        render_job_alert(job, is_premium)
+
+
+def render_once(job, is_premium, count):
+    html, text = render_job_alert(job, is_premium)
+    [(html, text) for _ in range(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark job alert rendering')
+    parser.add_argument('--recipients', type=int, nargs='+', default=[1, 50, 500])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    job = Job(
+        id=1, title='Burst pipe under kitchen sink', category='plumbing', urgency='emergency_now',
+        postcode_full='M1 1AE', description='Water is pouring from a pipe <b>under</b> the sink & into the cupboard.'
+    )
+
+    with app.app_context():
+        render_job_alert(job, True)  # compile and cache the templates
+        print(f'{"recipients":>10} {"per-recipient ms":>17} {"render-once ms":>15}')
+        for count in args.recipients:
+            number = max(1, 500 // count)
+            per_recipient = min(timeit.repeat(lambda: render_per_recipient(job, True, count),
+                                              number=number, repeat=args.repeat)) / number
+            once = min(timeit.repeat(lambda: render_once(job, True, count),
+                                     number=number, repeat=args.repeat)) / number
+            print(f'{count:>10} {per_recipient * 1000:>17.3f} {once * 1000:>15.3f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""Micro-benchmark for utils.parse_postcode.
+
+Usage:
+  python scripts/bench_parse_postcode.py --number 200000
+
+Compares the previous implementation (uncompiled pattern, new dict per call)
+with the precompiled, memoized parser, on a cold and a warm cache, and times
+parse_postcodes over a batch with repeats.
+"""
+import os
+import argparse
+import re
+import timeit
+
+os.environ.setdefault('SCHEDULER_ENABLED', 'false')
+
+from app import app
+from utils import parse_postcode, parse_postcodes, _parse_normalized_postcode
+
+SAMPLE = ['M1 1AE', 'SW1A 1AA', 'ec1a 1bb', 'B33 8TH', 'LS1 4AP', 'W1A 0AX', 'CR2 6XH', 'DN55 1PT']
+
+
+def legacy_parse_postcode(postcode):
+    """The implementation parse_postcode replaced, kept here for comparison."""
+    if not postcode:
+        return None
+    postcode = postcode.upper().strip().replace(' ', '')
+    pattern = r'^([A-Z]{1,2})([0-9][A-Z0-9]?)([0-9])([A-Z]{2})$'
+    match = re.match(pattern, postcode)
+    if not match:
+        return None
+    area = match.group(1)
+    district_num = match.group(2)
+    sector = match.group(3)
+    unit = match.group(4)
+    district = area + district_num
+    return {
+        'full': f"{area}{district_num} {sector}{unit}",
+        'area': area,
+        'district': district,
+        'sector': sector,
+        'unit': unit
+    }
+
+
+def per_call_ns(stmt, number):
+    return min(timeit.repeat(stmt, number=number, repeat=5)) / (number * len(SAMPLE)) * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark postcode parsing')
+    parser.add_argument('--number', type=int, default=100000, help='Iterations per timing run')
+    args = parser.parse_args()
+
+    def cold():
+        _parse_normalized_postcode.cache_clear()
+        for postcode in SAMPLE:
+            parse_postcode(postcode)
+
+    results = {
+        'legacy': per_call_ns(lambda: [legacy_parse_postcode(p) for p in SAMPLE], args.number),
+        'cached (cold)': per_call_ns(cold, args.number // 10),
+        'cached (warm)': per_call_ns(lambda: [parse_postcode(p) for p in SAMPLE], args.number),
+        'parse_postcodes': per_call_ns(lambda: parse_postcodes(SAMPLE), args.number),
+    }
+    for name, ns in results.items():
+        print(f'{name:>16}: {ns:8.0f} ns/postcode')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""Build the offline postcode database used by geocode_postcode.
+
+Usage:
+  python scripts/build_postcode_db.py ukpostcodes.csv --out data/postcodes.bin
+
+The CSV needs a postcode column and latitude/longitude columns (the defaults
+match the free ukpostcodes.csv / ONS Postcode Directory exports; use the
+--*-col options for other layouts). Rows with unparseable postcodes or
+coordinates are skipped, as are coordinates outside the UK, such as the
+placeholder (99.999999, 0) those files give postcodes without a grid
+reference, so they do not skew the sector, district and area centroids.
+"""
+import argparse
+import os
+import time
+
+os.environ.setdefault('SCHEDULER_ENABLED', 'false')
+
+from app import app
+from geocoder import build_postcode_db, read_postcode_csv
+from utils import parse_postcode
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build the memory-mapped postcode database')
+    parser.add_argument('csv_path', help='Source CSV file')
+    parser.add_argument('--out', default='data/postcodes.bin', help='Output database path')
+    parser.add_argument('--postcode-col', default='postcode')
+    parser.add_argument('--lat-col', default='latitude')
+    parser.add_argument('--lon-col', default='longitude')
+    args = parser.parse_args()
+
+    out_dir = os.path.dirname(args.out)
+    if out_dir:
+        os.makedirs(out_dir, exist_ok=True)
+
+    started = time.perf_counter()
+    rows = read_postcode_csv(args.csv_path, parse_postcode,
+                             postcode_col=args.postcode_col, lat_col=args.lat_col, lon_col=args.lon_col)
+    count = build_postcode_db(rows, args.out)
+    elapsed = time.perf_counter() - started
+    print(f'Wrote {count} postcodes to {args.out} ({os.path.getsize(args.out)} bytes) in {elapsed:.1f}s')
+
+
+if __name__ == '__main__':
+    main()
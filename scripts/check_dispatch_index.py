@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""Check the in-memory dispatch index against the SQL coverage query.
+
+Usage:
+  python scripts/check_dispatch_index.py --limit 1000
+
+Builds the index from the database, then runs both matching paths for the
+most recent jobs and reports any job where they disagree. Exits non-zero on
+a mismatch.
+"""
+import os
+import argparse
+import sys
+
+os.environ.setdefault('SCHEDULER_ENABLED', 'false')
+
+from app import app
+from models import Job
+from dispatch_index import dispatch_index
+from utils import check_dispatch_index
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check dispatch index consistency')
+    parser.add_argument('--limit', type=int, default=1000, help='Number of recent jobs to check')
+    args = parser.parse_args()
+
+    with app.app_context():
+        dispatch_index.build()
+        jobs = Job.query.order_by(Job.created_at.desc()).limit(args.limit).all()
+        mismatches = check_dispatch_index(jobs)
+
+        for job_id, missing, extra in mismatches:
+            print(f'Job {job_id}: missing from index {sorted(missing)}, extra in index {sorted(extra)}')
+        print(f'Checked {len(jobs)} jobs, {len(mismatches)} mismatches')
+
+    return 1 if mismatches else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
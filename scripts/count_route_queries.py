@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Count the SQL statements each logged-in route runs per request and check them against budgets.
+Run from the project root against a development database (it creates one
+customer, one trade, one admin and a job for them if missing):
+    DATABASE_URL=sqlite:////tmp/queries.db python scripts/count_route_queries.py
+
+Each route is requested twice as the same user. The first request pays for
+loading the user into the identity cache; the second is the steady state,
+which must stay within the route's budget in ROUTES. With --check the
+script exits 1 when a route goes over, listing the statements it ran, so it
+can gate CI. --blank-missing-templates renders missing templates as empty
+pages, for checkouts that do not ship them.
+"""
+import os
+import sys
+import argparse
+import logging
+from jinja2 import ChoiceLoader, FunctionLoader
+from sqlalchemy import event
+
+os.environ.setdefault('SCHEDULER_ENABLED', 'false')
+os.environ.setdefault('MAIL_SUPPRESS_SEND', 'true')
+
+from app import app, db
+from models import User, Customer, Trade, Job
+
+# (role, path, budget): the most statements a steady-state request may run
+ROUTES = [
+    ('customer', '/customer/dashboard', 3),
+    ('customer', '/customer/create-job', 0),
+    ('customer', '/job/{job_id}', 2),
+    ('customer', '/job/{job_id}/review', 2),
+    ('trade', '/trade/dashboard', 1),
+    ('trade', '/trade/profile', 1),
+    ('trade', '/trade/billing', 1),
+    ('trade', '/job/{job_id}', 2),
+    ('admin', '/admin/dashboard', 2),
+    ('admin', '/admin/trades', 1),
+]
+
+parser = argparse.ArgumentParser(description='Count SQL statements per request for the logged-in routes')
+parser.add_argument('--blank-missing-templates', action='store_true')
+parser.add_argument('--check', action='store_true', help='exit 1 if a route runs more statements than its budget')
+args = parser.parse_args()
+
+
+def fixture_user(role):
+    email = f'query-count-{role}@example.com'
+    user = User.query.filter_by(email=email).first()
+    if not user:
+        user = User(email=email, role=role)
+        user.set_password('query-count')
+        db.session.add(user)
+        db.session.flush()
+        if role == 'customer':
+            db.session.add(Customer(user_id=user.id, name='Query Count', addresses='[]'))
+        elif role == 'trade':
+            db.session.add(Trade(user_id=user.id, company='Query Count Ltd', verified=True))
+        db.session.commit()
+    return user
+
+
+def fixture_job(customer_user, trade_user):
+    customer = Customer.query.filter_by(user_id=customer_user.id).first()
+    trade = Trade.query.filter_by(user_id=trade_user.id).first()
+    job = Job.query.filter_by(customer_id=customer.id).first()
+    if not job:
+        job = Job(customer_id=customer.id, title='Query count', category='plumbing', description='Fixture',
+                  postcode_full='M1 1AA', postcode_area='M', postcode_district='M1', urgency='next_day',
+                  urgency_sla_minutes=Job.get_urgency_sla_minutes('next_day'), status='accepted',
+                  accepted_trade_id=trade.id)
+        db.session.add(job)
+        db.session.commit()
+    return job.id
+
+
+if args.blank_missing_templates:
+    app.jinja_env.loader = ChoiceLoader([app.jinja_env.loader, FunctionLoader(lambda name: '')])
+logging.disable(logging.INFO)
+
+statements = []
+with app.app_context():
+    users = {role: fixture_user(role) for role in ('customer', 'trade', 'admin')}
+    job_id = fixture_job(users['customer'], users['trade'])
+    user_ids = {role: user.id for role, user in users.items()}
+    event.listen(db.engine, 'before_cursor_execute', lambda *a: statements.append(a[2]))
+
+clients = {}
+for role, user_id in user_ids.items():
+    clients[role] = app.test_client()
+    with clients[role].session_transaction() as sess:
+        sess['_user_id'] = str(user_id)
+        sess['_fresh'] = True
+
+over_budget = 0
+print(f"{'route':<28} {'role':<9} {'status':>6} {'first':>6} {'steady':>6} {'budget':>6}")
+for role, path, budget in ROUTES:
+    path = path.format(job_id=job_id)
+    counts = []
+    for _ in range(2):
+        statements.clear()
+        response = clients[role].get(path)
+        counts.append(len(statements))
+    over = counts[1] > budget
+    over_budget += over
+    print(f'{path:<28} {role:<9} {response.status_code:>6} {counts[0]:>6} {counts[1]:>6} {budget:>6}'
+          f'{"  OVER BUDGET" if over else ""}')
+    if over:
+        for statement in statements:
+            print(f'    {" ".join(statement.split())[:160]}')
+
+if args.check and over_budget:
+    sys.exit(1)
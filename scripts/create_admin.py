@@ -6,8 +6,12 @@ Usage:
 
 If --password is not provided the script will prompt you to enter one securely.
 """
+import os
 import argparse
 import getpass
+
+os.environ.setdefault('SCHEDULER_ENABLED', 'false')
+
 from app import app, db
 from models import User
 
@@ -33,6 +37,7 @@ def main():
             print(f'Found existing user {email}, updating role to admin and setting password')
             user.role = 'admin'
             user.set_password(password)
+            # Running app processes cache identities; they see the new role within IDENTITY_CACHE_SECONDS
         else:
             print(f'Creating new admin user {email}')
             user = User(email=email, role='admin')
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Print the query plans for coverage lookups, to confirm they use ix_trade_coverage_kind_code.
+Works against SQLite (EXPLAIN QUERY PLAN) and PostgreSQL (EXPLAIN ANALYZE):
+    python scripts/explain_trade_coverage.py --area M --district M1
+    DATABASE_URL=postgresql://... python scripts/explain_trade_coverage.py --area M --district M1
+
+Postgres only prefers the index once the table is big enough and analyzed,
+so run it against realistic data (see benchmarks/dispatch.py) after ANALYZE.
+"""
+import os
+import argparse
+from sqlalchemy import text
+
+os.environ.setdefault('SCHEDULER_ENABLED', 'false')
+
+from app import app, db
+from models import Trade, TradeCoverage
+
+parser = argparse.ArgumentParser(description='EXPLAIN the trade_coverage queries')
+parser.add_argument('--area', default='M')
+parser.add_argument('--district', default='M1')
+args = parser.parse_args()
+
+
+def explain(label, query):
+    compiled = query.statement.compile(db.engine, compile_kwargs={'literal_binds': True})
+    if db.engine.dialect.name == 'sqlite':
+        prefix = 'EXPLAIN QUERY PLAN'
+    else:
+        prefix = 'EXPLAIN ANALYZE'
+    print(f'-- {label}')
+    print(compiled)
+    for row in db.session.execute(text(f'{prefix} {compiled}')):
+        # SQLite returns (id, parent, notused, detail); Postgres a single text column
+        print('   ', row[-1])
+    print()
+
+
+with app.app_context():
+    if db.engine.dialect.name == 'postgresql':
+        db.session.execute(text('ANALYZE trade_coverage'))
+
+    covering = TradeCoverage.covering(area=args.area, district=args.district)
+    explain('find_matching_trades_sql', Trade.query.filter_by(verified=True).filter(Trade.id.in_(covering)))
+    explain('trade_directory area filter', Trade.query.filter_by(verified=True).join(TradeCoverage).filter(
+        TradeCoverage.kind == 'area', TradeCoverage.code == args.area.upper()
+    ).limit(12))
@@ -3,21 +3,34 @@
 Export trade profiles (and linked documents) to CSV for easy management.
 Run from the project root:
     python scripts/export_profiles.py
+    python scripts/export_profiles.py --area M   # only trades covering postcode area M
 
 The script uses the Flask app factory in app.py, so it must be run where the project can import app.
 """
+import argparse
 import csv
 import os
 from datetime import datetime
+
+os.environ.setdefault('SCHEDULER_ENABLED', 'false')
+
 from app import app, db
-from models import Trade, TradeDocument
+from models import Trade, TradeCoverage, TradeDocument
+
+parser = argparse.ArgumentParser(description='Export trade profiles to CSV')
+parser.add_argument('--area', help='only export trades covering this postcode area')
+args = parser.parse_args()
 
 OUT_DIR = os.path.join(os.getcwd(), 'exports')
 os.makedirs(OUT_DIR, exist_ok=True)
 OUT_FILE = os.path.join(OUT_DIR, f'trades_export_{datetime.utcnow().strftime("%Y%m%d_%H%M%S")}.csv')
 
 with app.app_context():
-    trades = Trade.query.order_by(Trade.created_at.asc()).all()
+    query = Trade.query
+    if args.area:
+        query = query.join(TradeCoverage).filter(TradeCoverage.kind == 'area',
+                                                 TradeCoverage.code == args.area.strip().upper())
+    trades = query.order_by(Trade.created_at.asc()).all()
 
     with open(OUT_FILE, 'w', newline='', encoding='utf-8') as csvfile:
         writer = csv.writer(csvfile)
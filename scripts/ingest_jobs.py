@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+Bulk-load jobs from a partner feed (JSONL or CSV) into the database.
+Run from the project root:
+    python scripts/ingest_jobs.py feed.jsonl --source acme-insurance
+    python scripts/ingest_jobs.py feed.csv --chunk-size 1000 --errors errors.json
+
+Jobs are inserted in chunks; each chunk is dispatched to trades by the outbox
+worker (scripts/outbox_worker.py). Rows that fail validation are reported
+and skipped.
+"""
+import os
+import json
+import time
+import argparse
+
+os.environ.setdefault('SCHEDULER_ENABLED', 'false')
+
+from app import app
+import ingest
+
+parser = argparse.ArgumentParser(description='Bulk-load jobs from a JSONL or CSV feed')
+parser.add_argument('path')
+parser.add_argument('--format', choices=['jsonl', 'csv'], help='default: from the file extension')
+parser.add_argument('--chunk-size', type=int, help='rows per insert (default: INGEST_CHUNK_SIZE)')
+parser.add_argument('--source', help='partner name for the logs')
+parser.add_argument('--errors', help='write per-row errors to this JSON file')
+args = parser.parse_args()
+
+fmt = args.format or ('csv' if args.path.lower().endswith('.csv') else 'jsonl')
+
+with app.app_context():
+    started = time.perf_counter()
+    with open(args.path, encoding='utf-8', newline='') as f:
+        summary = ingest.ingest_jobs(
+            ingest.read_rows(f, fmt),
+            chunk_size=args.chunk_size or app.config.get('INGEST_CHUNK_SIZE', 500),
+            source=args.source or os.path.basename(args.path),
+        )
+    elapsed = time.perf_counter() - started
+
+print(f"Inserted {summary['inserted']} of {summary['received']} jobs in {summary['chunks']} chunks "
+      f"({elapsed:.1f}s, {summary['inserted'] / elapsed * 60 if elapsed else 0:.0f} jobs/minute)")
+if summary['errors']:
+    print(f"{len(summary['errors'])} rows rejected, e.g.:")
+    for error in summary['errors'][:10]:
+        print(f"  line {error['line']}: {error['error']}")
+    if args.errors:
+        with open(args.errors, 'w') as f:
+            json.dump(summary['errors'], f, indent=2)
+        print(f'Wrote {args.errors}')
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Contention test for job acceptance: many trades accept the same job at once.
+Run from the project root against a throwaway database:
+    DATABASE_URL=sqlite:////tmp/accept.db python scripts/loadtest_accept_job.py --trades 300 --rounds 5
+
+Every round posts a fresh job, releases all accept requests together through
+the /trade/accept-job route and asserts that exactly one trade won and the
+job row names that trade. Prints latency percentiles for winners and losers.
+"""
+import os
+import sys
+import time
+import argparse
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import insert
+
+os.environ.setdefault('SCHEDULER_ENABLED', 'false')
+os.environ.setdefault('MAIL_SUPPRESS_SEND', 'true')
+
+from app import app, db
+from models import User, Trade, Job
+
+parser = argparse.ArgumentParser(description='Concurrent accept load test')
+parser.add_argument('--trades', type=int, default=300, help='concurrent accepting trades')
+parser.add_argument('--rounds', type=int, default=5)
+args = parser.parse_args()
+
+
+def create_trades(count):
+    first_user_id = (db.session.query(db.func.max(User.id)).scalar() or 0) + 1
+    run = int(time.time())
+    db.session.execute(insert(User), [
+        {'id': first_user_id + i, 'email': f'accept-{run}-{i}@example.com', 'password_hash': 'x', 'role': 'trade'}
+        for i in range(count)
+    ])
+    db.session.execute(insert(Trade), [
+        {'user_id': first_user_id + i, 'company': f'Accept Test {i}', 'verified': True}
+        for i in range(count)
+    ])
+    db.session.commit()
+    return [(user_id, trade_id) for user_id, trade_id in db.session.query(Trade.user_id, Trade.id).filter(
+        Trade.user_id >= first_user_id
+    )]
+
+
+def post_job():
+    job = Job(customer_name='Load Test', title='Burst pipe', category='plumbing', description='Accept load test',
+              postcode_full='M1 1AA', postcode_area='M', postcode_district='M1', urgency='emergency_now',
+              urgency_sla_minutes=0)
+    db.session.add(job)
+    db.session.commit()
+    return job.id
+
+
+def percentile(samples, p):
+    return samples[min(len(samples) - 1, int(p * len(samples)))] * 1000
+
+
+def run_round(job_id, trades):
+    clients = []
+    for user_id, trade_id in trades:
+        client = app.test_client()
+        with client.session_transaction() as sess:
+            sess['_user_id'] = str(user_id)
+            sess['_fresh'] = True
+        clients.append((client, trade_id))
+
+    start = threading.Barrier(len(clients))
+
+    def accept(client_and_trade):
+        client, trade_id = client_and_trade
+        start.wait()
+        started = time.perf_counter()
+        response = client.post(f'/trade/accept-job/{job_id}')
+        elapsed = time.perf_counter() - started
+        won = response.status_code == 302 and response.headers['Location'].endswith(f'/job/{job_id}')
+        return trade_id, won, elapsed
+
+    with ThreadPoolExecutor(max_workers=len(clients)) as pool:
+        return list(pool.map(accept, clients))
+
+
+logging.disable(logging.INFO)
+failures = 0
+with app.app_context():
+    trades = create_trades(args.trades)
+    winner_latencies, loser_latencies = [], []
+    for round_number in range(1, args.rounds + 1):
+        job_id = post_job()
+        results = run_round(job_id, trades)
+        winners = [trade_id for trade_id, won, _ in results if won]
+        winner_latencies += [elapsed for _, won, elapsed in results if won]
+        loser_latencies += [elapsed for _, won, elapsed in results if not won]
+
+        db.session.expire_all()
+        job = db.session.get(Job, job_id)
+        ok = len(winners) == 1 and job.status == 'accepted' and job.accepted_trade_id == winners[0]
+        failures += not ok
+        print(f'round {round_number}: {len(results)} accepts, {len(winners)} winner(s), '
+              f'job accepted by {job.accepted_trade_id} -> {"OK" if ok else "FAIL"}')
+
+for label, samples in (('winner', winner_latencies), ('loser', loser_latencies)):
+    samples.sort()
+    if samples:
+        print(f'{label:<7} n={len(samples):<6} p50={percentile(samples, 0.5):.1f}ms '
+              f'p95={percentile(samples, 0.95):.1f}ms p99={percentile(samples, 0.99):.1f}ms '
+              f'max={samples[-1] * 1000:.1f}ms')
+
+sys.exit(1 if failures else 0)
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""Run the outbox worker that matches and notifies trades for new jobs.
+
+Usage:
+  python scripts/outbox_worker.py --threads 4
+
+Run one or more of these next to the web workers. Jobs are committed with an
+outbox row by the web process; this worker claims those rows, runs their
+handlers on a thread pool and retries failures with exponential backoff
+until OUTBOX_MAX_ATTEMPTS, after which they are dead-lettered.
+"""
+import argparse
+import json
+import logging
+import signal
+import threading
+from app import app
+from outbox import OutboxWorker, outbox_metrics
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Drain the job notification outbox')
+    parser.add_argument('--threads', type=int, default=4, help='Handler thread pool size')
+    parser.add_argument('--batch-size', type=int, default=20, help='Messages claimed per poll')
+    parser.add_argument('--poll-interval', type=float, default=1.0, help='Seconds to wait when idle')
+    parser.add_argument('--metrics-interval', type=float, default=60.0, help='Seconds between metrics log lines')
+    args = parser.parse_args()
+
+    worker = OutboxWorker(app, threads=args.threads, batch_size=args.batch_size, poll_interval=args.poll_interval)
+    signal.signal(signal.SIGTERM, lambda *_: worker.stop())
+    signal.signal(signal.SIGINT, lambda *_: worker.stop())
+
+    def log_metrics():
+        while not worker.stop_event.wait(args.metrics_interval):
+            with app.app_context():
+                metrics = outbox_metrics()
+            metrics['handled'] = worker.processed
+            metrics['failed'] = worker.failed
+            logging.info(f"Outbox metrics: {json.dumps(metrics)}")
+
+    threading.Thread(target=log_metrics, name='outbox-metrics', daemon=True).start()
+    worker.run()
+
+
+if __name__ == '__main__':
+    main()
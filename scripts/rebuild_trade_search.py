@@ -0,0 +1,27 @@
+#!/usr/bin/env python3
+"""
+Rebuild the trade directory search index (FTS5 on SQLite, tsvector/pg_trgm on PostgreSQL).
+Run from the project root after bulk-loading trades outside the app:
+    python scripts/rebuild_trade_search.py
+
+The app fills an empty index at startup and keeps it in sync on profile
+edits, so this is only needed when trades were written directly to the table.
+"""
+import os
+import argparse
+
+os.environ.setdefault('SCHEDULER_ENABLED', 'false')
+
+from app import app
+from search import trade_search
+
+parser = argparse.ArgumentParser(description='Rebuild the trade search index')
+parser.add_argument('--batch-size', type=int, default=1000)
+args = parser.parse_args()
+
+with app.app_context():
+    if not trade_search.backend:
+        raise SystemExit('Trade search is not available on this database (see the startup log)')
+    indexed = trade_search.rebuild(args.batch_size, log=print)
+
+print(f'Done: {indexed} trades indexed')
@@ -0,0 +1,204 @@
+import re
+import bisect
+import logging
+from sqlalchemy import text
+from app import db
+from models import Trade
+from cache import cache
+
+MAX_RESULTS = 240
+VOCABULARY_CACHE_SECONDS = 300
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+FTS5_SCHEMA = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS trade_search USING fts5("
+    "company, skills, coverage, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')",
+    "CREATE VIRTUAL TABLE IF NOT EXISTS trade_search_vocab USING fts5vocab(trade_search, 'row')",
+)
+POSTGRES_SCHEMA = (
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE TABLE IF NOT EXISTS trade_search ("
+    "trade_id INTEGER PRIMARY KEY REFERENCES trades(id) ON DELETE CASCADE, "
+    "document TEXT NOT NULL, tsv TSVECTOR NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS ix_trade_search_tsv ON trade_search USING gin (tsv)",
+    "CREATE INDEX IF NOT EXISTS ix_trade_search_document_trgm ON trade_search USING gin (document gin_trgm_ops)",
+)
+
+AREA_FILTER = "AND t.id IN (SELECT trade_id FROM trade_coverage WHERE kind = 'area' AND code = :area)"
+
+# bm25 weights company, skills and coverage; a 5-star rating scales relevance by 1.5
+FTS5_SEARCH = """
+    SELECT t.id FROM trade_search JOIN trades t ON t.id = trade_search.rowid
+    WHERE trade_search MATCH :match AND t.verified {area}
+    ORDER BY bm25(trade_search, 10.0, 4.0, 1.0) * (1 + COALESCE(t.rating_avg, 0) / 10.0), t.id DESC
+    LIMIT :limit
+"""
+POSTGRES_SEARCH = """
+    SELECT t.id FROM trade_search s JOIN trades t ON t.id = s.trade_id
+    WHERE t.verified AND (s.tsv @@ to_tsquery('simple', :tsquery) OR :words <% s.document) {area}
+    ORDER BY (ts_rank_cd(s.tsv, to_tsquery('simple', :tsquery)) + word_similarity(:words, s.document))
+             * (1 + COALESCE(t.rating_avg, 0) / 10.0) DESC, t.id DESC
+    LIMIT :limit
+"""
+
+
+def tokenize(value):
+    return [token.lower() for token in TOKEN_RE.findall(value or '')]
+
+
+def search_fields(trade):
+    """The text indexed for a trade: company name, skills and postcode coverage."""
+    return {
+        'company': trade.company or '',
+        'skills': ' '.join(skill.replace('_', ' ') for skill in trade.get_skills()),
+        'coverage': ' '.join(trade.get_coverage_areas() + trade.get_coverage_districts()),
+    }
+
+
+def within_distance(a, b, limit):
+    """True if the Levenshtein distance between a and b is at most `limit`."""
+    if abs(len(a) - len(b)) > limit:
+        return False
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)))
+        if min(current) > limit:
+            return False
+        previous = current
+    return previous[-1] <= limit
+
+
+def typo_limit(token):
+    if len(token) >= 8:
+        return 2
+    if len(token) >= 4:
+        return 1
+    return 0
+
+
+class TradeSearch:
+    """Full-text search over trade company names, skills and coverage.
+
+    SQLite uses an FTS5 table (rowid = trade id) ranked by bm25; PostgreSQL a
+    tsvector plus pg_trgm table ranked by ts_rank_cd and word similarity. Both
+    match every query word as a prefix and scale relevance by rating. Writers
+    call `index_trade` before committing a profile change, so the index row
+    commits with it. `backend` stays None when neither is available, and
+    callers fall back to a LIKE filter.
+
+    On SQLite, typo tolerance comes from the index vocabulary: a word no
+    indexed term starts with is widened to the terms within edit distance 1
+    (2 for words of 8+ letters). On PostgreSQL the trigram similarity match
+    covers typos.
+    """
+
+    def __init__(self):
+        self.backend = None
+
+    def init(self):
+        dialect = db.engine.dialect.name
+        schema = {'sqlite': FTS5_SCHEMA, 'postgresql': POSTGRES_SCHEMA}.get(dialect)
+        if not schema:
+            return
+        for statement in schema:
+            db.session.execute(text(statement))
+        db.session.commit()
+        self.backend = dialect
+
+    def index_trade(self, trade):
+        """Write a trade's search row in the current transaction; call after flush so it has an id."""
+        if not self.backend:
+            return
+        self._write([dict(search_fields(trade), trade_id=trade.id)])
+
+    def _write(self, rows):
+        if self.backend == 'sqlite':
+            db.session.execute(text('DELETE FROM trade_search WHERE rowid = :trade_id'), rows)
+            db.session.execute(text(
+                'INSERT INTO trade_search (rowid, company, skills, coverage) '
+                'VALUES (:trade_id, :company, :skills, :coverage)'
+            ), rows)
+        else:
+            db.session.execute(text(
+                "INSERT INTO trade_search (trade_id, document, tsv) VALUES ("
+                ":trade_id, concat_ws(' ', :company, :skills, :coverage), "
+                "setweight(to_tsvector('simple', :company), 'A') || setweight(to_tsvector('simple', :skills), 'B')"
+                " || setweight(to_tsvector('simple', :coverage), 'C')) "
+                "ON CONFLICT (trade_id) DO UPDATE SET document = excluded.document, tsv = excluded.tsv"
+            ), rows)
+
+    def rebuild(self, batch_size=1000, log=None):
+        """Re-index every trade, committing once per batch. Returns the number indexed."""
+        if not self.backend:
+            return 0
+        db.session.execute(text('DELETE FROM trade_search'))
+        last_id = indexed = 0
+        while True:
+            trades = Trade.query.filter(Trade.id > last_id).order_by(Trade.id).limit(batch_size).all()
+            if not trades:
+                break
+            self._write([dict(search_fields(trade), trade_id=trade.id) for trade in trades])
+            db.session.commit()
+            last_id = trades[-1].id
+            indexed += len(trades)
+            if log:
+                log(f'Indexed {indexed} trades')
+        db.session.commit()
+        cache.delete('trade_search:vocabulary')
+        return indexed
+
+    def is_empty(self):
+        return db.session.execute(text('SELECT 1 FROM trade_search LIMIT 1')).first() is None
+
+    def search(self, query, area=None, limit=MAX_RESULTS):
+        """Ids of verified trades matching every word of `query`, best first."""
+        tokens = tokenize(query)
+        if not tokens or not self.backend:
+            return []
+        params = {'limit': limit, 'area': (area or '').strip().upper()}
+        area_filter = AREA_FILTER if params['area'] else ''
+        if self.backend == 'sqlite':
+            params['match'] = ' '.join(self._fts5_alternatives(token) for token in tokens)
+            sql = FTS5_SEARCH.format(area=area_filter)
+        else:
+            params['tsquery'] = ' & '.join(f'{token}:*' for token in tokens)
+            params['words'] = ' '.join(tokens)
+            sql = POSTGRES_SEARCH.format(area=area_filter)
+        return db.session.execute(text(sql), params).scalars().all()
+
+    def _fts5_alternatives(self, token):
+        terms = [f'"{token}"*']
+        limit = typo_limit(token)
+        if limit:
+            vocabulary = self._vocabulary()
+            position = bisect.bisect_left(vocabulary, token)
+            if position == len(vocabulary) or not vocabulary[position].startswith(token):
+                terms += [f'"{term}"' for term in vocabulary if within_distance(token, term, limit)]
+        return terms[0] if len(terms) == 1 else f"({' OR '.join(terms)})"
+
+    def _vocabulary(self):
+        # Sorted distinct indexed terms; other workers' new terms show up within the TTL
+        return cache.get_or_set(
+            'trade_search:vocabulary',
+            lambda: db.session.execute(text('SELECT term FROM trade_search_vocab ORDER BY term')).scalars().all(),
+            VOCABULARY_CACHE_SECONDS,
+        )
+
+
+trade_search = TradeSearch()
+
+
+def init_trade_search(app):
+    """Create the search index if needed and fill it on first run."""
+    try:
+        trade_search.init()
+        if trade_search.backend and trade_search.is_empty():
+            indexed = trade_search.rebuild()
+            logging.info(f"Trade search index built with {indexed} trades")
+    except Exception as e:
+        # e.g. SQLite without FTS5 or no CREATE EXTENSION privilege; the directory falls back to LIKE
+        db.session.rollback()
+        trade_search.backend = None
+        logging.warning(f"Trade search index unavailable: {str(e)}")
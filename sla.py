@@ -0,0 +1,131 @@
+import heapq
+import logging
+from itertools import islice
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import update
+from app import db
+from models import Job
+from scheduler import scheduler
+
+# Escalation hooks run once per breached job, in the process that won the breach claim
+ESCALATION_HOOKS = []
+
+
+def escalation_hook(fn):
+    ESCALATION_HOOKS.append(fn)
+    return fn
+
+
+class SLAMonitor:
+    """SLA deadlines of open (posted, unaccepted) jobs.
+
+    Each open job has a timer on the deadline scheduler, whose min-heap fires
+    it when the job's deadline passes, so breaches are found without polling
+    the jobs table. A timer fires once: it claims the breach with a
+    conditional UPDATE, so a job escalates once however many processes track
+    it, and is not re-armed. Every process arms the jobs it created plus those
+    open at startup. The at-risk list is read from the jobs table, so every
+    process answers it the same way.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.minimum_minutes = 15
+
+    def deadline_for(self, created_at, sla_minutes):
+        # emergency_now has an SLA of 0 minutes; give it the minimum response window instead
+        return created_at + timedelta(minutes=self.window_minutes(sla_minutes))
+
+    def window_minutes(self, sla_minutes):
+        return max(sla_minutes or 0, self.minimum_minutes)
+
+    def track(self, job_id, created_at, sla_minutes):
+        if not self.enabled:
+            return
+        due_ts = self.deadline_for(created_at, sla_minutes).replace(tzinfo=timezone.utc).timestamp()
+        scheduler.schedule(('sla', job_id), due_ts, check_sla_breach, job_id)
+
+    def track_job(self, job):
+        self.track(job.id, job.created_at, job.urgency_sla_minutes)
+
+    def untrack(self, job_id):
+        """Stop watching a job that was accepted, completed or canceled."""
+        scheduler.cancel(('sla', job_id))
+
+    def at_risk(self, within_minutes=30, limit=100):
+        """Open jobs breached or due within `within_minutes`, soonest deadline first.
+
+        A job's deadline is created_at plus a window fixed by its SLA, so for
+        each SLA the jobs due by the horizon are one range of the (status,
+        urgency_sla_minutes, created_at) index, already in deadline order.
+        """
+        now = datetime.utcnow()
+        horizon = now + timedelta(minutes=within_minutes)
+        columns = (Job.id, Job.created_at, Job.urgency_sla_minutes, Job.urgency, Job.postcode_area,
+                   Job.sla_breached_at)
+        ranges = []
+        for sla_minutes in sorted(set(Job.URGENCY_SLA_MINUTES.values()) | {Job.get_urgency_sla_minutes(None)}):
+            ranges.append(db.session.query(*columns).filter(
+                Job.status == 'posted',
+                Job.urgency_sla_minutes == sla_minutes,
+                Job.created_at <= horizon - timedelta(minutes=self.window_minutes(sla_minutes)),
+            ).order_by(Job.created_at, Job.id).limit(limit).all())
+        due = heapq.merge(*ranges, key=lambda row: (self.deadline_for(row.created_at, row.urgency_sla_minutes), row.id))
+        jobs = []
+        for row in islice(due, limit):
+            deadline = self.deadline_for(row.created_at, row.urgency_sla_minutes)
+            jobs.append({'job_id': row.id, 'deadline': deadline.isoformat(),
+                         'seconds_remaining': round((deadline - now).total_seconds()),
+                         'breached': row.sla_breached_at is not None, 'urgency': row.urgency,
+                         'postcode_area': row.postcode_area})
+        return jobs
+
+
+sla_monitor = SLAMonitor()
+
+
+def check_sla_breach(job_id):
+    """Scheduler callback at a job's deadline: claim the breach and run the escalation hooks."""
+    claimed = db.session.execute(
+        update(Job)
+        .where(Job.id == job_id, Job.status == 'posted', Job.sla_breached_at.is_(None))
+        .values(sla_breached_at=datetime.utcnow())
+    ).rowcount
+    db.session.commit()
+    if not claimed:
+        # Accepted or closed, or another process (or a run before a restart) already escalated it
+        return
+
+    job = db.session.get(Job, job_id)
+    for hook in ESCALATION_HOOKS:
+        try:
+            hook(job)
+        except Exception:
+            logging.exception(f"SLA escalation hook {hook.__name__} failed for job {job_id}")
+
+
+@escalation_hook
+def log_breach(job):
+    overdue = datetime.utcnow() - sla_monitor.deadline_for(job.created_at, job.urgency_sla_minutes)
+    logging.warning(f"SLA breached for job {job.id} ({job.urgency}, {job.postcode_district}): "
+                    f"still unaccepted {overdue.total_seconds():.0f}s after its deadline")
+
+
+def init_sla_monitor(app):
+    """Arm the deadlines of every open job not yet breached; needs the scheduler thread to fire them."""
+    sla_monitor.minimum_minutes = app.config.get('SLA_MINIMUM_MINUTES', 15)
+    sla_monitor.enabled = app.config.get('SCHEDULER_ENABLED', True)
+    if not sla_monitor.enabled:
+        return
+    try:
+        open_jobs = db.session.query(Job.id, Job.created_at, Job.urgency_sla_minutes).filter(
+            Job.status == 'posted', Job.sla_breached_at.is_(None)
+        ).all()
+    except Exception as e:
+        db.session.rollback()
+        logging.warning(f"Open jobs not loaded into the SLA monitor: {str(e)}")
+        return
+
+    for job_id, created_at, sla_minutes in open_jobs:
+        sla_monitor.track(job_id, created_at, sla_minutes)
+    logging.info(f"SLA monitor armed {len(open_jobs)} open job deadlines")
@@ -1,123 +1,535 @@
 import re
+import heapq
 import logging
-from datetime import datetime, timedelta
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
 from flask import current_app
 from flask_mail import Message
-from app import mail, db
-from models import Trade, Job
+from sqlalchemy.orm import selectinload
+from app import db
+from models import User, Customer, Trade, TradeCoverage, Job, DispatchDecision, NotificationWave
+from capabilities import category_mask
+from scheduler import scheduler
+import outbox
+from mailer import send_messages
+from cache import cache
+from rollups import record_accepted
+from event_hub import publish_job_offers, publish_job_accepted
+
+# UK postcode regex pattern, applied to the normalized (upper case, no spaces) form
+POSTCODE_RE = re.compile(r'^([A-Z]{1,2})([0-9][A-Z0-9]?)([0-9])([A-Z]{2})$')
+
+@dataclass(frozen=True, slots=True)
+class Postcode:
+    """Parsed UK postcode. Immutable, so cached instances can be shared."""
+    full: str
+    area: str
+    district: str
+    sector: str
+    unit: str
+
+@lru_cache(maxsize=65536)
+def _parse_normalized_postcode(postcode):
+    match = POSTCODE_RE.match(postcode)
+    if not match:
+        return None
+
+    area, district_num, sector, unit = match.groups()
+    district = area + district_num
+    return Postcode(
+        full=f"{district} {sector}{unit}",
+        area=area,
+        district=district,
+        sector=sector,
+        unit=unit
+    )
 
 def parse_postcode(postcode):
-    """Parse a UK postcode into components."""
+    """Parse a UK postcode into components; returns a Postcode or None."""
     if not postcode:
         return None
-    
+    if isinstance(postcode, Postcode):
+        return postcode
+
     # Clean and normalize postcode
-    postcode = postcode.upper().strip().replace(' ', '')
-    
-    # UK postcode regex pattern
-    pattern = r'^([A-Z]{1,2})([0-9][A-Z0-9]?)([0-9])([A-Z]{2})$'
-    match = re.match(pattern, postcode)
-    
-    if not match:
-        return None
-    
-    area = match.group(1)
-    district_num = match.group(2)
-    sector = match.group(3)
-    unit = match.group(4)
-    
-    district = area + district_num
-    full_postcode = f"{area}{district_num} {sector}{unit}"
-    
-    return {
-        'full': full_postcode,
-        'area': area,
-        'district': district,
-        'sector': sector,
-        'unit': unit
-    }
+    return _parse_normalized_postcode(postcode.upper().strip().replace(' ', ''))
+
+def parse_postcodes(postcodes):
+    """Parse many postcodes, e.g. for imports and exports. Returns a list aligned with the input."""
+    return [parse_postcode(postcode) for postcode in postcodes]
+
+# Approximate coordinates for major UK areas, used when no postcode database is installed
+AREA_FALLBACK_COORDS = {
+    'M': (53.4808, -2.2426),  # Manchester
+    'B': (52.4862, -1.8904),  # Birmingham
+    'L': (53.4084, -2.9916),  # Liverpool
+    'LS': (53.8008, -1.5491), # Leeds
+    'S': (53.3811, -1.4701),  # Sheffield
+    'E': (51.5074, -0.1278),  # London East
+    'W': (51.5074, -0.1278),  # London West
+    'N': (51.5074, -0.1278),  # London North
+    'SW': (51.5074, -0.1278), # London Southwest
+    'SE': (51.5074, -0.1278), # London Southeast
+    'NW': (51.5074, -0.1278), # London Northwest
+    'EC': (51.5074, -0.1278), # London City
+    'WC': (51.5074, -0.1278), # London West Central
+}
 
 def geocode_postcode(postcode):
-    """Get lat/lon coordinates for a UK postcode. Mock implementation for MVP."""
-    # In production, this would call a real geocoding service
-    # For now, return approximate coordinates for major UK areas
-    
-    postcode_coords = {
-        'M': (53.4808, -2.2426),  # Manchester
-        'B': (52.4862, -1.8904),  # Birmingham
-        'L': (53.4084, -2.9916),  # Liverpool
-        'LS': (53.8008, -1.5491), # Leeds
-        'S': (53.3811, -1.4701),  # Sheffield
-        'E': (51.5074, -0.1278),  # London East
-        'W': (51.5074, -0.1278),  # London West
-        'N': (51.5074, -0.1278),  # London North
-        'SW': (51.5074, -0.1278), # London Southwest
-        'SE': (51.5074, -0.1278), # London Southeast
-        'NW': (51.5074, -0.1278), # London Northwest
-        'EC': (51.5074, -0.1278), # London City
-        'WC': (51.5074, -0.1278), # London West Central
-    }
-    
+    """Get lat/lon coordinates for a UK postcode (a string or an already parsed Postcode).
+
+    Uses the memory-mapped postcode database (see scripts/build_postcode_db.py)
+    when one is installed at POSTCODE_DB_PATH, falling back from the full
+    postcode to its sector, district and area centroids.
+    """
+    from geocoder import get_postcode_db
+
     postcode_info = parse_postcode(postcode)
     if not postcode_info:
         return 51.5074, -0.1278  # Default to London
-    
-    area = postcode_info['area']
-    return postcode_coords.get(area, (51.5074, -0.1278))
+
+    postcode_db = get_postcode_db(current_app.config.get('POSTCODE_DB_PATH'))
+    if postcode_db:
+        match = postcode_db.lookup(postcode_info)
+        if match:
+            return match[0], match[1]
+
+    return AREA_FALLBACK_COORDS.get(postcode_info.area, (51.5074, -0.1278))
+
+def geocode_postcodes(postcodes):
+    """Geocode many postcodes, looking each distinct postcode up once. Returns a list aligned with the input."""
+    coords = {}
+    results = []
+    for postcode in postcodes:
+        postcode_info = parse_postcode(postcode)
+        key = postcode_info.full if postcode_info else None
+        if key not in coords:
+            coords[key] = geocode_postcode(postcode_info)
+        results.append(coords[key])
+    return results
+
+def find_matching_trade_ids(job):
+    """Ids of the trades matching a job, resolved from the in-memory dispatch index."""
+    from dispatch_index import dispatch_index
+
+    # Only trades with a skill in the job's category are alerted
+    capability_mask = category_mask(job.category)
+
+    # In radius mode, trades with a base location are matched by distance
+    # instead of by their postcode coverage.
+    if current_app.config.get('ENABLE_RADIUS_FILTER') and job.lat is not None and job.lon is not None:
+        return dispatch_index.match_radius(job.postcode_area, job.postcode_district,
+                                           job.lat, job.lon, capability_mask)
+    return dispatch_index.match(job.postcode_area, job.postcode_district, capability_mask)
 
 def find_matching_trades(job):
     """Find trades that match a job's requirements."""
+    # Coverage is resolved from the in-memory index; only the matched rows are
+    # loaded, by primary key.
+    trade_ids = find_matching_trade_ids(job)
+
     matching_trades = []
-    
-    # Find verified trades with matching coverage
-    query = Trade.query.filter_by(verified=True)
-    
-    # Filter by coverage areas or districts
-    from sqlalchemy import or_, and_
-    
-    coverage_conditions = []
-    
-    # Check if trade covers the job's postcode area
-    coverage_conditions.append(Trade.coverage_areas.contains(f'"{job.postcode_area}"'))
-    
-    # Check if trade covers the job's postcode district
-    coverage_conditions.append(Trade.coverage_districts.contains(f'"{job.postcode_district}"'))
-    
-    if coverage_conditions:
-        query = query.filter(or_(*coverage_conditions))
-        matching_trades = query.all()
-    
+    if trade_ids:
+        matching_trades = Trade.query.options(selectinload(Trade.user)).filter(Trade.id.in_(trade_ids)).all()
+
     # Additional filtering could be added here:
-    # - Skills matching (if job category matches trade skills)
-    # - Radius checking (if lat/lon coordinates are available)
     # - Availability checking
-    
+
     logging.info(f"Found {len(matching_trades)} matching trades for job {job.id}")
     return matching_trades
 
-def send_job_notification(job, trades):
-    """Send job notifications to matching trades."""
+def find_matching_trades_sql(job):
+    """Reference SQL implementation of coverage matching, used to check the dispatch index."""
+    covering = TradeCoverage.covering(area=job.postcode_area, district=job.postcode_district)
+    return Trade.query.filter_by(verified=True).filter(Trade.id.in_(covering)).all()
+
+def check_dispatch_index(jobs):
+    """Compare index matching with the SQL path for the given jobs.
+
+    Returns a list of (job_id, missing_from_index, extra_in_index) tuples for
+    every job where the two disagree.
+    """
+    from dispatch_index import dispatch_index
+
+    mismatches = []
+    for job in jobs:
+        expected = {t.id for t in find_matching_trades_sql(job)}
+        actual = dispatch_index.match(job.postcode_area, job.postcode_district)
+        if expected != actual:
+            mismatches.append((job.id, expected - actual, actual - expected))
+    return mismatches
+
+ACTIVE_JOB_STATUSES = ('accepted', 'en_route', 'in_progress')
+DISTANCE_SCALE_KM = 10.0
+
+def trade_load(trade_ids):
+    """Jobs each trade has accepted but not finished, in one grouped query."""
+    from sqlalchemy import func
+
+    return dict(db.session.query(Job.accepted_trade_id, func.count(Job.id)).filter(
+        Job.accepted_trade_id.in_(trade_ids),
+        Job.status.in_(ACTIVE_JOB_STATUSES)
+    ).group_by(Job.accepted_trade_id).all())
+
+def score_trades(job, trades, weights, load=None):
+    """Score candidate trades for a job; returns a list of (score, trade, components).
+
+    Each component is normalized to 0..1 so the weights are comparable.
+    `load` may be passed in when it was already fetched for several jobs.
+    """
+    from dispatch_index import dispatch_index
+
+    trade_ids = [t.id for t in trades]
+    distances = {}
+    if job.lat is not None and job.lon is not None:
+        distances = dispatch_index.distances(job.lat, job.lon, trade_ids)
+
+    if load is None:
+        load = trade_load(trade_ids)
+
+    scored = []
+    for trade in trades:
+        distance_km = distances.get(trade.id)
+        review_count = trade.review_count or 0
+        components = {
+            # Trades matched by postcode only have no distance; treat them as mid-range
+            'distance': 1.0 / (1.0 + distance_km / DISTANCE_SCALE_KM) if distance_km is not None else 0.5,
+            # Rating shrunk towards 3.5 stars until a trade has a few reviews
+            'rating': ((trade.rating_avg or 0.0) * review_count + 3.5 * 5) / (review_count + 5) / 5.0,
+            'plan': 1.0 if trade.plan_tier == 'premium' else 0.0,
+            'load': 1.0 / (1 + load.get(trade.id, 0)),
+        }
+        score = sum(weights.get(name, 0.0) * value for name, value in components.items())
+        if distance_km is not None:
+            components['distance_km'] = round(distance_km, 2)
+        scored.append((score, trade, components))
+    return scored
+
+def rank_trades(job, trades, load=None):
+    """Pick the top-k trades for a job's urgency.
+
+    Returns the selected trades in rank order and an unsaved DispatchDecision
+    explaining the choice.
+    """
+    weights = current_app.config.get('DISPATCH_SCORE_WEIGHTS', {})
+    top_k = current_app.config.get('DISPATCH_TOP_K', {}).get(job.urgency, 15)
+
+    scored = score_trades(job, trades, weights, load) if trades else []
+    # Bounded heap selection; ties go to the longer-standing (lower id) trade
+    best = heapq.nlargest(top_k, scored, key=lambda s: (s[0], -s[1].id))
+
+    decision = DispatchDecision(
+        job_id=job.id,
+        candidate_count=len(trades),
+        selected_count=len(best),
+        top_k=top_k,
+        weights=weights,
+        selected=[
+            {'trade_id': trade.id, 'rank': rank, 'score': round(score, 4),
+             'components': {name: round(value, 4) for name, value in components.items()}}
+            for rank, (score, trade, components) in enumerate(best, start=1)
+        ]
+    )
+    return [trade for _, trade, _ in best], decision
+
+@outbox.handler('job.posted')
+def handle_job_posted(payload):
+    """Outbox handler: dispatch a job posted by job_request or create_job."""
+    from sqlalchemy import update
+
+    # Claim the job so a redelivered message never alerts the same trades twice
+    claimed = db.session.execute(
+        update(Job)
+        .where(Job.id == payload['job_id'], Job.status == 'posted', Job.dispatched_at.is_(None))
+        .values(dispatched_at=datetime.utcnow())
+    ).rowcount
+    db.session.commit()
+    if not claimed:
+        logging.info(f"Job {payload['job_id']} already dispatched or no longer open, skipping")
+        return
+
+    job = db.session.get(Job, payload['job_id'])
+    try:
+        dispatch_job(job)
+    except Exception:
+        # Release the claim so the outbox retry dispatches again
+        db.session.rollback()
+        job.dispatched_at = None
+        db.session.commit()
+        raise
+
+@outbox.handler('jobs.bulk_posted')
+def handle_jobs_bulk_posted(payload):
+    """Outbox handler: dispatch a chunk of jobs from bulk ingestion."""
+    from sqlalchemy import update
+
+    # Same claim as handle_job_posted, for every job in the chunk at once
+    claimed_ids = db.session.execute(
+        update(Job)
+        .where(Job.id.in_(payload['job_ids']), Job.status == 'posted', Job.dispatched_at.is_(None))
+        .values(dispatched_at=datetime.utcnow())
+        .returning(Job.id)
+    ).scalars().all()
+    db.session.commit()
+    if not claimed_ids:
+        logging.info(f"Bulk chunk of {len(payload['job_ids'])} jobs already dispatched, skipping")
+        return
+
+    jobs = Job.query.filter(Job.id.in_(claimed_ids)).order_by(Job.id).all()
+    dispatched = set()
+    try:
+        dispatch_jobs(jobs, dispatched)
+    except Exception:
+        # Release the claims of jobs not yet dispatched so the outbox retry picks them up
+        db.session.rollback()
+        db.session.execute(
+            update(Job)
+            .where(Job.id.in_([job.id for job in jobs if job.id not in dispatched]))
+            .values(dispatched_at=None)
+        )
+        db.session.commit()
+        raise
+
+def dispatch_jobs(jobs, dispatched=None):
+    """Match, rank and notify trades for many committed jobs.
+
+    Jobs in the same postcode district and category share one index match
+    (one per postcode in radius mode), candidate trades and their load are
+    loaded once for the whole batch, and decisions, offers and waves are
+    committed together before any alert is emailed. Ids of the jobs are
+    added to `dispatched` once everything is committed.
+    """
+    radius = current_app.config.get('ENABLE_RADIUS_FILTER')
+    groups = {}
+    for job in jobs:
+        key = (job.postcode_district, job.category) + ((job.lat, job.lon) if radius else ())
+        groups.setdefault(key, []).append(job)
+
+    job_trade_ids = {}
+    for group in groups.values():
+        trade_ids = sorted(find_matching_trade_ids(group[0]))
+        for job in group:
+            job_trade_ids[job.id] = trade_ids
+
+    job_ids = list(job_trade_ids)
+    all_ids = set().union(*job_trade_ids.values())
+
+    trades = {}
+    if all_ids:
+        trades = {t.id: t for t in Trade.query.options(selectinload(Trade.user)).filter(Trade.id.in_(all_ids))}
+    load = trade_load(all_ids)
+    selections = []
+    for job in jobs:
+        candidates = [trades[i] for i in job_trade_ids[job.id] if i in trades]
+        selected, decision = rank_trades(job, candidates, load)
+        db.session.add(decision)
+        selections.append((job, selected))
+
+    logging.info(f"Dispatching {len(jobs)} jobs in {len(groups)} district/category groups")
+    # Decisions, offers and waves commit together and the emails follow, so a
+    # failure anywhere before the commit leaves no job half dispatched
+    alerts = []
+    waves = [send_job_notification(job, selected, commit=False, alerts=alerts) for job, selected in selections]
+    timers = [(wave.job_id, wave.due_at, wave.id) for wave in waves if wave]
+    db.session.commit()
+    if dispatched is not None:
+        dispatched.update(job_ids)
+    for timer in timers:
+        arm_notification_wave(*timer)
+    send_job_alerts(alerts)
+    return selections
+
+def dispatch_job(job):
+    """Match, rank and notify trades for a newly committed job."""
+    candidates = find_matching_trades(job)
+    selected, decision = rank_trades(job, candidates)
+    # Committed with the offers and wave by send_job_notification
+    db.session.add(decision)
+
+    logging.info(f"Dispatching job {job.id} to {len(selected)} of {len(candidates)} matching trades")
+    send_job_notification(job, selected)
+    return selected
+
+def send_job_notification(job, trades, commit=True, alerts=None):
+    """Send job notifications to matching trades.
+
+    Returns the delayed standard-tier wave, if one was created. Emails go out
+    only once the stream offers and the wave (and anything else pending in
+    the session, such as the dispatch decision) are committed, so a failed
+    dispatch that is retried never alerts the same trades twice. With
+    commit=False nothing is committed: the wave is only flushed, the emails
+    are appended to `alerts` for send_job_alerts, and the caller commits,
+    arms the wave and sends them.
+    """
     if not trades:
         logging.info(f"No trades to notify for job {job.id}")
+        if commit:
+            db.session.commit()
         return
     
     # Separate premium and standard trades
     premium_trades = [t for t in trades if t.plan_tier == 'premium']
     standard_trades = [t for t in trades if t.plan_tier == 'standard']
+    job_alerts = []
+    wave = None
     
-    # Send immediate notifications to premium trades
+    # Immediate notifications to premium trades
     if premium_trades:
-        send_email_notifications(job, premium_trades, is_premium=True)
-        logging.info(f"Sent premium notifications for job {job.id} to {len(premium_trades)} trades")
+        publish_job_offers(job, [t.id for t in premium_trades], 'premium')
+        job_alerts.append((job, premium_trades, True))
     
-    # For MVP, send to standard trades immediately too
-    # In production, this would be delayed by PREMIUM_FIRST_ACCESS_MINUTES
+    # Standard trades wait PREMIUM_FIRST_ACCESS_MINUTES when premium trades were alerted
     if standard_trades:
-        send_email_notifications(job, standard_trades, is_premium=False)
-        logging.info(f"Sent standard notifications for job {job.id} to {len(standard_trades)} trades")
+        delay_minutes = current_app.config.get('PREMIUM_FIRST_ACCESS_MINUTES', 0)
+        if premium_trades and delay_minutes > 0:
+            wave = schedule_notification_wave(job, standard_trades, delay_minutes, commit)
+        else:
+            publish_job_offers(job, [t.id for t in standard_trades], 'standard')
+            job_alerts.append((job, standard_trades, False))
+
+    if not commit:
+        alerts.extend(job_alerts)
+        return wave
+    if wave is None:
+        # schedule_notification_wave has already committed
+        db.session.commit()
+    send_job_alerts(job_alerts)
+    return wave
+
+def send_job_alerts(alerts):
+    """Email committed (job, trades, is_premium) alerts, reloading what the commit expired in two queries."""
+    if not alerts:
+        return
+    Job.query.filter(Job.id.in_({job.id for job, _, _ in alerts})).all()
+    Trade.query.options(selectinload(Trade.user)).filter(
+        Trade.id.in_({trade.id for _, trades, _ in alerts for trade in trades})
+    ).all()
+    for job, trades, is_premium in alerts:
+        send_email_notifications(job, trades, is_premium=is_premium)
+        logging.info(f"Sent {'premium' if is_premium else 'standard'} notifications for job {job.id} "
+                     f"to {len(trades)} trades")
+
+def _wave_key(job_id):
+    return ('standard_wave', job_id)
+
+def _utc_timestamp(dt):
+    return dt.replace(tzinfo=timezone.utc).timestamp()
+
+def schedule_notification_wave(job, trades, delay_minutes, commit=True):
+    """Persist a delayed standard-tier wave for a job and arm its timer (only once committed)."""
+    wave = NotificationWave(
+        job_id=job.id,
+        trade_ids=[t.id for t in trades],
+        due_at=datetime.utcnow() + timedelta(minutes=delay_minutes)
+    )
+    db.session.add(wave)
+    if not commit:
+        db.session.flush()
+        return wave
+    db.session.commit()
+
+    arm_notification_wave(wave.job_id, wave.due_at, wave.id)
+    logging.info(f"Scheduled standard notifications for job {job.id} to {len(trades)} trades at {wave.due_at}")
+    return wave
+
+def arm_notification_wave(job_id, due_at, wave_id):
+    scheduler.schedule(_wave_key(job_id), _utc_timestamp(due_at), send_notification_wave, wave_id)
+
+def schedule_pending_waves():
+    """Arm timers for every pending wave, e.g. after a worker restart. Overdue waves fire immediately."""
+    waves = NotificationWave.query.filter_by(status='pending').all()
+    for wave in waves:
+        arm_notification_wave(wave.job_id, wave.due_at, wave.id)
+    if waves:
+        logging.info(f"Re-armed {len(waves)} pending notification waves")
+
+def send_notification_wave(wave_id):
+    """Release a due wave to its trades. Runs on the scheduler thread.
+
+    The wave is claimed, its offers published and a 'notification_wave.due'
+    outbox message written in one transaction; the emails go out from the
+    outbox worker, which retries them if the mail server is unreachable. A
+    process that exits right after the claim (e.g. a CLI script) loses nothing.
+    """
+    from sqlalchemy import update
+
+    wave = db.session.get(NotificationWave, wave_id)
+    if not wave or wave.status != 'pending':
+        return
+    job = db.session.get(Job, wave.job_id)
+    if not job or job.status != 'posted':
+        cancel_notification_waves(wave.job_id)
+        db.session.commit()
+        return
+
+    # Every worker re-arms pending waves at startup; the conditional update
+    # makes sure only one of them sends it.
+    claimed = db.session.execute(
+        update(NotificationWave)
+        .where(NotificationWave.id == wave_id, NotificationWave.status == 'pending')
+        .values(status='sent', sent_at=datetime.utcnow())
+    ).rowcount
+    if claimed:
+        publish_job_offers(job, wave.trade_ids or [], 'standard')
+        outbox.enqueue('notification_wave.due', {'wave_id': wave_id})
+    db.session.commit()
+
+@outbox.handler('notification_wave.due')
+def handle_notification_wave_due(payload):
+    """Outbox handler: email the trades of a wave claimed by send_notification_wave."""
+    wave = db.session.get(NotificationWave, payload['wave_id'])
+    job = db.session.get(Job, wave.job_id)
+    if job.status != 'posted':
+        logging.info(f"Job {job.id} no longer open, skipping its standard notifications")
+        return
+    trades = Trade.query.options(selectinload(Trade.user)).filter(Trade.id.in_(wave.trade_ids or [])).all()
+    if not send_email_notifications(job, trades, is_premium=False) and any(t.user and t.user.email for t in trades):
+        # Nothing was delivered, so the mail server was unreachable; the outbox retries with backoff
+        raise RuntimeError(f"No standard notifications delivered for job {job.id}")
+    logging.info(f"Sent standard notifications for job {job.id} to {len(trades)} trades")
+
+def cancel_notification_waves(job_id):
+    """Cancel pending waves for a job. The caller commits, normally with the acceptance itself."""
+    from sqlalchemy import update
+
+    scheduler.cancel(_wave_key(job_id))
+    db.session.execute(
+        update(NotificationWave)
+        .where(NotificationWave.job_id == job_id, NotificationWave.status == 'pending')
+        .values(status='canceled')
+    )
+
+def accept_job_for_trade(job_id, trade_id):
+    """Atomically give a posted job to a trade; returns False if another trade got there first.
+
+    The status check and the write are one conditional UPDATE, so concurrent
+    accepts need no row locks or retries: exactly one sees a matched row. The
+    hourly rollups and the stream events are written in the same transaction.
+    """
+    from sqlalchemy import update
+
+    accepted_at = datetime.utcnow()
+    accepted = db.session.execute(
+        update(Job)
+        .where(Job.id == job_id, Job.status == 'posted')
+        .values(status='accepted', accepted_trade_id=trade_id, accepted_at=accepted_at)
+        .returning(Job.created_at, Job.postcode_area, Job.category, Job.urgency)
+    ).first()
+    if not accepted:
+        db.session.rollback()
+        return False
+
+    # The job is taken, so standard trades waiting on the premium window need no alert
+    cancel_notification_waves(job_id)
+    record_accepted(*accepted, accepted_at)
+    publish_job_accepted(job_id, trade_id, accepted_at)
+    db.session.commit()
+    return True
 
 def send_email_notifications(job, trades, is_premium=False):
-    """Send email notifications to trades about a new job."""
+    """Send email notifications to trades about a new job; returns the number delivered."""
     try:
         priority_text = "PREMIUM EARLY ACCESS" if is_premium else "NEW JOB ALERT"
         urgency_text = {
@@ -129,73 +541,96 @@ def send_email_notifications(job, trades, is_premium=False):
         
         subject = f"TradeSOS {priority_text}: {urgency_text} - {job.title}"
         
+        html, text = render_job_alert(job, is_premium)
+        messages = []
         for trade in trades:
             if trade.user and trade.user.email:
-                try:
-                    msg = Message(
-                        subject=subject,
-                        recipients=[trade.user.email],
-                        html=render_job_notification_email(job, trade, is_premium)
-                    )
-                    mail.send(msg)
-                except Exception as e:
-                    logging.error(f"Failed to send email to {trade.user.email}: {str(e)}")
+                messages.append(Message(
+                    subject=subject,
+                    recipients=[trade.user.email],
+                    html=html,
+                    body=text
+                ))
+        
+        # One pooled SMTP connection for the whole batch rather than one per trade
+        return send_messages(messages)
                     
     except Exception as e:
         logging.error(f"Error sending email notifications: {str(e)}")
+        return 0
 
-def render_job_notification_email(job, trade, is_premium):
-    """Render the job notification email template."""
-    urgency_colors = {
-        'emergency_now': '#dc3545',  # Red
-        'urgent_2h': '#fd7e14',      # Orange
-        'same_day': '#ffc107',       # Yellow
-        'next_day': '#28a745'        # Green
+URGENCY_COLORS = {
+    'emergency_now': '#dc3545',  # Red
+    'urgent_2h': '#fd7e14',      # Orange
+    'same_day': '#ffc107',       # Yellow
+    'next_day': '#28a745'        # Green
+}
+
+def render_job_alert(job, is_premium):
+    """Render the job alert email for one tier; returns (html, text).
+
+    Nothing in the alert is recipient-specific, so it is rendered once per
+    (job, tier) and shared by every message in the batch. The templates are
+    compiled once and cached by the app's Jinja environment, and the HTML
+    template is autoescaped.
+    """
+    context = {
+        'job': job,
+        'is_premium': is_premium,
+        'urgency_color': URGENCY_COLORS.get(job.urgency, '#6c757d'),
+        'dashboard_url': f"{current_app.config.get('BASE_URL', 'http://localhost:5000')}/trade/dashboard",
     }
-    
-    urgency_color = urgency_colors.get(job.urgency, '#6c757d')
-    
-    return f"""
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <meta charset="utf-8">
-        <title>New Job Alert - TradeSOS</title>
-    </head>
-    <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
-        <div style="max-width: 600px; margin: 0 auto; padding: 20px;">
-            <div style="background: #f8f9fa; padding: 20px; border-radius: 5px; margin-bottom: 20px;">
-                <h1 style="color: #1a472a; margin: 0;">TradeSOS</h1>
-                {'<p style="color: #dc3545; font-weight: bold; margin: 5px 0;">PREMIUM EARLY ACCESS</p>' if is_premium else ''}
-            </div>
-            
-            <div style="background: {urgency_color}; color: white; padding: 10px; border-radius: 5px; margin-bottom: 20px;">
-                <h2 style="margin: 0;">{job.urgency.replace('_', ' ').title()}</h2>
-            </div>
-            
-            <h3>{job.title}</h3>
-            <p><strong>Category:</strong> {job.category.title()}</p>
-            <p><strong>Location:</strong> {job.postcode_full}</p>
-            <p><strong>Description:</strong></p>
-            <p>{job.description}</p>
-            
-            <div style="background: #e9ecef; padding: 15px; border-radius: 5px; margin: 20px 0;">
-                <p style="margin: 0;"><strong>To accept this job, log in to your TradeSOS dashboard:</strong></p>
-                <a href="{current_app.config.get('BASE_URL', 'http://localhost:5000')}/trade/dashboard" 
-                   style="display: inline-block; background: #1a472a; color: white; padding: 10px 20px; 
-                          text-decoration: none; border-radius: 5px; margin-top: 10px;">
-                    View Job & Accept
-                </a>
-            </div>
-            
-            <p style="font-size: 12px; color: #6c757d;">
-                This job was sent to you because it matches your coverage area and skills. 
-                First trade to accept gets the job!
-            </p>
-        </div>
-    </body>
-    </html>
+    env = current_app.jinja_env
+    html = env.get_template('email/job_alert.html').render(context)
+    text = None
+    if current_app.config.get('MAIL_ALERT_PLAIN_TEXT', True):
+        text = env.get_template('email/job_alert.txt').render(context)
+    return html, text
+
+ADMIN_STATS_CACHE_KEY = 'admin_dashboard_stats'
+
+def dashboard_stats():
+    """Admin dashboard counts, cached for ADMIN_STATS_CACHE_SECONDS.
+
+    Once expired, the old counts are served while a background thread
+    recounts, so page views never wait on COUNT(*) over the jobs table. Job
+    counts are left to the TTL: jobs arrive far too often for per-write
+    invalidation to leave anything cached.
     """
+    app = current_app._get_current_object()
+
+    def recount():
+        with app.app_context():
+            try:
+                return _query_dashboard_stats()
+            finally:
+                db.session.remove()
+
+    def in_background(fn):
+        threading.Thread(target=fn, name='admin-stats-refresh', daemon=True).start()
+
+    return cache.get_or_set(ADMIN_STATS_CACHE_KEY, recount,
+                            current_app.config.get('ADMIN_STATS_CACHE_SECONDS', 30), background=in_background)
+
+def invalidate_dashboard_stats():
+    cache.delete(ADMIN_STATS_CACHE_KEY)
+
+def _query_dashboard_stats():
+    """Every dashboard count in a single round trip."""
+    from sqlalchemy import select, func
+
+    def count(model, *criteria):
+        return select(func.count()).select_from(model).where(*criteria).scalar_subquery()
+
+    row = db.session.execute(select(
+        count(User).label('total_users'),
+        count(Customer).label('total_customers'),
+        count(Trade).label('total_trades'),
+        count(Trade, Trade.verified == True).label('verified_trades'),
+        count(Job).label('total_jobs'),
+        count(Job, Job.status.in_(('posted',) + ACTIVE_JOB_STATUSES)).label('active_jobs'),
+    )).one()
+    return dict(row._mapping)
 
 def calculate_distance(lat1, lon1, lat2, lon2):
     """Calculate distance between two points using Haversine formula."""